@@ -0,0 +1,606 @@
+# Every Addon.py deep-dive panel: where its data comes from and how it is
+# drawn, as a plotly figure (or a list of them, shown side by side). Each
+# panel's query is declared in Queryregistry. Nothing here needs a running
+# page, so Report.py loads the same panels.
+import pandas as pd
+import plotly.express as px
+from Boundsql import bind_window
+from Historyextract import query_credits, ratio
+from Queryregistry import Query, query_for, register
+from Streamagg import Aggregates, StreamedPanel, TopRows
+
+# Queries of grain "window" are templates with '{start}' and '{end}'
+# placeholders (end exclusive) for the selected days
+addon_sql = {}
+addon_history = {}
+addon_figures = {}
+
+#############################################
+#     Storage Utilization by Object Type
+#############################################
+storage_by_object_sql = """
+WITH size_metrics AS (
+    SELECT 
+        DATABASE_NAME,
+        SCHEMA_NAME,
+        TABLE_NAME,
+        TABLE_TYPE,
+        ROW_COUNT,
+        CASE 
+            WHEN ACTIVE_BYTES < 1024 THEN ACTIVE_BYTES || ' B'
+            WHEN ACTIVE_BYTES < 1048576 THEN ROUND(ACTIVE_BYTES/1024, 2) || ' KB'
+            WHEN ACTIVE_BYTES < 1073741824 THEN ROUND(ACTIVE_BYTES/1048576, 2) || ' MB'
+            WHEN ACTIVE_BYTES < 1099511627776 THEN ROUND(ACTIVE_BYTES/1073741824, 2) || ' GB'
+            ELSE ROUND(ACTIVE_BYTES/1099511627776, 2) || ' TB'
+        END AS ACTIVE_SIZE,
+        ROUND(ACTIVE_BYTES/NULLIF(ROW_COUNT, 0), 2) as BYTES_PER_ROW,
+        ROUND(ACTIVE_BYTES/1073741824, 2) as ACTIVE_GB_RAW
+    FROM snowflake.account_usage.table_storage_metrics
+    WHERE ACTIVE_BYTES > 0
+)
+SELECT * FROM size_metrics
+ORDER BY ACTIVE_GB_RAW DESC
+LIMIT 20
+"""
+register(Query(
+    "storage_objects",
+    storage_by_object_sql,
+    views=["TABLE_STORAGE_METRICS"],
+    columns=["DATABASE_NAME", "SCHEMA_NAME", "TABLE_NAME", "TABLE_TYPE", "ROW_COUNT", "ACTIVE_BYTES"],
+    freshness="daily",
+    limit=20,
+    panels=["storage_objects"]
+))
+addon_sql["storage_objects"] = storage_by_object_sql
+
+def figure_storage_objects(storage_objects_df):
+    fig_storage_objects = px.treemap(
+        storage_objects_df,
+        path=[px.Constant('All'), 'DATABASE_NAME', 'SCHEMA_NAME', 'TABLE_NAME'],
+        values='ACTIVE_GB_RAW',
+        color='BYTES_PER_ROW',
+        title="Storage Hierarchy Analysis",
+        hover_data=['ROW_COUNT', 'ACTIVE_SIZE', 'TABLE_TYPE']
+    )
+    return fig_storage_objects
+addon_figures["storage_objects"] = figure_storage_objects
+
+#############################################
+#     Query Performance Deep Dive
+#############################################
+register(Query(
+    "query_perf",
+    columns=[
+        "EXECUTION_STATUS", "QUERY_TYPE", "WAREHOUSE_NAME", "DATABASE_NAME", "SCHEMA_NAME", "USER_NAME",
+        "TOTAL_ELAPSED_TIME", "BYTES_SCANNED", "BYTES_WRITTEN", "BYTES_SPILLED_TO_LOCAL_STORAGE",
+        "BYTES_SPILLED_TO_REMOTE_STORAGE", "CREDITS_USED_COMPUTE", "CREDITS_USED_CLOUD_SERVICES",
+        "PERCENTAGE_SCANNED_FROM_CACHE"
+    ],
+    grain="day",
+    limit=100,
+    panels=["query_perf"],
+    source="query_history"
+))
+
+# The QUERY_HISTORY panels are StreamedPanels: called with the window's
+# extract like any function, or fed a few days at a time over long windows
+def prepare_query_perf(history_df):
+    success = history_df[history_df["EXECUTION_STATUS"] == "SUCCESS"]
+    out = pd.DataFrame({
+        "QUERY_TYPE": success["QUERY_TYPE"],
+        "WAREHOUSE_NAME": success["WAREHOUSE_NAME"],
+        "DATABASE_NAME": success["DATABASE_NAME"],
+        "SCHEMA_NAME": success["SCHEMA_NAME"],
+        "USER_NAME": success["USER_NAME"],
+        "EXECUTION_SECONDS": (success["TOTAL_ELAPSED_TIME"] / 1000).round(2),
+        "MB_SCANNED": (success["BYTES_SCANNED"] / 1048576).round(2),
+        "MB_WRITTEN": (success["BYTES_WRITTEN"] / 1048576).round(2),
+        "MB_SPILLED_LOCAL": (success["BYTES_SPILLED_TO_LOCAL_STORAGE"] / 1048576).round(2),
+        "MB_SPILLED_REMOTE": (success["BYTES_SPILLED_TO_REMOTE_STORAGE"] / 1048576).round(2),
+        "TOTAL_CREDITS": query_credits(success),
+        "PERCENTAGE_SCANNED_FROM_CACHE": success["PERCENTAGE_SCANNED_FROM_CACHE"]
+    })
+    return out[out["TOTAL_CREDITS"] > 0]
+addon_history["query_perf"] = StreamedPanel(prepare_query_perf, lambda: TopRows("TOTAL_CREDITS", 100))
+
+def figure_query_perf(query_perf_df):
+    # Create multiple visualizations for query performance
+    fig_query_spill = px.scatter(
+        query_perf_df,
+        x='MB_SCANNED',
+        y='TOTAL_CREDITS',
+        size='MB_SPILLED_REMOTE',
+        color='WAREHOUSE_NAME',
+        title="Query Spilling Analysis",
+        hover_data=['QUERY_TYPE', 'USER_NAME', 'EXECUTION_SECONDS']
+    )
+
+    fig_cache_impact = px.scatter(
+        query_perf_df,
+        x='EXECUTION_SECONDS',
+        y='PERCENTAGE_SCANNED_FROM_CACHE',
+        size='MB_SCANNED',
+        color='WAREHOUSE_NAME',
+        title="Cache Utilization Impact",
+        hover_data=['QUERY_TYPE', 'USER_NAME', 'TOTAL_CREDITS']
+    )
+    return [fig_query_spill, fig_cache_impact]
+addon_figures["query_perf"] = figure_query_perf
+
+#############################################
+#     Database Growth Trends
+#############################################
+db_growth_sql = """
+WITH daily_db_size AS (
+    SELECT 
+        DATABASE_NAME,
+        DATE_TRUNC('day', USAGE_DATE) as USAGE_DATE,
+        SUM(CASE 
+            WHEN ACTIVE_BYTES < 1073741824 THEN ROUND(ACTIVE_BYTES/1048576, 2)
+            WHEN ACTIVE_BYTES < 1099511627776 THEN ROUND(ACTIVE_BYTES/1073741824, 2)
+            ELSE ROUND(ACTIVE_BYTES/1099511627776, 2)
+        END) as SIZE_VALUE,
+        CASE 
+            WHEN MAX(ACTIVE_BYTES) < 1073741824 THEN 'MB'
+            WHEN MAX(ACTIVE_BYTES) < 1099511627776 THEN 'GB'
+            ELSE 'TB'
+        END as SIZE_UNIT
+    FROM snowflake.account_usage.database_storage_usage_history
+    GROUP BY 1, 2
+)
+SELECT * FROM daily_db_size
+ORDER BY USAGE_DATE DESC, SIZE_VALUE DESC
+"""
+register(Query(
+    "db_growth",
+    db_growth_sql,
+    views=["DATABASE_STORAGE_USAGE_HISTORY"],
+    columns=["DATABASE_NAME", "USAGE_DATE", "ACTIVE_BYTES"],
+    freshness="daily",
+    panels=["db_growth"]
+))
+addon_sql["db_growth"] = db_growth_sql
+
+def figure_db_growth(db_growth_df):
+    fig_db_growth = px.line(
+        db_growth_df,
+        x='USAGE_DATE',
+        y='SIZE_VALUE',
+        color='DATABASE_NAME',
+        title="Database Size Growth Trends",
+        labels={'SIZE_VALUE': 'Size (Dynamic Unit)'},
+        hover_data=['SIZE_UNIT']
+    )
+    return fig_db_growth
+addon_figures["db_growth"] = figure_db_growth
+
+#############################################
+#     Warehouse Efficiency Analysis
+#############################################
+register(Query(
+    "warehouse_efficiency",
+    columns=[
+        "WAREHOUSE_NAME", "WAREHOUSE_SIZE", "TOTAL_ELAPSED_TIME", "BYTES_SPILLED_TO_REMOTE_STORAGE",
+        "CREDITS_USED_COMPUTE", "CREDITS_USED_CLOUD_SERVICES", "BYTES_SCANNED", "PERCENTAGE_SCANNED_FROM_CACHE"
+    ],
+    grain="day",
+    panels=["warehouse_efficiency"],
+    source="query_history"
+))
+
+def prepare_warehouse_efficiency(history_df):
+    df = history_df[history_df["WAREHOUSE_NAME"].notna()]
+    return df.assign(
+        EXECUTION_SEC=df["TOTAL_ELAPSED_TIME"] / 1000,
+        SPILLING=(df["BYTES_SPILLED_TO_REMOTE_STORAGE"] > 0).astype(int)
+    )
+
+def warehouse_efficiency_aggregates():
+    return Aggregates(
+        ["WAREHOUSE_NAME", "WAREHOUSE_SIZE"],
+        size="QUERY_COUNT",
+        sums={
+            "TOTAL_EXECUTION_HOURS": "EXECUTION_SEC",
+            "COMPUTE_CREDITS": "CREDITS_USED_COMPUTE",
+            "CLOUD_CREDITS": "CREDITS_USED_CLOUD_SERVICES",
+            "TB_SCANNED": "BYTES_SCANNED",
+            "CACHE_HIT_SUM": "PERCENTAGE_SCANNED_FROM_CACHE",
+            "SPILLING_QUERIES": "SPILLING"
+        },
+        counts={"EXECUTIONS": "EXECUTION_SEC", "CACHE_HITS": "PERCENTAGE_SCANNED_FROM_CACHE"}
+    )
+
+def finish_warehouse_efficiency(out):
+    out.insert(3, "AVG_EXECUTION_SEC", ratio(out["TOTAL_EXECUTION_HOURS"], out.pop("EXECUTIONS")))
+    out.insert(8, "AVG_CACHE_HIT", ratio(out.pop("CACHE_HIT_SUM"), out.pop("CACHE_HITS")))
+    out["TOTAL_EXECUTION_HOURS"] = out["TOTAL_EXECUTION_HOURS"] / 3600
+    out["TB_SCANNED"] = out["TB_SCANNED"] / 1024 ** 3
+    out["SPILL_PERCENTAGE"] = (ratio(out["SPILLING_QUERIES"].astype(float), out["QUERY_COUNT"]) * 100).round(2)
+    out["CREDITS_PER_HOUR"] = ratio(out["COMPUTE_CREDITS"], out["TOTAL_EXECUTION_HOURS"], 2)
+    return out.sort_values("COMPUTE_CREDITS", ascending=False).reset_index(drop=True)
+addon_history["warehouse_efficiency"] = StreamedPanel(prepare_warehouse_efficiency, warehouse_efficiency_aggregates, finish_warehouse_efficiency)
+
+def figure_warehouse_efficiency(warehouse_efficiency_df):
+    fig_warehouse_efficiency = px.scatter(
+        warehouse_efficiency_df,
+        x='CREDITS_PER_HOUR',
+        y='AVG_CACHE_HIT',
+        size='QUERY_COUNT',
+        color='WAREHOUSE_SIZE',
+        title="Warehouse Efficiency Matrix",
+        hover_data=['WAREHOUSE_NAME', 'SPILL_PERCENTAGE', 'TB_SCANNED']
+    )
+    return fig_warehouse_efficiency
+addon_figures["warehouse_efficiency"] = figure_warehouse_efficiency
+
+#############################################
+#     Schema-Level Query Patterns
+#############################################
+register(Query(
+    "schema_patterns",
+    columns=[
+        "DATABASE_NAME", "SCHEMA_NAME", "USER_NAME", "TOTAL_ELAPSED_TIME", "BYTES_SCANNED",
+        "CREDITS_USED_COMPUTE", "CREDITS_USED_CLOUD_SERVICES"
+    ],
+    grain="day",
+    panels=["schema_patterns"],
+    source="query_history"
+))
+
+def prepare_schema_patterns(history_df):
+    scanned = history_df["BYTES_SCANNED"]
+    # Each query's bytes in its own unit, then summed, the same way the SQL version did it
+    processed = (scanned / 1024).where(scanned < 1048576, (scanned / 1048576).where(scanned < 1073741824, scanned / 1073741824)).round(2)
+    return history_df.assign(
+        EXECUTION_SEC=history_df["TOTAL_ELAPSED_TIME"] / 1000,
+        QUERY_CREDITS=query_credits(history_df),
+        DATA_PROCESSED=processed
+    )
+
+def schema_patterns_aggregates():
+    return Aggregates(
+        ["DATABASE_NAME", "SCHEMA_NAME"],
+        size="QUERY_COUNT",
+        sums={"EXECUTION_SEC_SUM": "EXECUTION_SEC", "TOTAL_CREDITS": "QUERY_CREDITS", "DATA_PROCESSED": "DATA_PROCESSED"},
+        counts={"EXECUTIONS": "EXECUTION_SEC"},
+        maxs={"MAX_BYTES_SCANNED": "BYTES_SCANNED"},
+        distincts={"UNIQUE_USERS": "USER_NAME"}
+    )
+
+def finish_schema_patterns(out):
+    out.insert(2, "UNIQUE_USERS", out.pop("UNIQUE_USERS"))
+    out.insert(4, "AVG_EXECUTION_SEC", ratio(out.pop("EXECUTION_SEC_SUM"), out.pop("EXECUTIONS")))
+    max_scanned = out.pop("MAX_BYTES_SCANNED")
+    out["DATA_UNIT"] = "GB"
+    out.loc[max_scanned < 1073741824, "DATA_UNIT"] = "MB"
+    out.loc[max_scanned < 1048576, "DATA_UNIT"] = "KB"
+    return out.sort_values("TOTAL_CREDITS", ascending=False).reset_index(drop=True)
+addon_history["schema_patterns"] = StreamedPanel(prepare_schema_patterns, schema_patterns_aggregates, finish_schema_patterns)
+
+def figure_schema_patterns(schema_patterns_df):
+    fig_schema_patterns = px.sunburst(
+        schema_patterns_df,
+        path=['DATABASE_NAME', 'SCHEMA_NAME'],
+        values='TOTAL_CREDITS',
+        color='QUERY_COUNT',
+        title="Schema Usage Patterns",
+        hover_data=['UNIQUE_USERS', 'AVG_EXECUTION_SEC', 'DATA_PROCESSED', 'DATA_UNIT']
+    )
+    return fig_schema_patterns
+addon_figures["schema_patterns"] = figure_schema_patterns
+
+#############################################
+#     Table Cost Analysis by Warehouse
+#############################################
+table_warehouse_cost_sql = """
+WITH table_metrics AS (
+    -- Get table storage costs
+    SELECT 
+        t.DATABASE_NAME,
+        t.SCHEMA_NAME,
+        t.TABLE_NAME,
+        ROUND(t.ACTIVE_BYTES/POWER(1024,3), 2) as STORAGE_GB,
+        ROUND(t.ACTIVE_BYTES/POWER(1024,4), 2) as STORAGE_TB,
+        t.ROW_COUNT,
+        ROUND(t.ACTIVE_BYTES/NULLIF(t.ROW_COUNT, 0), 2) as BYTES_PER_ROW
+    FROM snowflake.account_usage.table_storage_metrics t
+    WHERE t.ACTIVE_BYTES > 0
+),
+query_costs AS (
+    -- Get query costs per table
+    SELECT 
+        q.DATABASE_NAME,
+        q.SCHEMA_NAME,
+        q.TABLE_NAME,
+        q.WAREHOUSE_NAME,
+        COUNT(*) as QUERY_COUNT,
+        SUM(CREDITS_USED_COMPUTE + CREDITS_USED_CLOUD_SERVICES) as TOTAL_CREDITS,
+        AVG(TOTAL_ELAPSED_TIME/1000) as AVG_EXECUTION_SEC,
+        SUM(BYTES_SCANNED)/POWER(1024,3) as GB_SCANNED
+    FROM snowflake.account_usage.access_history q
+    WHERE start_time >= '{start}' and start_time < '{end}'
+    GROUP BY 1, 2, 3, 4
+)
+SELECT 
+    tm.*,
+    qc.WAREHOUSE_NAME,
+    qc.QUERY_COUNT,
+    qc.TOTAL_CREDITS,
+    qc.AVG_EXECUTION_SEC,
+    qc.GB_SCANNED,
+    ROUND(qc.GB_SCANNED/NULLIF(tm.STORAGE_GB, 0) * 100, 2) as SCAN_RATIO,
+    ROUND(qc.TOTAL_CREDITS/NULLIF(qc.QUERY_COUNT, 0), 4) as CREDITS_PER_QUERY
+FROM table_metrics tm
+LEFT JOIN query_costs qc 
+    ON tm.DATABASE_NAME = qc.DATABASE_NAME 
+    AND tm.SCHEMA_NAME = qc.SCHEMA_NAME 
+    AND tm.TABLE_NAME = qc.TABLE_NAME
+ORDER BY qc.TOTAL_CREDITS DESC NULLS LAST
+"""
+register(Query(
+    "table_warehouse_cost",
+    table_warehouse_cost_sql,
+    views=["TABLE_STORAGE_METRICS", "ACCESS_HISTORY"],
+    columns=[
+        "DATABASE_NAME", "SCHEMA_NAME", "TABLE_NAME", "ACTIVE_BYTES", "ROW_COUNT", "WAREHOUSE_NAME", "START_TIME",
+        "CREDITS_USED_COMPUTE", "CREDITS_USED_CLOUD_SERVICES", "TOTAL_ELAPSED_TIME", "BYTES_SCANNED"
+    ],
+    grain="window",
+    panels=["table_warehouse_cost"]
+))
+addon_sql["table_warehouse_cost"] = table_warehouse_cost_sql
+
+def figure_table_warehouse_cost(table_warehouse_cost_df):
+    # Tables nobody queried in the window have no warehouse, a treemap can't place them under one
+    table_warehouse_cost_df = table_warehouse_cost_df.dropna(subset=['WAREHOUSE_NAME'])
+    # Create visualization for table costs
+    fig_table_costs = px.treemap(
+        table_warehouse_cost_df,
+        path=[px.Constant('All'), 'WAREHOUSE_NAME', 'DATABASE_NAME', 'SCHEMA_NAME', 'TABLE_NAME'],
+        values='STORAGE_GB',
+        color='CREDITS_PER_QUERY',
+        title="Table Storage and Query Cost Analysis by Warehouse",
+        custom_data=['QUERY_COUNT', 'TOTAL_CREDITS', 'ROW_COUNT', 'BYTES_PER_ROW', 'SCAN_RATIO']
+    )
+    return fig_table_costs
+addon_figures["table_warehouse_cost"] = figure_table_warehouse_cost
+
+#############################################
+#     Expensive Query Analysis by User
+#############################################
+register(Query(
+    "expensive_queries",
+    columns=[
+        "EXECUTION_STATUS", "USER_NAME", "WAREHOUSE_NAME", "QUERY_TYPE", "QUERY_TEXT", "DATABASE_NAME", "SCHEMA_NAME",
+        "TOTAL_ELAPSED_TIME", "CREDITS_USED_COMPUTE", "CREDITS_USED_CLOUD_SERVICES", "BYTES_SCANNED", "ROWS_PRODUCED",
+        "BYTES_SPILLED_TO_REMOTE_STORAGE", "COMPILATION_TIME", "EXECUTION_TIME", "QUEUED_PROVISIONING_TIME",
+        "TRANSACTION_BLOCKED_TIME", "PERCENTAGE_SCANNED_FROM_CACHE"
+    ],
+    grain="day",
+    limit=100,
+    panels=["expensive_queries"],
+    source="query_history"
+))
+
+def prepare_expensive_queries(history_df):
+    df = history_df[(history_df["EXECUTION_STATUS"] == "SUCCESS") & (history_df["CREDITS_USED_COMPUTE"] > 0)]
+    out = pd.DataFrame({
+        "USER_NAME": df["USER_NAME"],
+        "WAREHOUSE_NAME": df["WAREHOUSE_NAME"],
+        "QUERY_TYPE": df["QUERY_TYPE"],
+        "QUERY_TEXT": df["QUERY_TEXT"],
+        "DATABASE_NAME": df["DATABASE_NAME"],
+        "SCHEMA_NAME": df["SCHEMA_NAME"],
+        "EXECUTION_SEC": df["TOTAL_ELAPSED_TIME"] / 1000,
+        "QUERY_CREDITS": query_credits(df),
+        "GB_SCANNED": df["BYTES_SCANNED"] / 1024 ** 3,
+        "ROWS_PRODUCED": df["ROWS_PRODUCED"],
+        "HAS_SPILLING": (df["BYTES_SPILLED_TO_REMOTE_STORAGE"] > 0).map({True: "Yes", False: "No"}),
+        "COMPILE_SEC": df["COMPILATION_TIME"] / 1000,
+        "PURE_EXEC_SEC": df["EXECUTION_TIME"] / 1000,
+        "QUEUE_SEC": df["QUEUED_PROVISIONING_TIME"] / 1000,
+        "BLOCKED_SEC": df["TRANSACTION_BLOCKED_TIME"] / 1000,
+        "CACHE_HIT_RATIO": df["PERCENTAGE_SCANNED_FROM_CACHE"]
+    })
+    return out
+
+def finish_expensive_queries(out):
+    out["GB_PER_ROW"] = ratio(out["GB_SCANNED"], out["ROWS_PRODUCED"], 4)
+    out["CREDITS_PER_ROW"] = ratio(out["QUERY_CREDITS"], out["ROWS_PRODUCED"], 6)
+    return out
+addon_history["expensive_queries"] = StreamedPanel(prepare_expensive_queries, lambda: TopRows("QUERY_CREDITS", 100), finish_expensive_queries)
+
+def figure_expensive_queries(expensive_queries_df):
+    # Create visualization for expensive queries
+    fig_expensive_queries = px.scatter(
+        expensive_queries_df,
+        x='EXECUTION_SEC',
+        y='QUERY_CREDITS',
+        color='WAREHOUSE_NAME',
+        size='GB_SCANNED',
+        hover_data=['USER_NAME', 'QUERY_TYPE', 'GB_PER_ROW', 'CREDITS_PER_ROW', 'CACHE_HIT_RATIO'],
+        title="Most Expensive Queries Analysis"
+    )
+    return fig_expensive_queries
+addon_figures["expensive_queries"] = figure_expensive_queries
+
+#############################################
+#     Cost Optimization Opportunities
+#############################################
+register(Query(
+    "optimization_opps",
+    columns=[
+        "WAREHOUSE_NAME", "USER_NAME", "EXECUTION_TIME", "QUEUED_PROVISIONING_TIME", "BYTES_SPILLED_TO_REMOTE_STORAGE",
+        "PERCENTAGE_SCANNED_FROM_CACHE", "CREDITS_USED_COMPUTE", "CREDITS_USED_CLOUD_SERVICES"
+    ],
+    grain="day",
+    panels=["optimization_opps"],
+    source="query_history"
+))
+
+def prepare_optimization_opps(history_df):
+    execution = history_df["EXECUTION_TIME"]
+    return history_df.assign(
+        SPILLING=(history_df["BYTES_SPILLED_TO_REMOTE_STORAGE"] > 0).astype(int),
+        QUEUE_RATIO=(history_df["QUEUED_PROVISIONING_TIME"] / execution.where(execution > 0)).fillna(0),
+        QUERY_CREDITS=query_credits(history_df)
+    )
+
+def optimization_opps_aggregates():
+    return Aggregates(
+        ["WAREHOUSE_NAME"],
+        size="QUERY_COUNT",
+        sums={
+            "SPILLING_QUERIES": "SPILLING",
+            "QUEUE_RATIO_SUM": "QUEUE_RATIO",
+            "CACHE_HIT_SUM": "PERCENTAGE_SCANNED_FROM_CACHE",
+            "TOTAL_CREDITS": "QUERY_CREDITS"
+        },
+        counts={"QUEUE_RATIOS": "QUEUE_RATIO", "CACHE_HITS": "PERCENTAGE_SCANNED_FROM_CACHE"},
+        distincts={"UNIQUE_USERS": "USER_NAME"}
+    )
+
+def finish_optimization_opps(out):
+    out.insert(3, "AVG_QUEUE_RATIO", ratio(out.pop("QUEUE_RATIO_SUM"), out.pop("QUEUE_RATIOS")) * 100)
+    out.insert(4, "AVG_CACHE_HIT", ratio(out.pop("CACHE_HIT_SUM"), out.pop("CACHE_HITS")))
+    out["SPILL_PERCENTAGE"] = (ratio(out["SPILLING_QUERIES"].astype(float), out["QUERY_COUNT"]) * 100).round(2)
+    out["CREDITS_PER_QUERY"] = ratio(out["TOTAL_CREDITS"], out["QUERY_COUNT"], 4)
+    return out.sort_values("TOTAL_CREDITS", ascending=False).reset_index(drop=True)
+addon_history["optimization_opps"] = StreamedPanel(prepare_optimization_opps, optimization_opps_aggregates, finish_optimization_opps)
+
+def figure_optimization_opps(optimization_opps_df):
+    # Create visualization for optimization opportunities
+    fig_optimization = px.scatter(
+        optimization_opps_df,
+        x='SPILL_PERCENTAGE',
+        y='AVG_QUEUE_RATIO',
+        size='TOTAL_CREDITS',
+        color='AVG_CACHE_HIT',
+        hover_data=['WAREHOUSE_NAME', 'QUERY_COUNT', 'CREDITS_PER_QUERY'],
+        title="Warehouse Optimization Opportunities"
+    )
+    return fig_optimization
+addon_figures["optimization_opps"] = figure_optimization_opps
+
+#############################################
+#     User Cost Impact Analysis
+#############################################
+register(Query(
+    "user_impact",
+    columns=[
+        "USER_NAME", "WAREHOUSE_NAME", "DATABASE_NAME", "SCHEMA_NAME", "TOTAL_ELAPSED_TIME", "BYTES_SCANNED",
+        "CREDITS_USED_COMPUTE", "CREDITS_USED_CLOUD_SERVICES"
+    ],
+    grain="day",
+    panels=["user_impact"],
+    source="query_history"
+))
+
+def prepare_user_impact(history_df):
+    return history_df.assign(
+        QUERY_CREDITS=query_credits(history_df),
+        EXECUTION_SEC=history_df["TOTAL_ELAPSED_TIME"] / 1000,
+        # QUERY_HISTORY has no TABLE_NAME column, database.schema is the finest level it records
+        OBJECT_NAME=history_df["DATABASE_NAME"] + "." + history_df["SCHEMA_NAME"]
+    )
+
+def user_impact_aggregates():
+    return Aggregates(
+        ["USER_NAME", "WAREHOUSE_NAME"],
+        size="QUERY_COUNT",
+        sums={"TOTAL_CREDITS": "QUERY_CREDITS", "EXECUTION_SEC_SUM": "EXECUTION_SEC", "TOTAL_GB_SCANNED": "BYTES_SCANNED"},
+        counts={"EXECUTIONS": "EXECUTION_SEC"},
+        distincts={"DISTINCT_TABLES_ACCESSED": "OBJECT_NAME"}
+    )
+
+def finish_user_impact(out):
+    out.insert(4, "AVG_EXECUTION_SEC", ratio(out.pop("EXECUTION_SEC_SUM"), out.pop("EXECUTIONS")))
+    out["TOTAL_GB_SCANNED"] = out["TOTAL_GB_SCANNED"] / 1024 ** 3
+    out["CREDITS_PER_QUERY"] = ratio(out["TOTAL_CREDITS"], out["QUERY_COUNT"], 4)
+    out["GB_SCANNED_PER_QUERY"] = ratio(out["TOTAL_GB_SCANNED"], out["QUERY_COUNT"], 2)
+    return out.sort_values("TOTAL_CREDITS", ascending=False).reset_index(drop=True)
+addon_history["user_impact"] = StreamedPanel(prepare_user_impact, user_impact_aggregates, finish_user_impact)
+
+def figure_user_impact(user_impact_df):
+    # Create visualization for user impact
+    fig_user_impact = px.scatter(
+        user_impact_df,
+        x='QUERY_COUNT',
+        y='TOTAL_CREDITS',
+        color='WAREHOUSE_NAME',
+        size='TOTAL_GB_SCANNED',
+        hover_data=['USER_NAME', 'CREDITS_PER_QUERY', 'GB_SCANNED_PER_QUERY', 'DISTINCT_TABLES_ACCESSED'],
+        title="User Cost Impact Analysis"
+    )
+    return fig_user_impact
+addon_figures["user_impact"] = figure_user_impact
+
+#############################################
+#     Key Performance Indicators
+#############################################
+def addon_kpis(warehouse_efficiency_df, storage_objects_df):
+    """(label, value) for each KPI box"""
+    # Calculate summary metrics
+    total_spill_queries = warehouse_efficiency_df['SPILLING_QUERIES'].sum()
+    avg_cache_hit = warehouse_efficiency_df['AVG_CACHE_HIT'].mean()
+    total_storage = storage_objects_df['ACTIVE_GB_RAW'].sum()
+    avg_credits_per_hour = warehouse_efficiency_df['CREDITS_PER_HOUR'].mean()
+
+    return [
+        ("Total Spilling Queries", f"{total_spill_queries:,.0f}"),
+        ("Avg Cache Hit Rate", f"{avg_cache_hit:.1f}%"),
+        ("Total Active Storage", f"{total_storage:.1f} GB"),
+        ("Avg Credits/Hour", f"{avg_credits_per_hour:.2f}")
+    ]
+
+#############################################
+#     Cost Optimization Recommendations
+#############################################
+def addon_recommendations(table_warehouse_cost_df, expensive_queries_df, optimization_opps_df):
+    """Markdown lines of cost-saving recommendations"""
+    lines = []
+    # Table Storage Recommendations
+    high_storage_tables = table_warehouse_cost_df[
+        table_warehouse_cost_df['BYTES_PER_ROW'] > table_warehouse_cost_df['BYTES_PER_ROW'].median() * 2
+    ]
+    if not high_storage_tables.empty:
+        lines.append("### Storage Optimization Opportunities")
+        lines.append("""
+        Tables with high storage cost per row (potential optimization targets):
+        """)
+        for _, row in high_storage_tables.head().iterrows():
+            lines.append(f"- {row['DATABASE_NAME']}.{row['SCHEMA_NAME']}.{row['TABLE_NAME']}")
+            lines.append(f"  * {row['BYTES_PER_ROW']} bytes/row (vs median {table_warehouse_cost_df['BYTES_PER_ROW'].median():.2f})")
+
+    # Query Optimization Recommendations
+    high_cost_queries = expensive_queries_df[
+        expensive_queries_df['CREDITS_PER_ROW'] > expensive_queries_df['CREDITS_PER_ROW'].median() * 3
+    ]
+    if not high_cost_queries.empty:
+        lines.append("### Query Cost Optimization Opportunities")
+        lines.append("""
+        Users and warehouses with expensive queries:
+        """)
+        for _, row in high_cost_queries.head().iterrows():
+            lines.append(f"- User: {row['USER_NAME']} on {row['WAREHOUSE_NAME']}")
+            lines.append(f"  * {row['CREDITS_PER_ROW']} credits/row")
+            lines.append(f"  * Query type: {row['QUERY_TYPE']}")
+
+    # Warehouse Optimization
+    high_spill_warehouses = optimization_opps_df[
+        optimization_opps_df['SPILL_PERCENTAGE'] > 10
+    ]
+    if not high_spill_warehouses.empty:
+        lines.append("### Warehouse Optimization Opportunities")
+        lines.append("""
+        Warehouses with high spilling rates:
+        """)
+        for _, row in high_spill_warehouses.iterrows():
+            lines.append(f"- {row['WAREHOUSE_NAME']}")
+            lines.append(f"  * Spill rate: {row['SPILL_PERCENTAGE']}%")
+            lines.append(f"  * Queue ratio: {row['AVG_QUEUE_RATIO']:.2f}%")
+    return lines
+
+def window_sql(start, end):
+    """addon_sql with the queries of grain "window" bound to the days start..end"""
+    return {name: bind_window(sql, start, end) if query_for(name).grain == "window" else sql for name, sql in addon_sql.items()}
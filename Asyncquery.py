@@ -0,0 +1,139 @@
+import threading
+import time
+
+from Boundsql import params_of
+from Fetch import cursor_to_dataframe
+
+# How long a finished query's result is reused (Snowflake keeps it for 24h)
+RESULT_REUSE_SECONDS = 600
+POLL_INTERVAL = 1.0
+
+def submit_query(conn, sql):
+    """Submit a query without waiting for it and return its Snowflake query ID"""
+    cur = conn.cursor()
+    try:
+        cur.execute_async(sql, params_of(sql) or None)
+        return cur.sfqid
+    finally:
+        cur.close()
+
+def query_state(conn, query_id):
+    """Return ("running" | "success" | "failed", error message) for a submitted query"""
+    try:
+        status = conn.get_query_status_throw_if_error(query_id)
+    except Exception as e:
+        return "failed", f"Snowflake Error: {str(e)}"
+    if conn.is_still_running(status):
+        return "running", None
+    if status.name == "SUCCESS":
+        return "success", None
+    return "failed", f"Snowflake Error: query {query_id} ended with status {status.name}"
+
+def fetch_query_result(conn, query_id):
+    """Fetch the result of a finished query by ID, from any connection or session"""
+    cur = conn.cursor()
+    try:
+        cur.get_results_from_sfqid(query_id)
+        return cursor_to_dataframe(cur)
+    finally:
+        cur.close()
+
+class QueryTracker:
+    """Process-wide map of SQL text -> Snowflake query ID
+
+    Reruns and other sessions asking for the same SQL pick up the query that is
+    already running (or recently finished) instead of submitting it again.
+    """
+
+    def __init__(self, reuse_seconds=RESULT_REUSE_SECONDS):
+        self.reuse_seconds = reuse_seconds
+        self._queries = {}
+        self._lock = threading.Lock()
+
+    def get(self, sql):
+        with self._lock:
+            entry = self._queries.get(sql)
+            if entry is None:
+                return None
+            if entry["state"] == "failed":
+                return None
+            if entry["state"] == "success" and time.time() - entry["finished_at"] > self.reuse_seconds:
+                return None
+            return entry
+
+    def track(self, conn, sql):
+        """Return the query ID for sql, submitting it only if nothing reusable is tracked"""
+        entry = self.get(sql)
+        if entry is not None:
+            return entry["query_id"]
+        query_id = submit_query(conn, sql)
+        with self._lock:
+            self._queries[sql] = {
+                "query_id": query_id,
+                "state": "running",
+                "submitted_at": time.time(),
+                "finished_at": None
+            }
+        return query_id
+
+    def update(self, sql, query_id, state):
+        with self._lock:
+            entry = self._queries.get(sql)
+            if entry is None or entry["query_id"] != query_id:
+                return
+            if state != "running" and entry["state"] == "running":
+                entry["finished_at"] = time.time()
+            entry["state"] = state
+
+    def running(self):
+        with self._lock:
+            return {sql: dict(entry) for sql, entry in self._queries.items() if entry["state"] == "running"}
+
+tracker = QueryTracker()
+
+def run_queries_async(pool, queries, poll_interval=POLL_INTERVAL, timeout=None, breaker=None):
+    """Submit every query asynchronously and yield (name, df, error) as each one finishes
+
+    All status polling happens on the calling thread, so a render with many long
+    queries holds one connection at a time rather than one thread per query.
+    With a breaker, submissions fail at once while it is open and failed
+    submissions count towards tripping it. These queries are long by design,
+    so their run time is not held against the warehouse.
+    """
+    def track(sql):
+        with pool.connection() as conn:
+            return tracker.track(conn, sql)
+
+    pending = {}
+    for name, sql in queries.items():
+        try:
+            pending[name] = (sql, breaker.call(track, sql) if breaker else track(sql))
+        except Exception as e:
+            yield name, None, f"Snowflake Error: {str(e)}"
+
+    deadline = time.monotonic() + timeout if timeout else None
+    while pending:
+        finished = []
+        with pool.connection() as conn:
+            for name, (sql, query_id) in pending.items():
+                state, error = query_state(conn, query_id)
+                if state == "running":
+                    continue
+                tracker.update(sql, query_id, state)
+                if error is None:
+                    try:
+                        finished.append((name, fetch_query_result(conn, query_id), None))
+                        continue
+                    except Exception as e:
+                        error = f"Snowflake Error: {str(e)}"
+                finished.append((name, None, error))
+        for name, df, error in finished:
+            del pending[name]
+            yield name, df, error
+
+        if pending:
+            if deadline is not None and time.monotonic() > deadline:
+                for name, (sql, query_id) in pending.items():
+                    yield name, None, f"Query {query_id} still running after {timeout}s"
+                return
+            time.sleep(poll_interval)
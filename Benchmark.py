@@ -0,0 +1,294 @@
+# Offline benchmark of Usage.py + Addon.py, the chat apps, Report.py and Fanout.py
+# against Fakeconnector. Every scenario runs in a fresh process with empty
+# caches, so its timings and peak memory are its own. Point --store at a
+# Sync.py store or one written by Generate.py and compare runs with --baseline.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import Sync
+
+HERE = Path(__file__).resolve().parent
+CHAT_APPS = ["Snowflakeresuly", "Executingthinking", "Executingthinking2", "Feedback"]
+# Sent through every chat app's own query path, on top of the SQL its canned answer holds
+CHAT_SQL = [
+    "select warehouse_name, count(*) as queries, avg(execution_time) / 1000 as avg_seconds from snowflake.account_usage.query_history group by 1 order by 2 desc",
+    "select user_name, sum(credits_used_cloud_services) as cs_credits from snowflake.account_usage.query_history group by 1 order by 2 desc limit 10",
+]
+# Sections of the two dashboard pages, all opened so every panel renders
+SECTION_KEYS = [
+    "group_credits_jobs", "group_query_performance", "group_cloud_storage", "group_logins",
+    "group_storage", "group_query_perf", "group_warehouse", "group_cost"
+]
+FAKE_SECRETS = {"account": "fake", "user": "benchmark", "password": "", "warehouse": "BENCHMARK", "database": "SNOWFLAKE", "schema": "ACCOUNT_USAGE"}
+# A metric this much worse than the baseline counts as a regression
+REGRESSION_THRESHOLD = 0.2
+COMPARED_METRICS = ["total_seconds", "peak_rss_mb", "rows", "queries"]
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+#############################################
+#     PANEL TIMINGS
+#############################################
+def _install_timers(timings):
+    """Record each panel's wall time as the pages and Report.py run their loaders"""
+    import Asyncquery
+    import Panelexecutor
+
+    run_panels = Panelexecutor.run_panels
+    run_queries_async = Asyncquery.run_queries_async
+
+    def timed(name, loader):
+        def run():
+            started = time.perf_counter()
+            try:
+                return loader()
+            finally:
+                timings[name] = round(time.perf_counter() - started, 4)
+        return run
+
+    def timed_run_panels(loaders, *args, **kwargs):
+        return run_panels({name: timed(name, loader) for name, loader in loaders.items()}, *args, **kwargs)
+
+    def timed_run_queries_async(pool, queries, *args, **kwargs):
+        started = time.perf_counter()
+        for name, df, error in run_queries_async(pool, queries, *args, **kwargs):
+            timings[name] = round(time.perf_counter() - started, 4)
+            yield name, df, error
+
+    Panelexecutor.run_panels = timed_run_panels
+    Asyncquery.run_queries_async = timed_run_queries_async
+
+#############################################
+#     SCENARIOS
+#############################################
+def _app_test(script, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_string(script, default_timeout=timeout)
+    at.secrets["snowflake"] = FAKE_SECRETS
+    return at
+
+def _app_errors(at):
+    errors = [str(e.value) for e in at.exception]
+    return errors + [str(e.value) for e in at.error]
+
+def _dashboard(args, fake, timings, warm_runs):
+    script = (
+        f"exec(compile(open({str(HERE / 'Usage.py')!r}).read() + '\\n' + open({str(HERE / 'Addon.py')!r}).read(), 'Usage.py', 'exec'))"
+    )
+    at = _app_test(script, args.timeout)
+    for key in SECTION_KEYS:
+        at.session_state[key] = True
+    for _ in range(warm_runs):
+        at.run()
+    fake.reset_stats()
+    timings.clear()
+    started = time.perf_counter()
+    at.run()
+    return time.perf_counter() - started, _app_errors(at)
+
+def scenario_usage(args, fake, timings):
+    """Usage.py + Addon.py with every section open, on cold caches"""
+    return _dashboard(args, fake, timings, warm_runs=0)
+
+def scenario_usage_warm(args, fake, timings):
+    """The same page rendered again in the same process, as a returning visitor sees it"""
+    return _dashboard(args, fake, timings, warm_runs=1)
+
+def scenario_chat(args, fake, timings):
+    """CHAT_SQL and every chat app's canned SQL through its own execute_snowflake_query
+
+    The canned answers select from a placeholder table no store has, they are
+    only sent with --synthetic-rows to answer them.
+    """
+    script = f"""
+import importlib, time
+import streamlit as st
+timings = st.session_state.setdefault("timings", {{}})
+errors = st.session_state.setdefault("errors", [])
+for module in {CHAT_APPS!r}:
+    app = importlib.import_module(module)
+    queries = list({CHAT_SQL!r})
+    canned = None
+    if {args.synthetic_rows!r}:
+        try:
+            canned = app.extract_sql_query(app.get_response("Show me a sample of the data"))
+        except Exception:
+            pass
+    if canned:
+        queries.append(canned)
+    for i, sql in enumerate(queries):
+        started = time.perf_counter()
+        df, error = app.execute_snowflake_query(sql)
+        timings[f"{{module}}:{{i}}"] = round(time.perf_counter() - started, 4)
+        if error:
+            errors.append(f"{{module}}: {{error}}")
+"""
+    at = _app_test(script, args.timeout)
+    started = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started
+    timings.update(at.session_state["timings"])
+    return elapsed, _app_errors(at) + list(at.session_state["errors"])
+
+def scenario_report(args, fake, timings):
+    """Report.py's batch run of every panel"""
+    import datetime
+    from Pool import ConnectionPool
+    import Report
+
+    end = datetime.date.today()
+    start = end - datetime.timedelta(days=args.days)
+    pool = ConnectionPool(FAKE_SECRETS, min_size=1, max_size=args.workers)
+    started = time.perf_counter()
+    try:
+        errors = Report.run_report(pool, start, end, Path(tempfile.mkdtemp()), args.workers)
+    finally:
+        pool.close()
+    return time.perf_counter() - started, [f"{name}: {error}" for name, error in errors.items()]
+
+def scenario_fanout(args, fake, timings):
+    """Fanout.py's collection of every panel from --accounts copies of the store's account"""
+    import datetime
+    import Fanout
+
+    end = datetime.date.today()
+    start = end - datetime.timedelta(days=args.days)
+    profiles = {f"account_{i:02d}": dict(FAKE_SECRETS, account=f"fake{i}") for i in range(args.accounts)}
+    started = time.perf_counter()
+    frames, errors, seconds = Fanout.collect(profiles, start, end, workers=args.account_workers)
+    elapsed = time.perf_counter() - started
+    timings.update(seconds)
+    return elapsed, [f"{account} {name}: {error}" for account, panels in errors.items() for name, error in panels.items()]
+
+SCENARIOS = {
+    "usage": scenario_usage,
+    "usage-warm": scenario_usage_warm,
+    "chat": scenario_chat,
+    "report": scenario_report,
+    "fanout": scenario_fanout,
+}
+
+def run_scenario(name, args):
+    """Run one scenario in this process, which must not have loaded the apps yet"""
+    os.environ["USAGE_LOCAL_SQL"] = "1" if args.local_sql else "0"
+    os.environ["USAGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="usage-bench-")
+    os.environ["USAGE_PREWARM"] = "0"
+    os.environ["USAGE_SHARED_CACHE"] = ""
+
+    from Fakeconnector import FakeSnowflake
+
+    fake = FakeSnowflake(args.store, args.latency, args.jitter, args.row_latency, args.result_scale, args.synthetic_rows).install()
+    timings = {}
+    _install_timers(timings)
+    elapsed, errors = SCENARIOS[name](args, fake, timings)
+    return {
+        "scenario": name,
+        "total_seconds": round(elapsed, 3),
+        "panels": dict(sorted(timings.items(), key=lambda item: -item[1])),
+        "peak_rss_mb": _peak_rss_mb(),
+        "errors": errors,
+        **fake.stats()
+    }
+
+#############################################
+#     REPORTING
+#############################################
+def print_result(result, top=10):
+    print(f"== {result['scenario']}: {result['total_seconds']:.2f}s, peak RSS {result['peak_rss_mb']} MB, "
+          f"{result['queries']} queries, {result['rows']:,} rows, {result['bytes'] / 1048576:.1f} MB transferred, "
+          f"{result['connections']} connections")
+    for name, seconds in list(result["panels"].items())[:top]:
+        print(f"   {seconds:8.3f}s  {name}")
+    for error in result["errors"]:
+        print(f"   error: {error[:200]}")
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Lines describing every metric more than threshold worse than in baseline"""
+    previous = {result["scenario"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(result["scenario"])
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), result.get(metric)
+            if old and new is not None and new > old * (1 + threshold):
+                regressions.append(f"{result['scenario']} {metric}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the apps offline against a local stand-in for Snowflake")
+    parser.add_argument("scenarios", nargs="*", help=f"scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--store", default=str(Sync.STORE_DIR), help="Parquet store the fake answers from")
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds every query takes")
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- share of latency picked at random")
+    parser.add_argument("--row-latency", type=float, default=0.001, help="extra seconds per 1000 result rows")
+    parser.add_argument("--result-scale", type=float, default=1.0, help="multiply every result's row count")
+    parser.add_argument("--synthetic-rows", type=int, default=0, help="answer raw queries DuckDB can't run (the chat apps' canned SQL) with this many rows instead of failing them")
+    parser.add_argument("--local-sql", action="store_true", help="let the apps answer from their local store too")
+    parser.add_argument("--days", type=int, default=30, help="date range of the report scenario")
+    parser.add_argument("--workers", type=int, default=8, help="connections for the report scenario")
+    parser.add_argument("--accounts", type=int, default=10, help="accounts for the fanout scenario")
+    parser.add_argument("--account-workers", type=int, default=4, help="queries in flight per account for the fanout scenario")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds a page run may take")
+    parser.add_argument("--json", help="write the results here")
+    parser.add_argument("--baseline", help="results of an earlier run to check for regressions")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scenario(args.child, args)))
+        return
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario {', '.join(unknown)}, expected one of {', '.join(SCENARIOS)}")
+
+    child_args = [
+        "--store", str(Path(args.store).resolve()), "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--row-latency", str(args.row_latency), "--result-scale", str(args.result_scale),
+        "--synthetic-rows", str(args.synthetic_rows), "--days", str(args.days), "--workers", str(args.workers),
+        "--accounts", str(args.accounts), "--account-workers", str(args.account_workers),
+        "--timeout", str(args.timeout)
+    ] + (["--local-sql"] if args.local_sql else [])
+    results, failed = [], []
+    for name in args.scenarios or list(SCENARIOS):
+        proc = subprocess.run([sys.executable, str(HERE / "Benchmark.py"), "--child", name] + child_args,
+                              capture_output=True, text=True, cwd=HERE)
+        if proc.returncode != 0:
+            print(f"== {name}: failed\n{proc.stderr[-2000:]}")
+            failed.append(name)
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print_result(result)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    regressions = []
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()))
+        for line in regressions:
+            print(f"REGRESSION {line}")
+    # Timings of a run where a scenario or panel failed aren't comparable, fail it like a regression
+    failed += [result["scenario"] for result in results if result["errors"]]
+    if failed:
+        print(f"FAILED {', '.join(failed)}")
+    raise SystemExit(1 if failed or regressions else 0)
+
+if __name__ == "__main__":
+    main()
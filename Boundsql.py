@@ -0,0 +1,91 @@
+# Dashboard SQL with bind variables instead of inlined dates. A template's
+# '{start}' and '{end}' placeholders become :1 and :2, so every window of a
+# panel sends the same statement text and only the bound values differ, and
+# windows are whole days, so two people asking for "last 30 days" on the same
+# day bind the same values. Snowflake's result cache and the caches here then
+# see one request instead of two.
+import datetime
+import re
+
+# Templates quote their placeholders, as they did when the values were inlined
+PLACEHOLDER = re.compile(r"'\{(\w+)\}'")
+# A :n bind outside string literals
+_BIND = re.compile(r"'(?:[^']|'')*'|:(\d+)\b")
+
+class BoundSql(str):
+    """Statement text with :n placeholders, carrying the values to bind in params
+
+    It is the text everywhere a string is expected, but it only equals (and
+    hashes like) another BoundSql with the same values, so caches keyed on it
+    keep windows apart. With no values it is just its text, and equals and
+    hashes like the plain str.
+    """
+
+    def __new__(cls, text, params=()):
+        sql = super().__new__(cls, text)
+        sql.params = tuple(params)
+        return sql
+
+    def __eq__(self, other):
+        return str.__eq__(self, other) and params_of(other) == self.params
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        if not self.params:
+            return str.__hash__(self)
+        return hash((str(self), self.params))
+
+    def __reduce__(self):
+        return BoundSql, (str(self), self.params)
+
+    def __repr__(self):
+        return f"BoundSql({str(self)!r}, {self.params!r})"
+
+def _bind_value(value):
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+def bind(template, **values):
+    """template with its quoted {name} placeholders as :n binds and values to bind"""
+    names = []
+
+    def placeholder(match):
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f":{names.index(name) + 1}"
+
+    text = PLACEHOLDER.sub(placeholder, template)
+    return BoundSql(text, [_bind_value(values[name]) for name in names])
+
+def bind_window(template, start, end):
+    """template bound to the whole days start..end (both included) as [start, end + 1 day)"""
+    start, end = _day(start), _day(end)
+    return bind(template, start=start, end=end + datetime.timedelta(days=1))
+
+def _day(value):
+    return value.date() if isinstance(value, datetime.datetime) else value
+
+def params_of(sql):
+    return getattr(sql, "params", ())
+
+def inline(sql):
+    """Plain SQL with the bound values written in as literals, for engines without binds"""
+    params = params_of(sql)
+    if not params:
+        return str(sql)
+
+    def literal(match):
+        if match.group(1) is None:
+            return match.group(0)
+        value = params[int(match.group(1)) - 1]
+        if isinstance(value, str):
+            return "'" + value.replace("'", "''") + "'"
+        return str(value)
+
+    return _BIND.sub(literal, sql)
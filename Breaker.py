@@ -0,0 +1,158 @@
+import collections
+import threading
+import time
+
+from Fetch import fetch_dataframe
+
+# Trip once at least MIN_CALLS of the last WINDOW calls were made and this share of them failed
+ERROR_RATE = 0.5
+MIN_CALLS = 4
+WINDOW = 20
+# A call slower than this counts as a failure, a queued or overloaded warehouse trips like a dead one
+SLOW_CALL_SECONDS = 120
+# While open, the background probe tries the warehouse this often
+PROBE_INTERVAL = 30
+# Cheap query that still needs the warehouse to be running
+PROBE_SQL = "select count(*) from snowflake.account_usage.warehouse_metering_history where start_time >= dateadd(hour, -1, current_timestamp())"
+# Last good results kept per process for callers with no cache of their own
+LAST_GOOD_SIZE = 256
+
+# SQLSTATE classes that are the query's fault (syntax, access, bad data), not the warehouse's
+QUERY_ERROR_CLASSES = ("22", "42")
+
+class CircuitOpen(Exception):
+    """Raised instead of running a query while its warehouse's breaker is open"""
+
+def is_query_error(e):
+    return (getattr(e, "sqlstate", None) or "").startswith(QUERY_ERROR_CLASSES)
+
+class CircuitBreaker:
+    """Error rate and latency breaker for one warehouse
+
+    closed: calls go through and their outcome is recorded.
+    open: calls fail at once with CircuitOpen, a background thread runs probe
+    every probe_interval seconds and closes the breaker when it succeeds.
+    """
+
+    def __init__(self, name, probe, error_rate=ERROR_RATE, min_calls=MIN_CALLS, window=WINDOW,
+                 slow_call_seconds=SLOW_CALL_SECONDS, probe_interval=PROBE_INTERVAL):
+        self.name = name
+        self.probe = probe
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.probe_interval = probe_interval
+        self.opened_at = None
+        self.last_error = None
+        self._outcomes = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._probe_thread = None
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def message(self):
+        since = time.strftime("%H:%M:%S", time.localtime(self.opened_at)) if self.opened_at else "-"
+        return f"Warehouse {self.name} is unavailable since {since} ({self.last_error})"
+
+    def record(self, ok, elapsed, error=None):
+        """Record one call's outcome, tripping the breaker when the window looks bad"""
+        if ok and elapsed > self.slow_call_seconds:
+            ok, error = False, f"query took {elapsed:.0f}s"
+        with self._lock:
+            self._outcomes.append(ok)
+            if not ok:
+                self.last_error = error
+            failures = self._outcomes.count(False)
+            if self.opened_at is None and len(self._outcomes) >= self.min_calls \
+                    and failures / len(self._outcomes) >= self.error_rate:
+                self._trip()
+
+    def _trip(self):
+        self.opened_at = time.time()
+        if self._probe_thread is None or not self._probe_thread.is_alive():
+            self._probe_thread = threading.Thread(target=self._probe_loop, name=f"breaker-{self.name}", daemon=True)
+            self._probe_thread.start()
+
+    def _probe_loop(self):
+        while self.is_open:
+            time.sleep(self.probe_interval)
+            started = time.monotonic()
+            try:
+                self.probe()
+            except Exception as e:
+                self.last_error = str(e)
+                continue
+            if time.monotonic() - started <= self.slow_call_seconds:
+                self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.opened_at = None
+            self._outcomes.clear()
+
+    def call(self, fn, *args):
+        if self.is_open:
+            raise CircuitOpen(self.message())
+        started = time.monotonic()
+        try:
+            result = fn(*args)
+        except Exception as e:
+            if not is_query_error(e):
+                self.record(False, time.monotonic() - started, str(e))
+            raise
+        self.record(True, time.monotonic() - started)
+        return result
+
+class LastGood:
+    """Bounded map of query -> (last successful DataFrame, when it was fetched)"""
+
+    def __init__(self, size=LAST_GOOD_SIZE):
+        self.size = size
+        self._results = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, query, df):
+        with self._lock:
+            self._results[query] = (df, time.time())
+            self._results.move_to_end(query)
+            while len(self._results) > self.size:
+                self._results.popitem(last=False)
+
+    def get(self, query):
+        with self._lock:
+            return self._results.get(query)
+
+last_good = LastGood()
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def _pool_fetch(pool, query):
+    with pool.connection() as conn:
+        return fetch_dataframe(conn, query)
+
+def breaker_for(pool):
+    """The process-wide breaker for the warehouse pool's connections run on"""
+    warehouse = (pool.connect_args.get("warehouse") or "DEFAULT").upper()
+    with _breakers_lock:
+        if warehouse not in _breakers:
+            _breakers[warehouse] = CircuitBreaker(warehouse, lambda: _pool_fetch(pool, PROBE_SQL))
+        return _breakers[warehouse]
+
+def guarded_fetch(pool, query):
+    """Run query through its warehouse's breaker, remembering the result for stale fallback"""
+    df = breaker_for(pool).call(_pool_fetch, pool, query)
+    last_good.put(query, df)
+    return df
+
+def fetch_or_last_good(pool, query):
+    """(df, None) from Snowflake, or (last good df, notice) while the breaker is open"""
+    try:
+        return guarded_fetch(pool, query), None
+    except CircuitOpen as e:
+        cached = last_good.get(query)
+        if cached is None:
+            raise
+        df, fetched_at = cached
+        return df, f"{e}. Showing the result from {time.strftime('%H:%M:%S', time.localtime(fetched_at))}."
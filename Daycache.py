@@ -0,0 +1,326 @@
+import datetime
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+import Sync
+from Boundsql import bind_window
+from Localsql import local_synced_at
+
+# Days that can still change (today, and yesterday until ACCOUNT_USAGE has caught up)
+PARTITION_TTL = 600
+# ACCOUNT_USAGE views lag by up to ~3h, a day is closed once this has passed after midnight
+CLOSE_LATENCY = datetime.timedelta(hours=3)
+# Days are cut at midnight in the Snowflake session's TIMEZONE, not the host's: its
+# default unless the account or user changed it
+SESSION_TIMEZONE = ZoneInfo(os.environ.get("USAGE_SESSION_TIMEZONE", "America/Los_Angeles"))
+# Closed days never change and are kept on disk indefinitely, memory only holds recently used ones
+CLOSED_MEMORY_TTL = 3600
+CACHE_DIR = Path(os.environ.get("USAGE_CACHE_DIR", "usage_cache"))
+DAY_COLUMN = "USAGE_DAY"
+
+class DailyQuery:
+    """A dashboard query split into one partition per day
+
+    sql is a template with '{start}' and '{end}' placeholders (end exclusive),
+    sent with the days as bind variables, that returns one or more rows per
+    day tagged with a USAGE_DAY column. merge turns
+    the concatenated partitions for the requested window into the panel's frame.
+    """
+
+    def __init__(self, name, sql, merge):
+        self.name = name
+        self.sql = sql
+        self.merge = merge
+
+def is_closed(day, now=None):
+    """True once nothing more can land in day's partition
+
+    now is how current the data is: a result answered from the synced local
+    store is only as current as its sync, not the time it was read. The day
+    ends at midnight in SESSION_TIMEZONE, a naive now is taken as host time.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    if now.tzinfo is None:
+        now = now.astimezone()
+    day_end = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time(), SESSION_TIMEZONE)
+    return day_end + CLOSE_LATENCY <= now
+
+#############################################
+#     ARROW IPC FILES
+#############################################
+def _string_dtype():
+    """Arrow-backed strings that compare like numpy ones (missing -> NaN, not pd.NA)"""
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:
+        return pd.StringDtype("pyarrow_numpy")
+
+STRING_DTYPE = _string_dtype()
+
+def _map_type(arrow_type):
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return STRING_DTYPE
+    return None
+
+def write_ipc(df, path):
+    """Write df to path as an uncompressed Arrow IPC file, replacing it atomically"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+def map_ipc(path):
+    """DataFrame over a memory-mapped IPC file
+
+    Strings stay in Arrow buffers and numeric blocks are not consolidated, so
+    neither is copied: the frame reads straight from the page cache, which every
+    process mapping the same file shares.
+    """
+    table = ipc.open_file(pa.memory_map(str(path))).read_all()
+    return table.to_pandas(split_blocks=True, types_mapper=_map_type)
+
+#############################################
+#     PARTITION CACHE
+#############################################
+class PartitionCache:
+    """Process-wide cache of (query template, day) -> DataFrame, tiered by freshness
+
+    Every partition is written to cache_dir as an Arrow IPC file and served
+    memory-mapped from there, so resident memory doesn't grow with the number of
+    cached days and workers on one host read each other's partitions. Open days
+    expire after ttl and are fetched again, the expired frame is kept as the
+    fallback if that fetch fails. Closed days are fetched once and from then on
+    are only ever read back. store is the synced local store the cached queries
+    may be answered from, whose sync time decides when those days are closed.
+    """
+
+    def __init__(self, ttl=PARTITION_TTL, cache_dir=CACHE_DIR, closed_memory_ttl=CLOSED_MEMORY_TTL, store=Sync.STORE_DIR):
+        self.ttl = ttl
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.store = store
+        self.closed_memory_ttl = closed_memory_ttl
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key, day, closed):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        suffix = ".arrow" if closed else ".open.arrow"
+        return self.cache_dir / digest / f"{day.isoformat()}{suffix}"
+
+    def _read(self, key, day, closed, max_age=None):
+        """(mapped frame, file time) for a partition on disk, None if missing or older than max_age"""
+        if self.cache_dir is None:
+            return None
+        path = self._path(key, day, closed)
+        try:
+            stored_at = path.stat().st_mtime
+            if max_age is not None and time.time() - stored_at > max_age:
+                return None
+            return map_ipc(path), stored_at
+        except (OSError, pa.ArrowInvalid):
+            return None
+
+    def _write(self, key, day, df, closed):
+        """Persist df and return the mapped copy to serve, None if it couldn't be written"""
+        if self.cache_dir is None:
+            return None
+        path = self._path(key, day, closed)
+        try:
+            write_ipc(df, path)
+            if closed:
+                self._path(key, day, False).unlink(missing_ok=True)
+            return map_ipc(path)
+        except (OSError, ValueError, TypeError, pa.ArrowException):
+            # Not persisted, this process keeps its own copy and the next one fetches it again
+            return None
+
+    def get(self, key, day):
+        with self._lock:
+            entry = self._partitions.get((key, day))
+            if entry is not None:
+                # A partition fetched while its day was open keeps the short TTL even after the day closes
+                df, fetched_at, closed = entry
+                if time.time() - fetched_at <= (self.closed_memory_ttl if closed else self.ttl):
+                    return df
+                if closed:
+                    del self._partitions[(key, day)]
+
+        # Another process may have fetched it already
+        if is_closed(day):
+            found = self._read(key, day, True)
+            if found is not None:
+                found = (found[0], time.time())
+            closed = True
+        else:
+            found = self._read(key, day, False, max_age=self.ttl)
+            closed = False
+        if found is None:
+            return None
+        df, fetched_at = found
+        with self._lock:
+            self._partitions[(key, day)] = (df, fetched_at, closed)
+        return df
+
+    def get_stale(self, key, day):
+        """Last frame fetched for (key, day) however old it is, None if there never was one"""
+        with self._lock:
+            entry = self._partitions.get((key, day))
+        if entry is not None:
+            return entry[0]
+        found = self._read(key, day, True) or self._read(key, day, False)
+        return found[0] if found is not None else None
+
+    def is_final(self, key, day):
+        """True when the partition held for (key, day) is in the closed tier"""
+        with self._lock:
+            entry = self._partitions.get((key, day))
+        if entry is not None:
+            return entry[2]
+        return self.cache_dir is not None and self._path(key, day, True).exists()
+
+    def put(self, key, day, df, closed=None):
+        """Store df for (key, day) and return the frame to use from now on (the mapped copy when persisted)
+
+        closed: whether df is final, by default whether day is closed by now.
+        A partition that isn't stays on the open TTL and is fetched again.
+        """
+        closed = is_closed(day) if closed is None else closed
+        mapped = self._write(key, day, df, closed)
+        if mapped is not None:
+            df = mapped
+        with self._lock:
+            self._partitions[(key, day)] = (df, time.time(), closed)
+        return df
+
+partition_cache = PartitionCache()
+
+# The last window's concatenated frame per (cache, query), reused while its partitions are unchanged
+_combined = {}
+_combined_lock = threading.Lock()
+# Panels sharing a query template load it one at a time, the ones waiting find
+# the first one's partitions. Each cache (one per account in Fanout.py) has its own.
+_query_locks = {}
+
+def _query_lock(cache, sql):
+    with _combined_lock:
+        return _query_locks.setdefault((cache, sql), threading.Lock())
+
+def as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+def days_between(start, end):
+    """Every calendar day from start to end, both included"""
+    start, end = as_date(start), as_date(end)
+    return [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)]
+
+def contiguous_runs(days):
+    """Group sorted days into [first, last] runs so each gap is fetched with one query"""
+    runs = []
+    for day in days:
+        if runs and day - runs[-1][1] == datetime.timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+def split_by_day(df, days):
+    """One frame per requested day, empty frames for days that returned no rows"""
+    if df.empty:
+        return {day: df for day in days}
+    day_values = pd.to_datetime(df[DAY_COLUMN]).dt.date
+    groups = {day: part for day, part in df.groupby(day_values, sort=False)}
+    return {day: groups.get(day, df.iloc[0:0]) for day in days}
+
+def load_daily(query, start, end, run, cache=None):
+    """Return query's merged frame for start..end, fetching only the days not in cache"""
+    cache = partition_cache if cache is None else cache
+    days = days_between(start, end)
+
+    with _query_lock(cache, query.sql):
+        partitions = {}
+        missing = []
+        for day in days:
+            df = cache.get(query.sql, day)
+            if df is None:
+                missing.append(day)
+            else:
+                partitions[day] = df
+
+        for first, last in contiguous_runs(missing):
+            run_days = days_between(first, last)
+            sql = bind_window(query.sql, first, last)
+            # Days answered from a store synced before they closed aren't complete yet
+            as_of = local_synced_at(sql, cache.store)
+            try:
+                fetched = split_by_day(run(sql), run_days)
+            except Exception:
+                # Snowflake is failing or short-circuited, serve the last frames we had for these days
+                stale = {day: cache.get_stale(query.sql, day) for day in run_days}
+                if any(df is None for df in stale.values()):
+                    raise
+                partitions.update(stale)
+                continue
+            for day, df in fetched.items():
+                partitions[day] = cache.put(query.sql, day, df, is_closed(day, as_of))
+
+    frames = [partitions[day] for day in days]
+    with _combined_lock:
+        memo = _combined.get((cache, query.sql))
+    if memo is not None and len(memo[0]) == len(frames) and all(a is b for a, b in zip(memo[0], frames)):
+        combined = memo[1]
+    else:
+        non_empty = [df for df in frames if not df.empty]
+        combined = pd.concat(non_empty, ignore_index=True) if non_empty else frames[0]
+        with _combined_lock:
+            _combined[(cache, query.sql)] = (frames, combined)
+    return query.merge(combined)
+
+#############################################
+#     COMMON MERGES
+#############################################
+def merge_total(column, digits=None):
+    """Single-row total of column across all days"""
+    def merge(df):
+        total = df[column].sum() if not df.empty else 0
+        if digits is not None:
+            total = round(total, digits)
+        return pd.DataFrame({column: [total]})
+    return merge
+
+def merge_group_sum(keys, value, limit=None):
+    """Re-aggregate a per-day sum by keys, largest first"""
+    def merge(df):
+        out = df.groupby(keys, as_index=False, dropna=False)[value].sum()
+        out = out.sort_values(value, ascending=False)
+        if limit is not None:
+            out = out.head(limit)
+        return out.reset_index(drop=True)
+    return merge
+
+def merge_average(keys, sum_column, count_column, output, scale=1):
+    """Re-aggregate a per-day sum and count into an average"""
+    def merge(df):
+        out = df.groupby(keys, as_index=False, dropna=False)[[sum_column, count_column]].sum()
+        out[output] = out[sum_column] / out[count_column].where(out[count_column] != 0) / scale
+        out = out.drop(columns=[sum_column, count_column])
+        return out.sort_values(output, ascending=False).reset_index(drop=True)
+    return merge
+
+def merge_top(value, limit, columns):
+    """Global top rows from per-day top rows"""
+    def merge(df):
+        return df.sort_values(value, ascending=False).head(limit)[columns].reset_index(drop=True)
+    return merge
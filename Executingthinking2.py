@@ -1,9 +1,9 @@
 import streamlit as st
 from datetime import datetime
 import time
-import pandas as pd
-import snowflake.connector
 from snowflake.connector.errors import ProgrammingError, OperationalError
+from Pool import ConnectionPool
+from Breaker import CircuitOpen, fetch_or_last_good
 
 # Initialize session state variables
 def init_session_state():
@@ -129,35 +129,32 @@ def load_custom_css():
         </style>
     """, unsafe_allow_html=True)
 
-def get_snowflake_connection():
-    try:
-        conn = snowflake.connector.connect(
-            user=st.secrets["snowflake"]["user"],
-            password=st.secrets["snowflake"]["password"],
-            account=st.secrets["snowflake"]["account"],
-            warehouse=st.secrets["snowflake"]["warehouse"],
-            database=st.secrets["snowflake"]["database"],
-            schema=st.secrets["snowflake"]["schema"]
-        )
-        return conn
-    except Exception as e:
-        st.error(f"Failed to connect to Snowflake: {str(e)}")
-        return None
+@st.cache_resource
+def get_connection_pool():
+    return ConnectionPool(
+        {
+            "user": st.secrets["snowflake"]["user"],
+            "password": st.secrets["snowflake"]["password"],
+            "account": st.secrets["snowflake"]["account"],
+            "warehouse": st.secrets["snowflake"]["warehouse"],
+            "database": st.secrets["snowflake"]["database"],
+            "schema": st.secrets["snowflake"]["schema"]
+        },
+        **st.secrets.get("snowflake_pool", {})
+    )
 
 def execute_snowflake_query(query):
     try:
-        conn = get_snowflake_connection()
-        if conn:
-            df = pd.read_sql(query, conn)
-            conn.close()
-            return df, None
+        df, stale_notice = fetch_or_last_good(get_connection_pool(), query)
+        if stale_notice:
+            st.warning(stale_notice, icon="⚠️")
+        return df, None
+    except CircuitOpen as e:
+        return None, f"Snowflake Error: {str(e)}"
     except (ProgrammingError, OperationalError) as e:
         return None, f"Snowflake Error: {str(e)}"
     except Exception as e:
         return None, f"Error: {str(e)}"
-    finally:
-        if conn:
-            conn.close()
 
 def get_response(user_input):
     # Simulate response delay
@@ -0,0 +1,207 @@
+# Local stand-in for snowflake.connector, for benchmarking the apps with no
+# network. ACCOUNT_USAGE queries are answered by DuckDB over a Parquet store
+# laid out like Sync.py's, with injected latency, so pooling, caching and
+# parallelism behave as they would against a warehouse.
+import itertools
+import random
+import threading
+import time
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+import snowflake.connector
+from snowflake.connector.constants import QueryStatus
+from snowflake.connector.errors import ProgrammingError
+
+import Localsql
+import Sync
+from Boundsql import BoundSql, inline
+
+# Rows per Arrow batch handed out by fetch_arrow_batches, like the connector's result chunks
+BATCH_ROWS = 100_000
+
+class FakeSnowflake:
+    """Answers queries from store and keeps count of what was sent and returned
+
+    latency: seconds every query takes before its result is ready (queue,
+      compile and execution), jitter: +/- share of it picked at random.
+    row_latency: extra seconds per 1000 result rows (transfer).
+    result_scale: result rows are repeated or cut to this multiple of the real
+      count, to try bigger or smaller results on the same store.
+    synthetic_rows: when set, rows returned for queries that reference no
+      view and DuckDB can't run (chat app sandbox queries) instead of failing
+      them. Off by default, so broken SQL fails as it would in Snowflake.
+    """
+
+    def __init__(self, store=Sync.STORE_DIR, latency=0.0, jitter=0.0, row_latency=0.0,
+                 result_scale=1.0, synthetic_rows=0, seed=0):
+        self.store = store
+        self.latency = latency
+        self.jitter = jitter
+        self.row_latency = row_latency
+        self.result_scale = result_scale
+        self.synthetic_rows = synthetic_rows
+        self.queries = 0
+        self.rows = 0
+        self.bytes = 0
+        self.connections = 0
+        self._results = {}
+        self._ids = itertools.count(1)
+        self._random = random.Random(seed)
+        self._db = duckdb.connect()
+        self._lock = threading.Lock()
+
+    def connect(self, **connect_args):
+        with self._lock:
+            self.connections += 1
+        return FakeConnection(self)
+
+    def install(self):
+        """Make snowflake.connector.connect open fake connections"""
+        snowflake.connector.connect = self.connect
+        return self
+
+    def _answer(self, sql):
+        """Result table for sql, or the ProgrammingError Snowflake would raise"""
+        raw = not Localsql.referenced_views(sql)
+        if raw:
+            local_sql = sql.strip().rstrip(";")
+        else:
+            try:
+                local_sql = Localsql.translate(sql, self.store, require_synced=False)
+            except Localsql.Untranslatable as e:
+                raise ProgrammingError(f"Fake Snowflake can't run this query: {e}", sqlstate="42000")
+        cur = self._db.cursor()
+        try:
+            table = cur.execute(local_sql).fetch_arrow_table()
+        except duckdb.Error as e:
+            if raw and self.synthetic_rows:
+                return self._scale(self._synthetic())
+            raise ProgrammingError(f"Fake Snowflake failed: {e}", sqlstate="42000")
+        finally:
+            cur.close()
+        table = table.rename_columns([name.upper() for name in table.column_names])
+        return self._scale(table)
+
+    def _synthetic(self):
+        n = self.synthetic_rows
+        return pa.table({"ID": np.arange(n), "NAME": [f"row {i}" for i in range(n)], "VALUE": np.random.default_rng(n).random(n)})
+
+    def _scale(self, table):
+        if self.result_scale == 1 or table.num_rows == 0:
+            return table
+        n = max(0, round(table.num_rows * self.result_scale))
+        return table.take(pa.array(np.arange(n) % table.num_rows))
+
+    def _delay(self, table):
+        spread = self.latency * self.jitter
+        with self._lock:
+            base = self.latency + self._random.uniform(-spread, spread)
+        return max(0.0, base) + self.row_latency * table.num_rows / 1000
+
+    def run(self, sql):
+        """(query id, result table, seconds until it is ready)"""
+        table = self._answer(sql)
+        with self._lock:
+            self.queries += 1
+            self.rows += table.num_rows
+            self.bytes += table.nbytes
+            query_id = f"fake-{next(self._ids):08d}"
+        return query_id, table, self._delay(table)
+
+    def submit(self, sql):
+        """Start sql asynchronously, it finishes after its delay"""
+        try:
+            query_id, table, delay = self.run(sql)
+            entry = (table, None, time.monotonic() + delay)
+        except ProgrammingError as e:
+            with self._lock:
+                query_id = f"fake-{next(self._ids):08d}"
+            entry = (None, e, time.monotonic() + self.latency)
+        with self._lock:
+            self._results[query_id] = entry
+        return query_id
+
+    def result(self, query_id):
+        with self._lock:
+            entry = self._results.get(query_id)
+        if entry is None:
+            raise ProgrammingError(f"Unknown query ID {query_id}", sqlstate="02000")
+        return entry
+
+    def reset_stats(self):
+        with self._lock:
+            self.queries = self.rows = self.bytes = self.connections = 0
+
+    def stats(self):
+        return {"queries": self.queries, "rows": self.rows, "bytes": self.bytes, "connections": self.connections}
+
+class FakeConnection:
+    def __init__(self, fake):
+        self.fake = fake
+        self._closed = False
+
+    def cursor(self):
+        return FakeCursor(self.fake)
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+    def get_query_status_throw_if_error(self, query_id):
+        table, error, ready_at = self.fake.result(query_id)
+        if time.monotonic() < ready_at:
+            return QueryStatus.RUNNING
+        if error is not None:
+            raise error
+        return QueryStatus.SUCCESS
+
+    @staticmethod
+    def is_still_running(status):
+        return status in (QueryStatus.RUNNING, QueryStatus.QUEUED)
+
+class FakeCursor:
+    def __init__(self, fake):
+        self.fake = fake
+        self.sfqid = None
+        self.description = None
+        self._table = None
+
+    def _set_result(self, table):
+        self._table = table
+        self.description = [(name,) for name in table.column_names]
+
+    def execute(self, sql, params=None):
+        query_id, table, delay = self.fake.run(inline(BoundSql(sql, params or ())))
+        time.sleep(delay)
+        self.sfqid = query_id
+        self._set_result(table)
+        return self
+
+    def execute_async(self, sql, params=None):
+        self.sfqid = self.fake.submit(inline(BoundSql(sql, params or ())))
+        return self
+
+    def get_results_from_sfqid(self, query_id):
+        table, error, ready_at = self.fake.result(query_id)
+        time.sleep(max(0.0, ready_at - time.monotonic()))
+        if error is not None:
+            raise error
+        self.sfqid = query_id
+        self._set_result(table)
+
+    def fetch_arrow_batches(self):
+        return iter(self._table.slice(offset, BATCH_ROWS) for offset in range(0, self._table.num_rows, BATCH_ROWS))
+
+    def fetchall(self):
+        return list(zip(*(col.to_pylist() for col in self._table.columns))) if self._table.num_columns else []
+
+    def fetchone(self):
+        rows = self.fetchall()
+        return rows[0] if rows else None
+
+    def close(self):
+        self._table = None
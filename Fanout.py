@@ -0,0 +1,149 @@
+# Every dashboard panel for every account of an organization at once.
+# ORGANIZATION_USAGE only carries a few of the views the panels read, so the
+# same ACCOUNT_USAGE queries run against each account instead, all accounts
+# concurrently and each capped at a few queries in flight, and the results are
+# merged into one frame per panel with an ACCOUNT column. The estate refreshes
+# in about the time of its slowest account. Profiles are the [accounts.<name>]
+# sections of secrets.toml, each with the connection parameters of one account.
+import argparse
+import concurrent.futures
+import datetime
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import Sync
+from Daycache import CACHE_DIR, PartitionCache
+from Fetch import fetch_dataframe
+from Localsql import run_local_or
+from Panelexecutor import run_panels
+from Pool import ConnectionPool
+from Report import report_loaders, write_frames
+
+# Queries one account has in flight at once, and so its connections
+PER_ACCOUNT_WORKERS = int(os.environ.get("USAGE_FANOUT_PER_ACCOUNT", 4))
+ACCOUNT_COLUMN = "ACCOUNT"
+FANOUT_DIR = Path(os.environ.get("USAGE_FANOUT_DIR", "usage_fanout"))
+
+_account_caches = {}
+_account_caches_lock = threading.Lock()
+
+def account_store(account, store_dir=Sync.STORE_DIR):
+    """One account's local store, kept by Sync.py --store like the single-account one"""
+    return Path(store_dir) / "accounts" / account
+
+def account_cache(account, cache_dir=CACHE_DIR):
+    """Day, cube and sketch partitions of one account, kept apart from every other account's"""
+    with _account_caches_lock:
+        if (account, cache_dir) not in _account_caches:
+            path = Path(cache_dir) / "accounts" / account if cache_dir is not None else None
+            _account_caches[(account, cache_dir)] = PartitionCache(cache_dir=path, store=account_store(account))
+        return _account_caches[(account, cache_dir)]
+
+def collect_account(account, profile, start, end, panels=None, workers=PER_ACCOUNT_WORKERS, cache=None):
+    """({panel: df}, {panel: error}) for one account, at most workers queries at a time"""
+    # No connection is opened up front, an unreachable account fails its panels one by one
+    pool = ConnectionPool(profile, min_size=0, max_size=workers)
+    cache = cache if cache is not None else account_cache(account)
+
+    def fetch(sql):
+        with pool.connection() as conn:
+            return fetch_dataframe(conn, sql)
+
+    def run(sql):
+        # Only ever the account's own store, its days close on that store's sync time
+        return run_local_or(sql, fetch, cache.store)
+
+    loaders = report_loaders(start, end, run, cache)
+    if panels is not None:
+        loaders = {name: loader for name, loader in loaders.items() if name in panels}
+    results, errors = {}, {}
+    try:
+        for name, df, error in run_panels(loaders, workers):
+            if error:
+                errors[name] = error
+            else:
+                results[name] = df
+    finally:
+        pool.close()
+    return results, errors
+
+def tag_frames(results):
+    """{panel: df} from {account: {panel: df}}, each account's rows tagged with its name"""
+    frames = {}
+    for account, panels in results.items():
+        for name, df in panels.items():
+            frames.setdefault(name, []).append(df.assign(**{ACCOUNT_COLUMN: account})[[ACCOUNT_COLUMN] + list(df.columns)])
+    return {name: pd.concat(parts, ignore_index=True) for name, parts in frames.items()}
+
+def collect(profiles, start, end, panels=None, workers=PER_ACCOUNT_WORKERS, max_accounts=None, cache_dir=CACHE_DIR):
+    """Run the panels for start..end against every account in profiles ({account: connection parameters})
+
+    Returns (account-tagged {panel: df}, {account: {panel: error}}, {account: seconds}).
+    Accounts all run at once unless max_accounts caps them, a failing account
+    only produces errors for itself.
+    """
+    results, errors, seconds = {}, {}, {}
+    if not profiles:
+        return {}, errors, seconds
+
+    def run_account(account):
+        started = time.perf_counter()
+        try:
+            return collect_account(account, profiles[account], start, end, panels, workers, account_cache(account, cache_dir))
+        finally:
+            seconds[account] = round(time.perf_counter() - started, 3)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_accounts or len(profiles), thread_name_prefix="account") as executor:
+        futures = {executor.submit(run_account, account): account for account in profiles}
+        for future in concurrent.futures.as_completed(futures):
+            account = futures[future]
+            try:
+                results[account], account_errors = future.result()
+            except Exception as e:
+                account_errors = {"collect": f"Error: {str(e)}"}
+            if account_errors:
+                errors[account] = account_errors
+    return tag_frames(dict(sorted(results.items()))), errors, seconds
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every dashboard panel against every account of an organization at once")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, help="first day (default: 30 days ago)")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="last day, included (default: today)")
+    parser.add_argument("--accounts", help="comma separated accounts to collect (default: every [accounts] profile)")
+    parser.add_argument("--panels", help="comma separated panels to collect (default: all)")
+    parser.add_argument("--workers", type=int, default=PER_ACCOUNT_WORKERS, help="queries in flight per account")
+    parser.add_argument("--max-accounts", type=int, help="accounts collected at once (default: all)")
+    parser.add_argument("--out", help=f"output directory (default: {FANOUT_DIR}/<end>)")
+    args = parser.parse_args()
+
+    end = args.end or datetime.date.today()
+    start = args.start or end - datetime.timedelta(days=30)
+    out_dir = Path(args.out) if args.out else FANOUT_DIR / end.isoformat()
+
+    import streamlit as st
+
+    profiles = {account: dict(profile) for account, profile in st.secrets["accounts"].items()}
+    if args.accounts:
+        wanted = args.accounts.split(",")
+        unknown = [account for account in wanted if account not in profiles]
+        if unknown:
+            parser.error(f"no [accounts] profile for {', '.join(unknown)}")
+        profiles = {account: profiles[account] for account in wanted}
+    panels = args.panels.split(",") if args.panels else None
+
+    frames, errors, seconds = collect(profiles, start, end, panels, args.workers, args.max_accounts)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    write_errors = write_frames(frames, out_dir)
+    if write_errors:
+        errors["(all)"] = write_errors
+    print(json.dumps({"seconds": seconds, "errors": errors}, indent=2))
+    print(f"{len(frames)} panels for {len(profiles)} accounts written to {out_dir}")
+    raise SystemExit(1 if errors else 0)
+
+if __name__ == "__main__":
+    main()
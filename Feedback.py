@@ -1,9 +1,10 @@
 import streamlit as st
 from datetime import datetime
 import time
-import pandas as pd
-import snowflake.connector
 from snowflake.connector.errors import ProgrammingError, OperationalError
+from Pool import ConnectionPool
+from Breaker import CircuitOpen, breaker_for, fetch_or_last_good
+from Asyncquery import submit_query, query_state, fetch_query_result, POLL_INTERVAL
 import csv
 import os
 from pathlib import Path
@@ -147,35 +148,32 @@ def load_custom_css():
         </style>
     """, unsafe_allow_html=True)
 
-def get_snowflake_connection():
-    try:
-        conn = snowflake.connector.connect(
-            user=st.secrets["snowflake"]["user"],
-            password=st.secrets["snowflake"]["password"],
-            account=st.secrets["snowflake"]["account"],
-            warehouse=st.secrets["snowflake"]["warehouse"],
-            database=st.secrets["snowflake"]["database"],
-            schema=st.secrets["snowflake"]["schema"]
-        )
-        return conn
-    except Exception as e:
-        st.error(f"Failed to connect to Snowflake: {str(e)}")
-        return None
+@st.cache_resource
+def get_connection_pool():
+    return ConnectionPool(
+        {
+            "user": st.secrets["snowflake"]["user"],
+            "password": st.secrets["snowflake"]["password"],
+            "account": st.secrets["snowflake"]["account"],
+            "warehouse": st.secrets["snowflake"]["warehouse"],
+            "database": st.secrets["snowflake"]["database"],
+            "schema": st.secrets["snowflake"]["schema"]
+        },
+        **st.secrets.get("snowflake_pool", {})
+    )
 
 def execute_snowflake_query(query):
     try:
-        conn = get_snowflake_connection()
-        if conn:
-            df = pd.read_sql(query, conn)
-            conn.close()
-            return df, None
+        df, stale_notice = fetch_or_last_good(get_connection_pool(), query)
+        if stale_notice:
+            st.warning(stale_notice, icon="⚠️")
+        return df, None
+    except CircuitOpen as e:
+        return None, f"Snowflake Error: {str(e)}"
     except (ProgrammingError, OperationalError) as e:
         return None, f"Snowflake Error: {str(e)}"
     except Exception as e:
         return None, f"Error: {str(e)}"
-    finally:
-        if conn:
-            conn.close()
 
 def get_response(user_input):
     # Simulate response delay
@@ -214,14 +212,31 @@ def display_message(is_user, message, timestamp, is_executing=False):
 
 def process_pending_queries():
     if st.session_state.pending_queries:
+        still_running = False
         for idx, query_info in enumerate(st.session_state.pending_queries):
             if not query_info.get('executed', False):
                 # Get original question and SQL query
                 original_question = st.session_state.chat_history[query_info['chat_idx'] - 1]['message']
                 sql_query = query_info['query']
                 
-                # Execute query
-                df, error = execute_snowflake_query(sql_query)
+                # Submit once, then only poll the query ID on later reruns
+                df, error = None, None
+                try:
+                    pool = get_connection_pool()
+                    with pool.connection() as conn:
+                        if 'query_id' not in query_info:
+                            # Fails at once while the warehouse's breaker is open
+                            query_info['query_id'] = breaker_for(pool).call(submit_query, conn, sql_query)
+                        state, error = query_state(conn, query_info['query_id'])
+                        if state == "running":
+                            still_running = True
+                            continue
+                        if state == "success":
+                            df = fetch_query_result(conn, query_info['query_id'])
+                except (ProgrammingError, OperationalError, CircuitOpen) as e:
+                    error = f"Snowflake Error: {str(e)}"
+                except Exception as e:
+                    error = f"Error: {str(e)}"
                 current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 
                 # Log feedback with SQL query and error status after execution
@@ -250,6 +265,11 @@ def process_pending_queries():
                 # Mark query as executed
                 st.session_state.pending_queries[idx]['executed'] = True
                 st.rerun()
+        
+        # Queries are still running in Snowflake, check again on the next rerun
+        if still_running:
+            time.sleep(POLL_INTERVAL)
+            st.rerun()
 
 def display_chat_history():
     for chat in st.session_state.chat_history:
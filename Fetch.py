@@ -0,0 +1,93 @@
+import os
+import time
+
+import pandas as pd
+from snowflake.connector.errors import NotSupportedError, ProgrammingError
+
+from Boundsql import params_of
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Arrow batch fetching is on by default, set USAGE_ARROW_FETCH=0 to go back to pd.read_sql
+USE_ARROW_FETCH = os.environ.get("USAGE_ARROW_FETCH", "1") != "0"
+
+def _column_names(cur):
+    return [col[0] for col in cur.description or []]
+
+def fetch_arrow_table(cur, batches=None):
+    """Collect the connector's Arrow result chunks for an executed cursor into one table"""
+    if batches is None:
+        batches = cur.fetch_arrow_batches()
+    tables = [batch for batch in batches if batch.num_rows]
+    if not tables:
+        return None
+    if len(tables) == 1:
+        return tables[0]
+    try:
+        return pa.concat_tables(tables)
+    except pa.ArrowInvalid:
+        # Chunks can disagree on integer width or timestamp unit, let Arrow unify them
+        return pa.concat_tables(tables, promote_options="permissive")
+
+def arrow_to_dataframe(table):
+    """Columnar Arrow -> pandas without going through Python row tuples"""
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+def cursor_to_dataframe(cur, timings=None):
+    """Build a DataFrame from an executed cursor, preferring the Arrow result chunks
+
+    timings, a dict, gets the size of the Arrow result as "bytes".
+    """
+    batches = None
+    if pa is not None:
+        try:
+            batches = cur.fetch_arrow_batches()
+        except (NotSupportedError, ProgrammingError):
+            # Result came back as JSON (SHOW/DESCRIBE etc.), use the row path below
+            batches = None
+    if batches is None:
+        return pd.DataFrame(cur.fetchall(), columns=_column_names(cur))
+
+    table = fetch_arrow_table(cur, batches)
+    if table is None:
+        return pd.DataFrame(columns=_column_names(cur))
+    if timings is not None:
+        timings["bytes"] = table.nbytes
+    return arrow_to_dataframe(table)
+
+def fetch_table(conn, query):
+    """Execute query and return the raw Arrow table (None when there are no rows)"""
+    cur = conn.cursor()
+    try:
+        cur.execute(query, params_of(query) or None)
+        return fetch_arrow_table(cur)
+    finally:
+        cur.close()
+
+def fetch_dataframe(conn, query, use_arrow=None, timings=None):
+    """Execute query on Snowflake and return results as DataFrame
+
+    timings, a dict, gets the query's Snowflake ID and the seconds spent
+    waiting for it to finish and fetching its result.
+    """
+    if use_arrow is None:
+        use_arrow = USE_ARROW_FETCH
+    if not use_arrow:
+        return pd.read_sql(query, conn, params=params_of(query) or None)
+
+    cur = conn.cursor()
+    try:
+        started = time.perf_counter()
+        cur.execute(query, params_of(query) or None)
+        executed = time.perf_counter()
+        df = cursor_to_dataframe(cur, timings)
+        if timings is not None:
+            timings["query_id"] = cur.sfqid
+            timings["execute_seconds"] = executed - started
+            timings["fetch_seconds"] = time.perf_counter() - executed
+        return df
+    finally:
+        cur.close()
@@ -0,0 +1,667 @@
+# Synthetic ACCOUNT_USAGE data at any scale, for benchmarking the apps with
+# no account (see Benchmark.py). Views are written into a store laid out like
+# Sync.py's, one Parquet file per day built a chunk at a time, so memory stays
+# flat from thousands to tens of millions of rows. The same seed and
+# arguments always give the same data.
+import argparse
+import datetime
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import Sync
+
+# Rows generated and written (as one row group) at a time
+CHUNK_ROWS = 100_000
+
+# Every view the generator can write, the ones in Sync.VIEWS get watermarks too
+VIEWS = [
+    "QUERY_HISTORY",
+    "ACCESS_HISTORY",
+    "WAREHOUSE_METERING_HISTORY",
+    "METERING_HISTORY",
+    "METERING_DAILY_HISTORY",
+    "LOGIN_HISTORY",
+    "LOAD_HISTORY",
+    "STORAGE_USAGE",
+    "DATABASE_STORAGE_USAGE_HISTORY",
+    "TABLE_STORAGE_METRICS",
+]
+# Random streams are keyed by (seed, stream, day, chunk), so a view's rows don't
+# depend on which other views are generated alongside it
+_PLAN, _QUERIES, _LOGINS, _LOADS, _STORAGE, _ENTITIES = range(6)
+
+WAREHOUSE_SIZES = ["X-Small", "Small", "Medium", "Large", "X-Large", "2X-Large"]
+WAREHOUSE_CREDITS = np.array([1, 2, 4, 8, 16, 32])
+WAREHOUSE_SIZE_SHARE = [0.25, 0.3, 0.2, 0.13, 0.08, 0.04]
+QUERY_TYPES = ["SELECT", "INSERT", "MERGE", "CREATE_TABLE_AS_SELECT", "UPDATE", "DELETE", "SHOW", "DESCRIBE", "USE"]
+QUERY_TYPE_SHARE = [0.55, 0.08, 0.04, 0.03, 0.03, 0.02, 0.12, 0.06, 0.07]
+# The rest are metadata statements that run on cloud services without a warehouse
+SCAN_TYPES = np.array([t not in ("SHOW", "DESCRIBE", "USE") for t in QUERY_TYPES])
+DML_TYPES = np.array([t in ("INSERT", "MERGE", "CREATE_TABLE_AS_SELECT", "UPDATE", "DELETE") for t in QUERY_TYPES])
+QUERY_ERRORS = [
+    ("000604", "SQL execution canceled"),
+    ("000630", "Statement reached its statement or warehouse timeout of 3,600 second(s) and was canceled."),
+    ("002003", "SQL compilation error: Object does not exist or not authorized."),
+    ("100038", "Numeric value 'N/A' is not recognized"),
+]
+QUERY_ERROR_SHARE = [0.3, 0.1, 0.4, 0.2]
+TIMEOUT_ERROR = 1
+COMPILATION_ERROR = 2
+CLIENT_TYPES = ["SNOWFLAKE_UI", "PYTHON_DRIVER", "JDBC_DRIVER", "ODBC_DRIVER", "SNOWSQL", "OTHER"]
+CLIENT_TYPE_SHARE = [0.3, 0.25, 0.2, 0.1, 0.05, 0.1]
+AUTH_FACTORS = ["PASSWORD", "RSA_KEYPAIR", "SAML2_ASSERTION", "OAUTH_ACCESS_TOKEN"]
+LOGIN_ERRORS = [("390100", "INCORRECT_USERNAME_PASSWORD"), ("390144", "JWT_TOKEN_INVALID"), ("390191", "SAML_RESPONSE_INVALID")]
+LOAD_STATUSES = ["LOADED", "LOAD_FAILED", "PARTIALLY_LOADED"]
+LOAD_STATUS_SHARE = [0.96, 0.025, 0.015]
+
+DATABASE_WORDS = ["ANALYTICS", "RAW", "STAGING", "MARKETING", "FINANCE", "SALES", "PRODUCT", "SANDBOX"]
+SCHEMA_WORDS = ["PUBLIC", "CORE", "MART", "STAGE", "EVENTS", "REPORTING", "ARCHIVE", "LEGACY"]
+TABLE_WORDS = ["ORDERS", "EVENTS", "CUSTOMERS", "SESSIONS", "PAYMENTS", "INVENTORY", "CLICKS", "ACCOUNTS", "INVOICES", "SHIPMENTS"]
+COLUMN_WORDS = ["customer_id", "region", "event_type", "product_id", "channel", "status"]
+
+# Scanning speed and memory per credit of warehouse size, queries whose working
+# set doesn't fit spill to local disk, past 4x of it to remote storage
+SCAN_BYTES_PER_SECOND_PER_CREDIT = 100 * 1024 ** 2
+MEMORY_BYTES_PER_CREDIT = 16 * 1024 ** 3
+# Queries a warehouse runs at once, for turning busy time into metered time
+CONCURRENCY = 8
+# Queries still running after this are canceled (QUERY_ERRORS[TIMEOUT_ERROR])
+STATEMENT_TIMEOUT_MS = 3_600_000
+CLOUD_SERVICES_CREDITS_PER_HOUR = 4.4
+# Share of queries that are ad-hoc (a literal differs every time) rather than
+# repeats of a text from the pool
+ADHOC_SHARE = 0.25
+BASE_FAILURE_RATE = 0.02
+QUERIES_PER_LOGIN = 40
+LOADS_PER_QUERY = 0.02
+# Storage grows this much a day, so the start of the range holds less
+DAILY_STORAGE_GROWTH = 0.001
+WEEKEND_OFFICE_SHARE = 0.25
+
+HOURS = np.arange(24)
+HOUR_MS = 3_600_000
+
+def _bell(peak, width):
+    return np.exp(-((HOURS - peak) / width) ** 2)
+
+# Hour-of-day load: dashboards and analysts peak mid-morning and mid-afternoon,
+# pipelines run at night
+OFFICE_PROFILE = _bell(10.5, 2.5) + 0.8 * _bell(15, 2.5) + 0.03
+NIGHT_PROFILE = _bell(3, 1.5) + 0.05
+LOAD_PROFILE = 0.7 * NIGHT_PROFILE / NIGHT_PROFILE.sum() + 0.3 / 24
+
+def _zipf(n, s=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    return weights / weights.sum()
+
+def _rng(seed, *keys):
+    return np.random.default_rng([seed, *keys])
+
+def _take(values, indices):
+    return pa.array(values, type=pa.string()).take(pa.array(indices))
+
+def _join(*parts):
+    return pc.binary_join_element_wise(*parts, "")
+
+def _digits(values, width):
+    return pc.utf8_lpad(pc.cast(pa.array(values), pa.string()), width, "0")
+
+def _timestamps(ms):
+    return pa.array(ms, type=pa.int64()).cast(pa.timestamp("ms"))
+
+def _md5(text):
+    return hashlib.md5(text.encode()).hexdigest()
+
+def _day_ms(day):
+    return int(datetime.datetime.combine(day, datetime.time()).replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+
+def _chunks(hours):
+    """(chunk number, hours of its rows) for a day's rows in time order"""
+    for number, lo in enumerate(range(0, len(hours), CHUNK_ROWS), start=1):
+        yield number, hours[lo:lo + CHUNK_ROWS]
+
+def _spread(rng, n, profile):
+    """Hour of each of n rows spread over the day by profile, in time order"""
+    return np.repeat(HOURS, rng.multinomial(n, profile / profile.sum()))
+
+def _start_times(rng, day, hours):
+    # Sorting keeps every row in its own hour, the hours are already in order
+    return np.sort(_day_ms(day) + hours * HOUR_MS + rng.integers(0, HOUR_MS, len(hours)))
+
+class SyntheticAccount:
+    """Warehouses, users, databases and a pool of query texts sized for queries rows
+
+    Activity is skewed the way real accounts are: a few warehouses, users,
+    tables and query texts take most of the load. BI warehouses follow office
+    hours and quiet down at weekends, ETL warehouses run at night.
+    """
+
+    def __init__(self, queries, seed=0):
+        self.seed = seed
+        rng = _rng(seed, _ENTITIES)
+        n_warehouses = int(np.clip(round(queries ** 0.25 / 2), 4, 40))
+        n_users = int(np.clip(round(queries ** 0.5 / 5), 10, 5000))
+        n_tables = int(np.clip(round(queries ** 0.5 * 2), 50, 20000))
+        n_texts = int(np.clip(queries // 500, 50, 50000))
+        n_databases = int(np.clip(round(n_tables ** 0.3), 3, 20))
+
+        etl = np.arange(n_warehouses) % 3 == 2
+        self.warehouse_names = [f"{'ETL' if is_etl else 'BI'}_WH_{i + 1:02d}" for i, is_etl in enumerate(etl)]
+        self.warehouse_size = rng.choice(len(WAREHOUSE_SIZES), n_warehouses, p=WAREHOUSE_SIZE_SHARE)
+        self.warehouse_credits = WAREHOUSE_CREDITS[self.warehouse_size]
+        profiles = np.where(etl[:, None], NIGHT_PROFILE / NIGHT_PROFILE.sum(), OFFICE_PROFILE / OFFICE_PROFILE.sum())
+        # Hour x warehouse load on weekdays and weekends
+        self._load = {}
+        for weekend in (False, True):
+            scale = np.where(etl, 1.0, WEEKEND_OFFICE_SHARE if weekend else 1.0)
+            self._load[weekend] = (_zipf(n_warehouses) * scale)[None, :] * profiles.T
+        peak = self._load[False].sum(axis=1)
+        self.busyness = peak / peak.max()
+
+        self.user_names = [f"USER_{i + 1:04d}" for i in range(n_users)]
+        self.user_share = _zipf(n_users)
+        self.user_roles = rng.choice(["ANALYST", "ENGINEER", "REPORTING", "LOADER", "SYSADMIN"], n_users)
+        self.user_ips = [f"10.{i // 256 % 256}.{i % 256}.{rng.integers(1, 255)}" for i in range(n_users)]
+        # A few users (scripts with stale credentials) fail most of their logins
+        self.user_login_failure = np.full(n_users, 0.02)
+        self.user_login_failure[rng.choice(n_users, max(1, n_users // 50), replace=False)] = 0.5
+
+        self.database_names = [
+            DATABASE_WORDS[i % len(DATABASE_WORDS)] + (f"_{i // len(DATABASE_WORDS) + 1}" if i >= len(DATABASE_WORDS) else "")
+            for i in range(n_databases)
+        ]
+        schemas = [(d, word) for d in range(n_databases) for word in SCHEMA_WORDS[:rng.integers(2, len(SCHEMA_WORDS) + 1)]]
+        table_schema = rng.choice(len(schemas), n_tables, p=_zipf(len(schemas), 0.8))
+        self.table_database = np.array([schemas[s][0] for s in table_schema])
+        self.table_schema_names = [schemas[s][1] for s in table_schema]
+        self.table_names = [f"{TABLE_WORDS[i % len(TABLE_WORDS)]}_{i + 1}" for i in range(n_tables)]
+        self.table_fqns = [
+            f"{self.database_names[d]}.{schema}.{table}"
+            for d, schema, table in zip(self.table_database, self.table_schema_names, self.table_names)
+        ]
+        self.table_ids = np.arange(1, n_tables + 1) + 1000
+        self.table_bytes = rng.lognormal(20, 3, n_tables).clip(1024, 5e13)
+        self.table_row_width = rng.lognormal(5, 0.6, n_tables)
+        self.table_transient = rng.random(n_tables) < 0.1
+        self.table_created = rng.integers(0, 3 * 365, n_tables)
+        # How often each table is queried, unrelated to its size
+        self.table_share = _zipf(n_tables, 1.0)[rng.permutation(n_tables)]
+        self.adhoc_hashes = [_md5("adhoc " + fqn) for fqn in self.table_fqns]
+        self.load_targets = rng.choice(n_tables, max(3, n_tables // 20), replace=False)
+        self.load_target_share = _zipf(len(self.load_targets))
+
+        self.text_type = rng.choice(len(QUERY_TYPES), n_texts, p=QUERY_TYPE_SHARE)
+        self.text_table = rng.choice(n_tables, n_texts, p=self.table_share)
+        self.texts = [self._text(rng, QUERY_TYPES[t], tbl) for t, tbl in zip(self.text_type, self.text_table)]
+        self.text_hashes = [_md5(text) for text in self.texts]
+        self.text_share = _zipf(n_texts, 1.05)
+
+    def _text(self, rng, query_type, table):
+        fqn = self.table_fqns[table]
+        column = COLUMN_WORDS[rng.integers(len(COLUMN_WORDS))]
+        if query_type == "SELECT":
+            return rng.choice([
+                f"select * from {fqn} where event_date >= dateadd(day, -7, current_date())",
+                f"select {column}, count(*) from {fqn} group by 1 order by 2 desc",
+                f"select {column}, sum(amount) as total from {fqn} where event_date = current_date() - 1 group by 1",
+                f"select count(*) from {fqn}",
+            ])
+        if query_type == "INSERT":
+            return f"insert into {fqn} select * from {fqn}_stage"
+        if query_type == "MERGE":
+            return f"merge into {fqn} t using {fqn}_stage s on t.id = s.id when matched then update set t.{column} = s.{column} when not matched then insert *"
+        if query_type == "CREATE_TABLE_AS_SELECT":
+            return f"create or replace table {fqn}_snapshot as select * from {fqn}"
+        if query_type == "UPDATE":
+            return f"update {fqn} set {column} = null where {column} = ''"
+        if query_type == "DELETE":
+            return f"delete from {fqn} where event_date < dateadd(year, -2, current_date())"
+        if query_type == "SHOW":
+            return f"show tables in schema {fqn.rsplit('.', 1)[0]}"
+        if query_type == "DESCRIBE":
+            return f"describe table {fqn}"
+        return f"use warehouse {self.warehouse_names[rng.integers(len(self.warehouse_names))]}"
+
+    #############################################
+    #     PLAN
+    #############################################
+    def daily_queries(self, queries, days):
+        """Query rows per day: fewer at weekends, growing slowly, with some day to day noise"""
+        rng = _rng(self.seed, _PLAN)
+        weights = np.array([self._load[day.weekday() >= 5].sum() for day in days])
+        weights *= (1 + DAILY_STORAGE_GROWTH) ** np.arange(len(days)) * rng.lognormal(0, 0.15, len(days))
+        return rng.multinomial(queries, weights / weights.sum())
+
+    #############################################
+    #     QUERY_HISTORY + ACCESS_HISTORY
+    #############################################
+    def query_chunks(self, day, n):
+        """(QUERY_HISTORY, ACCESS_HISTORY, warehouse x hour execution ms) per chunk of day's n queries"""
+        load = self._load[day.weekday() >= 5]
+        hours = _spread(_rng(self.seed, _QUERIES, day.toordinal(), 0), n, load.sum(axis=1))
+        warehouse_cdf = np.cumsum(load / load.sum(axis=1, keepdims=True), axis=1)
+        for number, chunk_hours in _chunks(hours):
+            rng = _rng(self.seed, _QUERIES, day.toordinal(), number)
+            yield self._queries(rng, day, number, chunk_hours, warehouse_cdf)
+
+    def _queries(self, rng, day, number, hours, warehouse_cdf):
+        n = len(hours)
+        warehouse = np.minimum((rng.random(n)[:, None] > warehouse_cdf[hours]).sum(axis=1), len(self.warehouse_names) - 1)
+        user = rng.choice(len(self.user_names), n, p=self.user_share)
+        adhoc = rng.random(n) < ADHOC_SHARE
+        text = rng.choice(len(self.texts), n, p=self.text_share)
+        table = np.where(adhoc, rng.choice(len(self.table_names), n, p=self.table_share), self.text_table[text])
+        query_type = np.where(adhoc, 0, self.text_type[text])
+        scan = SCAN_TYPES[query_type]
+        dml = DML_TYPES[query_type]
+
+        credits = np.where(scan, self.warehouse_credits[warehouse], 0)
+        per_credit = np.maximum(credits, 1)
+        scanned = np.where(scan, self.table_bytes[table] * rng.beta(0.3, 3, n), 0)
+        execution = np.where(scan, 50 + scanned / (SCAN_BYTES_PER_SECOND_PER_CREDIT * per_credit) * 1000 * rng.lognormal(0, 0.5, n),
+                             rng.lognormal(3, 1, n))
+        memory = per_credit * MEMORY_BYTES_PER_CREDIT
+        working_set = scanned * rng.lognormal(0, 1.3, n)
+        spilled_local = np.clip(working_set - memory, 0, None)
+        spilled_remote = np.clip(working_set - 4 * memory, 0, None)
+        execution *= np.minimum(1 + 0.5 * spilled_local / memory + 2 * spilled_remote / memory, 20)
+
+        timed_out = execution > STATEMENT_TIMEOUT_MS
+        failed = timed_out | (rng.random(n) < BASE_FAILURE_RATE + 0.15 * (spilled_remote > 0))
+        error = np.where(timed_out | (spilled_remote > 0), TIMEOUT_ERROR, rng.choice(len(QUERY_ERRORS), n, p=QUERY_ERROR_SHARE))
+        execution = np.where(timed_out, STATEMENT_TIMEOUT_MS, np.where(failed, execution * rng.random(n), execution))
+        execution = np.where(failed & (error == COMPILATION_ERROR), 0, execution)
+        compilation = rng.lognormal(4.5, 0.8, n)
+        queued_overload = np.where(scan & (rng.random(n) < 0.02 + 0.15 * self.busyness[hours]), rng.lognormal(8, 1.2, n), 0)
+        queued_provisioning = np.where(scan & (rng.random(n) < 0.01), rng.lognormal(7, 0.5, n), 0)
+        blocked = np.where(dml & (rng.random(n) < 0.03), rng.lognormal(9, 1, n), 0)
+        execution, compilation, queued_overload, queued_provisioning, blocked = (
+            a.astype(np.int64) for a in (execution, compilation, queued_overload, queued_provisioning, blocked)
+        )
+        total = execution + compilation + queued_overload + queued_provisioning + blocked
+        rows = np.where(scan, scanned / self.table_row_width[table] * np.where(dml, 0.1, rng.beta(0.5, 5, n)), rng.integers(1, 50, n))
+        written = np.where(dml, scanned * rng.beta(1, 5, n), 0)
+        start = _start_times(rng, day, hours)
+
+        query_ids = _join(f"01{day.toordinal():06x}-0000-", _digits(number * CHUNK_ROWS + np.arange(n), 12))
+        warehouse_names = pc.if_else(pa.array(scan), _take(self.warehouse_names, warehouse), pa.scalar(None, pa.string()))
+        warehouse_sizes = pc.if_else(pa.array(scan), _take(WAREHOUSE_SIZES, self.warehouse_size[warehouse]), pa.scalar(None, pa.string()))
+        texts = pc.if_else(
+            pa.array(adhoc),
+            _join("select * from ", _take(self.table_fqns, table), " where id = ", _digits(rng.integers(0, 10 ** 9, n), 1)),
+            _take(self.texts, text)
+        )
+        hashes = pc.if_else(pa.array(adhoc), _take(self.adhoc_hashes, table), _take(self.text_hashes, text))
+        null_string = pa.scalar(None, pa.string())
+        credits_compute = execution / HOUR_MS * credits
+        credits_cloud_services = (compilation + np.where(scan, 0, execution)) / HOUR_MS * CLOUD_SERVICES_CREDITS_PER_HOUR
+        history = pa.table({
+            "QUERY_ID": query_ids,
+            "QUERY_TEXT": texts,
+            "QUERY_PARAMETERIZED_HASH": hashes,
+            "QUERY_TYPE": _take(QUERY_TYPES, query_type),
+            "USER_NAME": _take(self.user_names, user),
+            "ROLE_NAME": _take(self.user_roles, user),
+            "WAREHOUSE_ID": pa.array((warehouse + 1).astype(np.int64), mask=~scan),
+            "WAREHOUSE_NAME": warehouse_names,
+            "WAREHOUSE_SIZE": warehouse_sizes,
+            "WAREHOUSE_TYPE": pc.if_else(pa.array(scan), pa.scalar("STANDARD"), null_string),
+            "DATABASE_NAME": _take(self.database_names, self.table_database[table]),
+            "SCHEMA_NAME": _take(self.table_schema_names, table),
+            "EXECUTION_STATUS": pc.if_else(pa.array(failed), pa.scalar("FAIL"), pa.scalar("SUCCESS")),
+            "ERROR_CODE": pc.if_else(pa.array(failed), _take([code for code, _ in QUERY_ERRORS], error), null_string),
+            "ERROR_MESSAGE": pc.if_else(pa.array(failed), _take([message for _, message in QUERY_ERRORS], error), null_string),
+            "START_TIME": _timestamps(start),
+            "END_TIME": _timestamps(start + total),
+            "TOTAL_ELAPSED_TIME": pa.array(total),
+            "COMPILATION_TIME": pa.array(compilation),
+            "EXECUTION_TIME": pa.array(execution),
+            "QUEUED_PROVISIONING_TIME": pa.array(queued_provisioning),
+            "QUEUED_OVERLOAD_TIME": pa.array(queued_overload),
+            "TRANSACTION_BLOCKED_TIME": pa.array(blocked),
+            "BYTES_SCANNED": pa.array(scanned.astype(np.int64)),
+            "BYTES_WRITTEN": pa.array(np.where(failed, 0, written).astype(np.int64)),
+            "BYTES_SPILLED_TO_LOCAL_STORAGE": pa.array(spilled_local.astype(np.int64)),
+            "BYTES_SPILLED_TO_REMOTE_STORAGE": pa.array(spilled_remote.astype(np.int64)),
+            "ROWS_PRODUCED": pa.array(np.where(failed, 0, rows).astype(np.int64)),
+            "PERCENTAGE_SCANNED_FROM_CACHE": pa.array(np.where(scan, rng.beta(0.6, 1.8, n), 0.0)),
+            "CREDITS_USED_COMPUTE": pa.array(credits_compute),
+            "CREDITS_USED_CLOUD_SERVICES": pa.array(credits_cloud_services),
+        })
+
+        # ACCESS_HISTORY has a row for every successful query that touched a table.
+        # The Table Cost panel reads flattened per-table columns from it (DATABASE_NAME,
+        # TABLE_NAME, WAREHOUSE_NAME, START_TIME...), written alongside the real ones.
+        touched = scan & ~failed
+        mask = pa.array(touched)
+        objects = _join('[{"objectDomain":"Table","objectId":', _digits(self.table_ids[table[touched]], 1),
+                        ',"objectName":"', _take(self.table_fqns, table[touched]), '"}]')
+        access = history.filter(mask)
+        access = pa.table({
+            "QUERY_ID": access["QUERY_ID"],
+            "QUERY_START_TIME": access["START_TIME"],
+            "USER_NAME": access["USER_NAME"],
+            "DIRECT_OBJECTS_ACCESSED": objects,
+            "BASE_OBJECTS_ACCESSED": objects,
+            "OBJECTS_MODIFIED": pc.if_else(pa.array(dml[touched]), objects, pa.scalar("[]")),
+            "START_TIME": access["START_TIME"],
+            "DATABASE_NAME": access["DATABASE_NAME"],
+            "SCHEMA_NAME": access["SCHEMA_NAME"],
+            "TABLE_NAME": _take(self.table_names, table[touched]),
+            "WAREHOUSE_NAME": access["WAREHOUSE_NAME"],
+            "TOTAL_ELAPSED_TIME": access["TOTAL_ELAPSED_TIME"],
+            "BYTES_SCANNED": access["BYTES_SCANNED"],
+            "CREDITS_USED_COMPUTE": access["CREDITS_USED_COMPUTE"],
+            "CREDITS_USED_CLOUD_SERVICES": access["CREDITS_USED_CLOUD_SERVICES"],
+        })
+
+        slots = len(self.warehouse_names) * 24
+        key = warehouse[scan] * 24 + hours[scan]
+        busy = np.stack([
+            np.bincount(key, weights=execution[scan], minlength=slots),
+            np.bincount(key, weights=credits_cloud_services[scan], minlength=slots),
+        ])
+        return history, access, busy
+
+    #############################################
+    #     METERING
+    #############################################
+    def metering(self, day, busy):
+        """WAREHOUSE_METERING_HISTORY, METERING_HISTORY and METERING_DAILY_HISTORY from a day's busy time"""
+        busy_ms, cloud_services = (a.reshape(len(self.warehouse_names), 24) for a in busy)
+        warehouse, hour = np.nonzero(busy_ms)
+        # Billed for the time the warehouse was up, at least a minute per resume
+        active = np.minimum(busy_ms[warehouse, hour] / HOUR_MS / CONCURRENCY + 1 / 60, 1)
+        compute = active * self.warehouse_credits[warehouse]
+        cs = cloud_services[warehouse, hour]
+        start = _day_ms(day) + hour * HOUR_MS
+        names = _take(self.warehouse_names, warehouse)
+        warehouse_metering = pa.table({
+            "START_TIME": _timestamps(start),
+            "END_TIME": _timestamps(start + HOUR_MS),
+            "WAREHOUSE_ID": pa.array(warehouse + 1).cast(pa.int64()),
+            "WAREHOUSE_NAME": names,
+            "CREDITS_USED": pa.array(compute + cs),
+            "CREDITS_USED_COMPUTE": pa.array(compute),
+            "CREDITS_USED_CLOUD_SERVICES": pa.array(cs),
+        })
+        metering = pa.table({
+            "SERVICE_TYPE": pa.array(["WAREHOUSE_METERING"] * len(warehouse), type=pa.string()),
+            "START_TIME": warehouse_metering["START_TIME"],
+            "END_TIME": warehouse_metering["END_TIME"],
+            "ENTITY_ID": warehouse_metering["WAREHOUSE_ID"],
+            "NAME": names,
+            "CREDITS_USED_COMPUTE": warehouse_metering["CREDITS_USED_COMPUTE"],
+            "CREDITS_USED_CLOUD_SERVICES": warehouse_metering["CREDITS_USED_CLOUD_SERVICES"],
+            "CREDITS_USED": warehouse_metering["CREDITS_USED"],
+        })
+        # Cloud services are only billed past 10% of the day's compute
+        adjustment = -min(cs.sum(), 0.1 * compute.sum())
+        daily = pa.table({
+            "SERVICE_TYPE": pa.array(["WAREHOUSE_METERING"]),
+            "USAGE_DATE": pa.array([day], type=pa.date32()),
+            "CREDITS_USED_COMPUTE": pa.array([compute.sum()]),
+            "CREDITS_USED_CLOUD_SERVICES": pa.array([cs.sum()]),
+            "CREDITS_USED": pa.array([compute.sum() + cs.sum()]),
+            "CREDITS_ADJUSTMENT_CLOUD_SERVICES": pa.array([adjustment]),
+            "CREDITS_BILLED": pa.array([compute.sum() + cs.sum() + adjustment]),
+        })
+        return warehouse_metering, metering, daily
+
+    #############################################
+    #     LOGIN_HISTORY
+    #############################################
+    def login_chunks(self, day, queries):
+        load = self._load[day.weekday() >= 5].sum(axis=1)
+        hours = _spread(_rng(self.seed, _LOGINS, day.toordinal(), 0), max(1, round(queries / QUERIES_PER_LOGIN)), load)
+        for number, chunk_hours in _chunks(hours):
+            rng = _rng(self.seed, _LOGINS, day.toordinal(), number)
+            n = len(chunk_hours)
+            user = rng.choice(len(self.user_names), n, p=self.user_share)
+            failed = rng.random(n) < self.user_login_failure[user]
+            error = rng.integers(len(LOGIN_ERRORS), size=n)
+            null_string = pa.scalar(None, pa.string())
+            yield pa.table({
+                "EVENT_ID": pa.array(day.toordinal() * 10 ** 9 + number * CHUNK_ROWS + np.arange(n)),
+                "EVENT_TIMESTAMP": _timestamps(_start_times(rng, day, chunk_hours)),
+                "EVENT_TYPE": pa.array(["LOGIN"] * n, type=pa.string()),
+                "USER_NAME": _take(self.user_names, user),
+                "CLIENT_IP": _take(self.user_ips, user),
+                "REPORTED_CLIENT_TYPE": _take(CLIENT_TYPES, rng.choice(len(CLIENT_TYPES), n, p=CLIENT_TYPE_SHARE)),
+                "REPORTED_CLIENT_VERSION": _join("3.", _digits(rng.integers(0, 15, n), 1), ".", _digits(rng.integers(0, 5, n), 1)),
+                "FIRST_AUTHENTICATION_FACTOR": _take(AUTH_FACTORS, rng.integers(len(AUTH_FACTORS), size=n)),
+                "IS_SUCCESS": pc.if_else(pa.array(failed), pa.scalar("NO"), pa.scalar("YES")),
+                "ERROR_CODE": pc.if_else(pa.array(failed), _take([code for code, _ in LOGIN_ERRORS], error), null_string),
+                "ERROR_MESSAGE": pc.if_else(pa.array(failed), _take([message for _, message in LOGIN_ERRORS], error), null_string),
+            })
+
+    #############################################
+    #     LOAD_HISTORY
+    #############################################
+    def load_chunks(self, day, queries):
+        hours = _spread(_rng(self.seed, _LOADS, day.toordinal(), 0), max(1, round(queries * LOADS_PER_QUERY)), LOAD_PROFILE)
+        for number, chunk_hours in _chunks(hours):
+            rng = _rng(self.seed, _LOADS, day.toordinal(), number)
+            n = len(chunk_hours)
+            table = self.load_targets[rng.choice(len(self.load_targets), n, p=self.load_target_share)]
+            status = rng.choice(len(LOAD_STATUSES), n, p=LOAD_STATUS_SHARE)
+            parsed = rng.lognormal(11, 1.5, n).astype(np.int64)
+            errors = np.where(status == 0, 0, np.maximum(1, (parsed * rng.beta(1, 20, n)).astype(np.int64)))
+            loaded = np.where(status == 1, 0, parsed - errors)
+            file_names = _join("s3://landing/", pc.utf8_lower(_take(self.table_names, table)), f"/{day.isoformat()}/part-",
+                               _digits(number * CHUNK_ROWS + np.arange(n), 6), ".csv.gz")
+            yield pa.table({
+                "TABLE_ID": pa.array(self.table_ids[table]),
+                "TABLE_NAME": _take(self.table_names, table),
+                "SCHEMA_NAME": _take(self.table_schema_names, table),
+                "CATALOG_NAME": _take(self.database_names, self.table_database[table]),
+                "FILE_NAME": file_names,
+                "LAST_LOAD_TIME": _timestamps(_start_times(rng, day, chunk_hours)),
+                "STATUS": _take(LOAD_STATUSES, status),
+                "ROW_COUNT": pa.array(loaded),
+                "ROW_PARSED": pa.array(parsed),
+                "ERROR_COUNT": pa.array(errors),
+                "FIRST_ERROR_MESSAGE": pc.if_else(pa.array(status != 0), pa.scalar("Numeric value 'abc' is not recognized"), pa.scalar(None, pa.string())),
+            })
+
+    #############################################
+    #     STORAGE
+    #############################################
+    def storage(self, day, days_before_end):
+        """STORAGE_USAGE and DATABASE_STORAGE_USAGE_HISTORY for day"""
+        rng = _rng(self.seed, _STORAGE, day.toordinal())
+        scale = (1 + DAILY_STORAGE_GROWTH) ** -days_before_end * rng.lognormal(0, 0.002)
+        database_bytes = np.bincount(self.table_database, weights=self.table_bytes, minlength=len(self.database_names)) * scale
+        total = database_bytes.sum()
+        storage_usage = pa.table({
+            "USAGE_DATE": pa.array([day], type=pa.date32()),
+            "STORAGE_BYTES": pa.array([int(total)]),
+            "STAGE_BYTES": pa.array([int(total * 0.02)]),
+            "FAILSAFE_BYTES": pa.array([int(total * 0.08)]),
+        })
+        n = len(self.database_names)
+        # ACTIVE_BYTES isn't in the real view, the Database Growth panel reads it
+        database_storage = pa.table({
+            "USAGE_DATE": pa.array([day] * n, type=pa.date32()),
+            "DATABASE_ID": pa.array(np.arange(1, n + 1)),
+            "DATABASE_NAME": pa.array(self.database_names, type=pa.string()),
+            "DELETED": pa.array([None] * n, type=pa.timestamp("ms")),
+            "AVERAGE_DATABASE_BYTES": pa.array(database_bytes),
+            "AVERAGE_FAILSAFE_BYTES": pa.array(database_bytes * 0.08),
+            "ACTIVE_BYTES": pa.array(database_bytes.astype(np.int64)),
+        })
+        return storage_usage, database_storage
+
+    def table_storage(self, end):
+        """TABLE_STORAGE_METRICS as of end, with the flattened columns the Storage panels read"""
+        created = [datetime.datetime.combine(end - datetime.timedelta(days=int(d)), datetime.time()) for d in self.table_created]
+        table_database = _take(self.database_names, self.table_database)
+        table_schema = pa.array(self.table_schema_names, type=pa.string())
+        table_name = pa.array(self.table_names, type=pa.string())
+        active = self.table_bytes.astype(np.int64)
+        return pa.table({
+            "ID": pa.array(self.table_ids),
+            "TABLE_NAME": table_name,
+            "TABLE_SCHEMA": table_schema,
+            "TABLE_CATALOG": table_database,
+            "IS_TRANSIENT": pc.if_else(pa.array(self.table_transient), pa.scalar("YES"), pa.scalar("NO")),
+            "ACTIVE_BYTES": pa.array(active),
+            "TIME_TRAVEL_BYTES": pa.array((active * 0.05).astype(np.int64)),
+            "FAILSAFE_BYTES": pa.array(np.where(self.table_transient, 0, active * 0.08).astype(np.int64)),
+            "RETAINED_FOR_CLONE_BYTES": pa.array(np.zeros(len(active), dtype=np.int64)),
+            "DELETED": pa.array([False] * len(active)),
+            "TABLE_CREATED": pa.array(created, type=pa.timestamp("ms")),
+            "DATABASE_NAME": table_database,
+            "SCHEMA_NAME": table_schema,
+            "TABLE_TYPE": pc.if_else(pa.array(self.table_transient), pa.scalar("TRANSIENT"), pa.scalar("BASE TABLE")),
+            "ROW_COUNT": pa.array((self.table_bytes / self.table_row_width).astype(np.int64)),
+        })
+
+#############################################
+#     WRITING
+#############################################
+class ParquetFile:
+    """One Parquet file of the store written a row group at a time, moved into place on close"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.rows = 0
+        self._tmp = self.path.with_suffix(".parquet.tmp")
+        self._writer = None
+
+    def write(self, table):
+        if table.num_rows == 0:
+            return
+        if self._writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(self._tmp, table.schema)
+        self._writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(self._tmp, self.path)
+        return self.rows
+
+def _clear(view, store):
+    for path in Sync.view_files(view, store):
+        path.unlink()
+
+def generate(store, queries=100_000, days=30, end=None, seed=0, views=VIEWS, log=None):
+    """Write views for the days up to end (default yesterday) into store, return {view: rows}
+
+    Files of the views written are replaced, the store's other views are left alone.
+    """
+    store = Path(store)
+    end = end or datetime.date.today() - datetime.timedelta(days=1)
+    dates = [end - datetime.timedelta(days=i) for i in range(days - 1, -1, -1)]
+    views = [view for view in VIEWS if view in views]
+    account = SyntheticAccount(queries, seed)
+    per_day = account.daily_queries(queries, dates)
+    rows = dict.fromkeys(views, 0)
+    newest = {}
+    for view in views:
+        _clear(view, store)
+
+    def day_file(view, day):
+        return ParquetFile(Sync.view_dir(view, store) / f"{day.isoformat()}.parquet")
+
+    def close(view, file, day, newest_time=None):
+        written = file.close()
+        rows[view] += written
+        if written:
+            newest[view] = newest_time or day
+
+    history_views = {"QUERY_HISTORY", "ACCESS_HISTORY", "WAREHOUSE_METERING_HISTORY", "METERING_HISTORY", "METERING_DAILY_HISTORY"}
+    for i, (day, n) in enumerate(zip(dates, per_day)):
+        end_of_day = datetime.datetime.combine(day, datetime.time(23, 59, 59))
+        if history_views & set(views):
+            history, access = day_file("QUERY_HISTORY", day), day_file("ACCESS_HISTORY", day)
+            busy = 0
+            for history_chunk, access_chunk, busy_chunk in account.query_chunks(day, n):
+                if "QUERY_HISTORY" in views:
+                    history.write(history_chunk)
+                if "ACCESS_HISTORY" in views:
+                    access.write(access_chunk)
+                busy = busy + busy_chunk
+            for view, file in (("QUERY_HISTORY", history), ("ACCESS_HISTORY", access)):
+                if view in views:
+                    close(view, file, day, end_of_day)
+            if n:
+                for view, table in zip(["WAREHOUSE_METERING_HISTORY", "METERING_HISTORY", "METERING_DAILY_HISTORY"], account.metering(day, busy)):
+                    if view in views:
+                        file = day_file(view, day)
+                        file.write(table)
+                        close(view, file, day, end_of_day if view != "METERING_DAILY_HISTORY" else day)
+
+        for view, chunks in (("LOGIN_HISTORY", account.login_chunks), ("LOAD_HISTORY", account.load_chunks)):
+            if view in views:
+                file = day_file(view, day)
+                for chunk in chunks(day, n):
+                    file.write(chunk)
+                close(view, file, day, end_of_day)
+
+        for view, table in zip(["STORAGE_USAGE", "DATABASE_STORAGE_USAGE_HISTORY"], account.storage(day, len(dates) - 1 - i)):
+            if view in views:
+                file = day_file(view, day)
+                file.write(table)
+                close(view, file, day)
+        if log:
+            log(f"{day}: {n:,} queries")
+
+    if "TABLE_STORAGE_METRICS" in views:
+        file = ParquetFile(Sync.view_dir("TABLE_STORAGE_METRICS", store) / "snapshot.parquet")
+        file.write(account.table_storage(end))
+        close("TABLE_STORAGE_METRICS", file, end)
+
+    _save_watermarks(store, views, rows, newest)
+    return rows
+
+def _save_watermarks(store, views, rows, newest):
+    """Mark the generated views synced now, so the apps' local SQL (Localsql.py) serves them"""
+    marks = Sync.load_watermarks(store)
+    synced_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    for view in views:
+        spec = Sync.VIEWS.get(view)
+        if spec is None or view not in newest:
+            continue
+        if spec["time_column"] is None:
+            marks[view] = {"type": "snapshot", "value": synced_at, "synced_at": synced_at, "rows": rows[view]}
+        elif isinstance(newest[view], datetime.datetime):
+            marks[view] = {"type": "timestamp", "value": Sync.as_utc(newest[view]).isoformat(), "synced_at": synced_at, "rows": rows[view]}
+        else:
+            marks[view] = {"type": "date", "value": newest[view].isoformat(), "synced_at": synced_at, "rows": rows[view]}
+    Sync.save_watermarks(marks, store)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic ACCOUNT_USAGE views into a Parquet store for offline benchmarks")
+    parser.add_argument("views", nargs="*", help=f"views to write (default: all of {', '.join(VIEWS)})")
+    parser.add_argument("--store", required=True, help="store directory, the views written there are replaced")
+    parser.add_argument("--queries", type=float, default=100_000, help="QUERY_HISTORY rows in total, the other views scale with it")
+    parser.add_argument("--days", type=int, default=30, help="days of history")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="last day (default: yesterday)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quiet", action="store_true", help="don't print progress per day")
+    args = parser.parse_args()
+
+    views = [view.upper() for view in args.views] or VIEWS
+    unknown = [view for view in views if view not in VIEWS]
+    if unknown:
+        parser.error(f"unknown view {', '.join(unknown)}, expected one of {', '.join(VIEWS)}")
+
+    started = time.perf_counter()
+    rows = generate(args.store, int(args.queries), args.days, args.end, args.seed, views, None if args.quiet else print)
+    for view, count in rows.items():
+        print(f"{view}: {count:,} rows")
+    print(f"Written to {args.store} in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
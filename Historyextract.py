@@ -0,0 +1,88 @@
+import os
+
+import pandas as pd
+
+from Daycache import DailyQuery, days_between, load_daily
+from Queryregistry import Query, register, source_columns
+
+# The extract fetches the union of the QUERY_HISTORY columns every query derived
+# from it declares in Queryregistry, nothing else is scanned. QUERY_ID keys its
+# rows and WAREHOUSE_NAME is what Usage.py's cross filter narrows it by.
+query_history = register(Query(
+    "query_history",
+    views=["QUERY_HISTORY"],
+    columns=["QUERY_ID", "WAREHOUSE_NAME"],
+    grain="day"
+))
+
+# Windows longer than STREAM_AFTER_DAYS are never loaded whole: their panels
+# are aggregated from STREAM_DAYS of the extract at a time (see Streamagg)
+STREAM_AFTER_DAYS = int(os.environ.get("USAGE_STREAM_AFTER_DAYS", 90))
+STREAM_DAYS = int(os.environ.get("USAGE_STREAM_DAYS", 7))
+
+# NUMBER columns with a scale arrive as Decimal objects
+NUMERIC_COLUMNS = {
+    "TOTAL_ELAPSED_TIME",
+    "COMPILATION_TIME",
+    "EXECUTION_TIME",
+    "QUEUED_PROVISIONING_TIME",
+    "TRANSACTION_BLOCKED_TIME",
+    "BYTES_SCANNED",
+    "BYTES_WRITTEN",
+    "BYTES_SPILLED_TO_LOCAL_STORAGE",
+    "BYTES_SPILLED_TO_REMOTE_STORAGE",
+    "ROWS_PRODUCED",
+    "PERCENTAGE_SCANNED_FROM_CACHE",
+    "CREDITS_USED_COMPUTE",
+    "CREDITS_USED_CLOUD_SERVICES",
+}
+
+_extract_queries = {}
+
+def extract_query():
+    """DailyQuery fetching the columns declared for the extract"""
+    columns = tuple(source_columns(query_history.name))
+    if columns not in _extract_queries:
+        sql = (
+            "select start_time::date as usage_day, hour(start_time) as usage_hour, " + ", ".join(col.lower() for col in columns)
+            + " from snowflake.account_usage.query_history where start_time >= '{start}' and start_time < '{end}'"
+        )
+        _extract_queries[columns] = DailyQuery(query_history.name, sql, lambda df: df)
+    return _extract_queries[columns]
+
+def _numeric(df):
+    """Make the NUMERIC_COLUMNS floats once at fetch time"""
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns and df[col].dtype == object:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+def load_extract(start, end, run, cache=None):
+    """Projected QUERY_HISTORY rows for start..end (both days included), cached per day"""
+    return load_daily(extract_query(), start, end, lambda sql: _numeric(run(sql)), cache)
+
+def batch_days(days):
+    """Days of the extract loaded at once for a window of days days"""
+    return STREAM_DAYS if days > STREAM_AFTER_DAYS else max(days, 1)
+
+def iter_extract(start, end, run, cache=None):
+    """load_extract for start..end in batches of batch_days, a single batch unless the window is long"""
+    window = days_between(start, end)
+    days = batch_days(len(window))
+    for i in range(0, len(window), days):
+        batch = window[i:i + days]
+        yield load_extract(batch[0], batch[-1], run, cache)
+
+#############################################
+#     COMMON DERIVATIONS
+#############################################
+def query_credits(df):
+    return df["CREDITS_USED_COMPUTE"] + df["CREDITS_USED_CLOUD_SERVICES"]
+
+def ratio(numerator, denominator, digits=None):
+    """numerator / denominator with NULLIF(denominator, 0) semantics"""
+    out = numerator / denominator.where(denominator != 0)
+    return out.round(digits) if digits is not None else out
+
+def top(df, value, limit):
+    return df.sort_values(value, ascending=False).head(limit).reset_index(drop=True)
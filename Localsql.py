@@ -0,0 +1,194 @@
+import datetime
+import os
+import re
+
+import duckdb
+
+import Sync
+from Boundsql import inline
+
+# Serve dashboard SQL from the synced store, set USAGE_LOCAL_SQL=0 to always go to Snowflake
+USE_LOCAL_SQL = os.environ.get("USAGE_LOCAL_SQL", "1") != "0"
+# A view that hasn't been synced for this long is treated as missing
+MAX_STALENESS = datetime.timedelta(hours=6)
+
+class Untranslatable(Exception):
+    """The query can't be answered from the local store and has to go to Snowflake"""
+
+_db = duckdb.connect()
+
+VIEW_PATTERN = re.compile(r"\bsnowflake\.account_usage\.(\w+)", re.IGNORECASE)
+
+# Snowflake constructs with no local equivalent, these always go to Snowflake
+UNSUPPORTED = re.compile(
+    r"\b(flatten|lateral|result_scan|object_construct|parse_json|array_agg|listagg|system\$\w+)\b|\w:\w",
+    re.IGNORECASE
+)
+
+#############################################
+#     TRANSLATION
+#############################################
+def _find_close(sql, open_idx):
+    """Index of the parenthesis closing the one at open_idx, ignoring string literals"""
+    depth = 0
+    i = open_idx
+    while i < len(sql):
+        ch = sql[i]
+        if ch == "'":
+            i = sql.index("'", i + 1)
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise Untranslatable("Unbalanced parentheses")
+
+def _split_args(args):
+    """Split a call's argument list on top-level commas"""
+    parts, depth, start, i = [], 0, 0, 0
+    while i < len(args):
+        ch = args[i]
+        if ch == "'":
+            i = args.index("'", i + 1)
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(args[start:i].strip())
+            start = i + 1
+        i += 1
+    parts.append(args[start:].strip())
+    return parts
+
+def _rewrite_calls(sql, name, rewrite):
+    """Replace every name(...) call with rewrite(args), nested calls included"""
+    pattern = re.compile(r"\b" + name + r"\s*\(", re.IGNORECASE)
+    pos = 0
+    while True:
+        match = pattern.search(sql, pos)
+        if match is None:
+            return sql
+        open_idx = match.end() - 1
+        close_idx = _find_close(sql, open_idx)
+        args = [_rewrite_calls(arg, name, rewrite) for arg in _split_args(sql[open_idx + 1:close_idx])]
+        replacement = rewrite(args)
+        sql = sql[:match.start()] + replacement + sql[close_idx + 1:]
+        pos = match.start() + len(replacement)
+
+def _to_numeric(args):
+    if len(args) == 3:
+        return f"CAST({args[0]} AS DECIMAL({args[1]},{args[2]}))"
+    if len(args) == 1:
+        return f"CAST({args[0]} AS DECIMAL(38,0))"
+    raise Untranslatable("TO_NUMERIC with a format argument")
+
+def _date_trunc(args):
+    part = args[0]
+    if not part.startswith("'"):
+        part = f"'{part.lower()}'"
+    return f"date_trunc({part}, {args[1]})"
+
+def _to_timestamp(args):
+    if len(args) != 1:
+        raise Untranslatable("TO_TIMESTAMP with a format argument")
+    return f"CAST({args[0]} AS TIMESTAMP)"
+
+def referenced_views(sql):
+    return sorted({name.upper() for name in VIEW_PATTERN.findall(sql)})
+
+def translate(sql, store=Sync.STORE_DIR, require_synced=True):
+    """Rewrite Snowflake dashboard SQL into DuckDB SQL over the local Parquet store
+
+    require_synced=False takes whatever view files the store holds, however
+    old, for stores that aren't kept by Sync.py (e.g. benchmark data).
+    """
+    sql = inline(sql)
+    if UNSUPPORTED.search(re.sub(r"'[^']*'", "''", sql)):
+        raise Untranslatable("Uses Snowflake-only functions")
+    views = referenced_views(sql)
+    if not views:
+        raise Untranslatable("No ACCOUNT_USAGE view referenced")
+
+    marks = Sync.load_watermarks(store)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for view in views:
+        if not require_synced:
+            if not Sync.view_files(view, store):
+                raise Untranslatable(f"{view} has no files in {store}")
+            continue
+        entry = marks.get(view)
+        if view not in Sync.VIEWS or entry is None or not Sync.view_files(view, store):
+            raise Untranslatable(f"{view} is not synced locally")
+        if now - datetime.datetime.fromisoformat(entry["synced_at"]) > MAX_STALENESS:
+            raise Untranslatable(f"{view} was last synced at {entry['synced_at']}")
+
+    def source(match):
+        path = (Sync.view_dir(match.group(1).upper(), store) / "*.parquet").as_posix()
+        return f"read_parquet('{path}', union_by_name=true)"
+    sql = VIEW_PATTERN.sub(source, sql)
+
+    sql = _rewrite_calls(sql, "iff", lambda args: f"if({', '.join(args)})")
+    sql = _rewrite_calls(sql, "to_numeric", _to_numeric)
+    sql = _rewrite_calls(sql, "date_trunc", _date_trunc)
+    sql = _rewrite_calls(sql, "to_timestamp", _to_timestamp)
+    sql = re.sub(r"\bcurrent_date\s*\(\s*\)", "current_date", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"::\s*string\b", "::VARCHAR", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"::\s*timestamp_(ltz|tz)\b", "::TIMESTAMPTZ", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"::\s*timestamp_ntz\b", "::TIMESTAMP", sql, flags=re.IGNORECASE)
+    return sql.strip().rstrip(";")
+
+#############################################
+#     EXECUTION
+#############################################
+def run_local(sql, store=Sync.STORE_DIR):
+    """Run dashboard SQL on the embedded engine, columns named the way Snowflake names them"""
+    local_sql = translate(sql, store)
+    cur = _db.cursor()
+    try:
+        df = cur.execute(local_sql).fetchdf()
+    except duckdb.Error as e:
+        raise Untranslatable(str(e))
+    finally:
+        cur.close()
+    df.columns = [str(col).upper() for col in df.columns]
+    return df
+
+def run_local_or(sql, fallback, store=Sync.STORE_DIR):
+    """Answer from the local store when possible, otherwise send this one query to Snowflake"""
+    if USE_LOCAL_SQL:
+        try:
+            return run_local(sql, store)
+        except Untranslatable:
+            pass
+    return fallback(sql)
+
+def local_synced_at(sql, store=Sync.STORE_DIR):
+    """When the store's copy of the views sql reads was taken, None if sql goes to Snowflake
+
+    A day answered from the store is only complete if the store was synced
+    after ACCOUNT_USAGE had caught up with it, see Daycache.is_closed.
+    """
+    if not USE_LOCAL_SQL:
+        return None
+    try:
+        translate(sql, store)
+    except Untranslatable:
+        return None
+    marks = Sync.load_watermarks(store)
+    return min(Sync.as_utc(datetime.datetime.fromisoformat(marks[view]["synced_at"])) for view in referenced_views(inline(sql)))
+
+def split_local(queries, store=Sync.STORE_DIR):
+    """Run what can be answered locally, return ([(name, df, None)], {name: sql} for Snowflake)"""
+    answered, remote = [], {}
+    for name, sql in queries.items():
+        if not USE_LOCAL_SQL:
+            remote[name] = sql
+            continue
+        try:
+            answered.append((name, run_local(sql, store), None))
+        except Untranslatable:
+            remote[name] = sql
+    return answered, remote
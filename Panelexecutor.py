@@ -0,0 +1,76 @@
+import concurrent.futures
+import queue
+import threading
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+# Upper bound on panel queries in flight at once for a single render
+MAX_WORKERS = 8
+
+def _attach_script_context(ctx):
+    """Let worker threads use st.cache_data / st.secrets like the script thread"""
+    if ctx is not None and add_script_run_ctx is not None:
+        add_script_run_ctx(threading.current_thread(), ctx)
+
+def run_panels(loaders, max_workers=MAX_WORKERS):
+    """Run every panel loader at once and yield (name, df, error) as each one finishes
+
+    loaders maps a panel name to a zero-argument callable returning a DataFrame.
+    A failing loader only produces an error for its own panel.
+    """
+    if not loaders:
+        return
+
+    ctx = get_script_run_ctx(suppress_warning=True) if get_script_run_ctx else None
+    workers = max(1, min(max_workers, len(loaders)))
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=workers,
+        thread_name_prefix="panel",
+        initializer=_attach_script_context,
+        initargs=(ctx,)
+    ) as executor:
+        futures = {executor.submit(loader): name for name, loader in loaders.items()}
+        for future in concurrent.futures.as_completed(futures):
+            name = futures[future]
+            try:
+                yield name, future.result(), None
+            except Exception as e:
+                yield name, None, f"Error: {str(e)}"
+
+def interleave(*sources):
+    """Yield the (name, df, error) results of every source as they arrive
+
+    Each source is consumed on its own thread, so panels waiting on a slow
+    source (a cold QUERY_HISTORY extract) don't hold back another's (queries
+    submitted asynchronously), both are under way at once.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True) if get_script_run_ctx else None
+    results = queue.Queue()
+    finished = object()
+
+    def drain(source):
+        _attach_script_context(ctx)
+        try:
+            for result in source:
+                results.put(result)
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(finished)
+
+    for source in sources:
+        threading.Thread(target=drain, args=(source,), name="interleave", daemon=True).start()
+    remaining = len(sources)
+    while remaining:
+        result = results.get()
+        if result is finished:
+            remaining -= 1
+        elif isinstance(result, Exception):
+            raise result
+        else:
+            yield result
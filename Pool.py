@@ -0,0 +1,198 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import snowflake.connector
+
+# Defaults, can be overridden from the optional [snowflake_pool] secrets section
+MIN_SIZE = 1
+MAX_SIZE = 8
+CHECKOUT_TIMEOUT = 30       # seconds to wait for a free connection
+HEALTH_CHECK_AFTER = 60     # re-validate connections idle longer than this
+IDLE_TIMEOUT = 600          # close connections above min_size idle longer than this
+KEEPALIVE_INTERVAL = 240    # how often the maintenance thread pings idle connections
+
+class PoolTimeout(Exception):
+    pass
+
+class _PooledConnection:
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_checked = self.created_at
+
+class ConnectionPool:
+    """Thread-safe pool of Snowflake connections shared by every session in the process
+
+    Each thread checks out its own connection; nested checkouts on the same
+    thread reuse it instead of taking a second one from the pool.
+    """
+
+    def __init__(self, connect_args, min_size=MIN_SIZE, max_size=MAX_SIZE,
+                 checkout_timeout=CHECKOUT_TIMEOUT, health_check_after=HEALTH_CHECK_AFTER,
+                 idle_timeout=IDLE_TIMEOUT, keepalive_interval=KEEPALIVE_INTERVAL):
+        self.connect_args = dict(connect_args)
+        # Dashboard SQL binds its dates as :1, :2 (Boundsql), sent to Snowflake as bind variables
+        self.connect_args.setdefault("paramstyle", "numeric")
+        self.min_size = max(0, int(min_size))
+        self.max_size = max(1, int(max_size), self.min_size)
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._local = threading.local()
+
+        for _ in range(self.min_size):
+            self._idle.append(self._open())
+            self._size += 1
+
+        self._maintenance = threading.Thread(target=self._maintain, name="snowflake-pool", daemon=True)
+        self._maintenance.start()
+
+    def _open(self):
+        return _PooledConnection(snowflake.connector.connect(**self.connect_args))
+
+    def _is_healthy(self, pooled):
+        """Cheap round-trip to make sure the session is still usable"""
+        try:
+            if pooled.conn.is_closed():
+                return False
+            cur = pooled.conn.cursor()
+            try:
+                cur.execute("select 1")
+                cur.fetchone()
+            finally:
+                cur.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, pooled):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    def _checkout(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._available:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Reserve the slot, then connect outside the lock
+                    self._size += 1
+                    pooled = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No Snowflake connection free after {self.checkout_timeout}s")
+                self._available.wait(remaining)
+
+        if pooled is None:
+            try:
+                return self._open()
+            except Exception:
+                self._release_slot()
+                raise
+
+        if time.monotonic() - max(pooled.last_used, pooled.last_checked) > self.health_check_after and not self._is_healthy(pooled):
+            self._discard(pooled)
+            try:
+                return self._open()
+            except Exception:
+                self._release_slot()
+                raise
+        return pooled
+
+    def _release_slot(self):
+        with self._available:
+            self._size -= 1
+            self._available.notify()
+
+    def _checkin(self, pooled, broken=False):
+        if broken or self._closed:
+            self._discard(pooled)
+            self._release_slot()
+            return
+        pooled.last_used = time.monotonic()
+        with self._available:
+            self._idle.append(pooled)
+            self._available.notify()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the current thread"""
+        held = getattr(self._local, "pooled", None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held.conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        pooled = self._checkout()
+        self._local.pooled = pooled
+        self._local.depth = 1
+        broken = False
+        try:
+            yield pooled.conn
+        except Exception:
+            # Only throw the connection away if the session itself is gone,
+            # a bad query should not cost us a fresh login
+            broken = not self._is_healthy(pooled)
+            raise
+        finally:
+            self._local.pooled = None
+            self._local.depth = 0
+            self._checkin(pooled, broken)
+
+    def _maintain(self):
+        """Keep idle sessions alive and reap the ones above min_size"""
+        while not self._closed:
+            time.sleep(self.keepalive_interval)
+            now = time.monotonic()
+            with self._lock:
+                idle, self._idle = self._idle, []
+            keep, drop = [], []
+            for pooled in idle:
+                expired = now - pooled.last_used > self.idle_timeout
+                if expired and len(keep) >= self.min_size:
+                    drop.append(pooled)
+                elif self._is_healthy(pooled):
+                    pooled.last_checked = time.monotonic()
+                    keep.append(pooled)
+                else:
+                    drop.append(pooled)
+            with self._available:
+                if self._closed:
+                    drop, keep = drop + keep, []
+                self._idle.extend(keep)
+                self._size -= len(drop)
+                self._available.notify_all()
+            for pooled in drop:
+                self._discard(pooled)
+
+    def stats(self):
+        with self._lock:
+            return {"size": self._size, "idle": len(self._idle), "in_use": self._size - len(self._idle)}
+
+    def close(self):
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._available.notify_all()
+        for pooled in idle:
+            self._discard(pooled)
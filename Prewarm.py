@@ -0,0 +1,198 @@
+import argparse
+import datetime
+import json
+import os
+import threading
+import time
+from functools import partial
+from pathlib import Path
+
+from Daycache import CACHE_DIR, load_daily
+from Historyextract import iter_extract
+from Usagecube import load_cube
+from Usagesketch import load_sketches
+from Usagepanels import panel_daily
+
+# The Usage.py date buttons, longest first: once it is warm the shorter
+# windows are its days again and come straight from the day cache
+WINDOWS = (365, 180, 90, 60, 30)
+# Set to 0 when Prewarm.py runs as its own scheduled command instead of inside the app
+PREWARM_IN_APP = os.environ.get("USAGE_PREWARM", "1") != "0"
+# Seconds between two passes
+INTERVAL = int(os.environ.get("USAGE_PREWARM_INTERVAL", 3600))
+# Local hours "first-last" (last excluded, may wrap midnight) passes are allowed
+# in, empty for any hour. Yesterday's partitions close at 03:00 (Daycache.CLOSE_LATENCY)
+# and are then warmed for good before the first visitor of the day.
+QUIET_HOURS = os.environ.get("USAGE_PREWARM_QUIET_HOURS", "3-8")
+# Credits per hour of the warehouse the queries run on (1 for X-Small), for the
+# cost estimate. It is an upper bound, the warehouse may be running other queries too.
+CREDITS_PER_HOUR = float(os.environ.get("USAGE_PREWARM_CREDITS_PER_HOUR", 1))
+PREWARM_LOG = Path(os.environ.get("USAGE_PREWARM_LOG", CACHE_DIR / "prewarm_log.jsonl"))
+# How often the scheduler thread checks whether a pass is due
+POLL_SECONDS = 60
+
+def _warm_extract(start, end, run):
+    for _ in iter_extract(start, end, run):
+        pass
+
+def _warm_cube(start, end, run):
+    load_cube(start, end, run)
+
+def _warm_sketches(start, end, run):
+    load_sketches(start, end, run)
+
+# Every QUERY_HISTORY panel derives from these, the rest of Usage.py adds its own panels
+HISTORY_JOBS = {"query_history": _warm_extract, "query_history_cube": _warm_cube, "query_history_sketch": _warm_sketches}
+
+def window(days, now=None):
+    """(start, end) dates the Usage.py button for days selects"""
+    now = now or datetime.datetime.now()
+    return (now - datetime.timedelta(days=days)).date(), now.date()
+
+def in_quiet_hours(hour, quiet_hours=QUIET_HOURS):
+    if not quiet_hours:
+        return True
+    first, last = (int(h) for h in quiet_hours.split("-"))
+    if first <= last:
+        return first <= hour < last
+    return hour >= first or hour < last
+
+class QueryMeter:
+    """Wraps run to count what a pass sent: queries, rows back and time spent waiting on them"""
+
+    def __init__(self, run):
+        self.run = run
+        self.queries = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, sql):
+        started = time.monotonic()
+        df = None
+        try:
+            df = self.run(sql)
+            return df
+        finally:
+            with self._lock:
+                self.queries += 1
+                self.rows += len(df) if df is not None else 0
+                self.seconds += time.monotonic() - started
+
+class Prewarmer:
+    """Re-runs the dashboard's cached loads for every standard window on a schedule
+
+    jobs maps a name to a callable(start, end, run) that loads one panel's data
+    through the usual caches. A pass runs every job for every window, one job
+    failing doesn't stop the others, and what the pass cost is appended to log_path.
+    """
+
+    def __init__(self, jobs, run, windows=WINDOWS, interval=INTERVAL, quiet_hours=QUIET_HOURS, log_path=PREWARM_LOG):
+        self.jobs = jobs
+        self.run = run
+        self.windows = windows
+        self.interval = interval
+        self.quiet_hours = quiet_hours
+        self.log_path = Path(log_path)
+        self.last_run = None
+        self._last_started = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def warm(self, now=None):
+        """Run one pass now and return its record"""
+        now = now or datetime.datetime.now()
+        self._last_started = time.monotonic()
+        meter = QueryMeter(self.run)
+        errors = {}
+        for days in self.windows:
+            start, end = window(days, now)
+            for name, job in self.jobs.items():
+                try:
+                    job(start, end, meter)
+                except Exception as e:
+                    errors[f"{name}/{days}d"] = str(e)
+
+        record = {
+            "started": now.isoformat(timespec="seconds"),
+            "seconds": round(time.monotonic() - self._last_started, 1),
+            "queries": meter.queries,
+            "rows": meter.rows,
+            "query_seconds": round(meter.seconds, 1),
+            "estimated_credits": round(meter.seconds / 3600 * CREDITS_PER_HOUR, 4),
+            "errors": errors
+        }
+        self.last_run = record
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError:
+            pass
+        return record
+
+    def is_due(self, now=None):
+        now = now or datetime.datetime.now()
+        if not in_quiet_hours(now.hour, self.quiet_hours):
+            return False
+        return self._last_started is None or time.monotonic() - self._last_started >= self.interval
+
+    def _loop(self, warm_now):
+        if warm_now:
+            self.warm()
+        while not self._stop.is_set():
+            if self.is_due():
+                self.warm()
+            self._stop.wait(POLL_SECONDS)
+
+    def start(self, warm_now=False):
+        """Schedule passes on a daemon thread
+
+        The first pass waits for the quiet hours like every other, so starting
+        the app (or every replica of it) doesn't warm the long windows at peak
+        time. warm_now runs it straight away whatever the hour.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, args=(warm_now,), name="prewarm", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the day cache warm for the dashboard's date windows")
+    parser.add_argument("--once", action="store_true", help="run a single pass now and exit (for cron)")
+    parser.add_argument("--windows", default=",".join(str(days) for days in WINDOWS), help="comma separated window lengths in days")
+    parser.add_argument("--interval", type=int, default=INTERVAL, help="seconds between passes")
+    parser.add_argument("--quiet-hours", default=QUIET_HOURS, help="local hours passes may run in, e.g. 22-6, empty for any")
+    args = parser.parse_args()
+
+    import streamlit as st
+    from Fetch import fetch_dataframe
+    from Pool import ConnectionPool
+
+    pool = ConnectionPool(st.secrets["snowflake"], min_size=1, max_size=1)
+
+    def run(sql):
+        with pool.connection() as conn:
+            return fetch_dataframe(conn, sql)
+
+    windows = sorted((int(days) for days in args.windows.split(",")), reverse=True)
+    jobs = dict(HISTORY_JOBS)
+    jobs.update({name: partial(load_daily, query) for name, query in panel_daily.items()})
+    prewarmer = Prewarmer(jobs, run, windows, args.interval, args.quiet_hours)
+    try:
+        if args.once:
+            print(json.dumps(prewarmer.warm()))
+            return
+        while True:
+            if prewarmer.is_due():
+                print(json.dumps(prewarmer.warm()), flush=True)
+            time.sleep(POLL_SECONDS)
+    finally:
+        pool.close()
+
+if __name__ == "__main__":
+    main()
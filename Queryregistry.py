@@ -0,0 +1,114 @@
+# Every dashboard query declared once, with what running it well depends on:
+# the ACCOUNT_USAGE views and columns it reads, its time grain, how fresh its
+# result has to be, how many rows it can return and which panels use it. The
+# panel modules register their queries at import, the pages and Report.py plan
+# from here instead of reading the SQL text.
+import importlib
+
+# Modules whose import registers queries, all loaded by complete_registry()
+REGISTERING_MODULES = ["Historyextract", "Usagecube", "Usagesketch", "Usagepanels", "Addonpanels"]
+GRAINS = ("day", "window", None)
+TIERS = ("live", "daily")
+
+class Query:
+    """A dashboard query and its metadata
+
+    sql: the statement. For grain "day" and "window" it is a template with
+      '{start}' and '{end}' placeholders (end exclusive), fetched and cached per
+      day or bound to the whole selected window. None for a query derived in
+      memory from the result of source.
+    views: ACCOUNT_USAGE views it reads.
+    columns: columns of those views it needs. A query derived from source adds
+      them to what source fetches.
+    grain: "day", "window" or None for an undated query.
+    freshness: result cache tier, "live" or "daily" for views that only gain a
+      row once a day.
+    limit: most rows its result can have, None when unbounded.
+    panels: the panels drawn from its result.
+    """
+
+    def __init__(self, name, sql=None, views=(), columns=(), grain=None, freshness="live", limit=None, panels=(), source=None):
+        if grain not in GRAINS:
+            raise ValueError(f"Unknown grain {grain!r} for query {name}, expected one of {GRAINS}")
+        if freshness not in TIERS:
+            raise ValueError(f"Unknown freshness {freshness!r} for query {name}, expected one of {TIERS}")
+        self.name = name
+        self.sql = sql
+        self.views = list(views)
+        self.columns = list(columns)
+        self.grain = grain
+        self.freshness = freshness
+        self.limit = limit
+        self.panels = list(panels)
+        self.source = source
+
+    def __repr__(self):
+        return f"Query({self.name!r}, grain={self.grain!r}, freshness={self.freshness!r}, panels={self.panels!r})"
+
+queries = {}
+_panel_queries = {}
+
+def register(query):
+    """Add query to the registry and return it"""
+    if query.name in queries:
+        raise ValueError(f"Query {query.name} is registered twice")
+    if query.source is not None and query.source not in queries:
+        raise ValueError(f"Query {query.name} is derived from {query.source}, which isn't registered")
+    for panel in query.panels:
+        if panel in _panel_queries:
+            raise ValueError(f"Panel {panel} already uses query {_panel_queries[panel]}")
+        _panel_queries[panel] = query.name
+    queries[query.name] = query
+    return query
+
+def complete_registry():
+    """Every registered query, importing the modules that register them first"""
+    for module in REGISTERING_MODULES:
+        importlib.import_module(module)
+    return queries
+
+def query_for(panel):
+    return queries[_panel_queries[panel]]
+
+def root(query):
+    """The query that actually runs for query, following source"""
+    while query.source is not None:
+        query = queries[query.source]
+    return query
+
+def source_columns(name):
+    """Columns name fetches: its own and those of every query derived from it, sorted"""
+    columns = set()
+    for query in complete_registry().values():
+        if root(query).name == name:
+            columns.update(query.columns)
+    return sorted(columns)
+
+def plan(panels):
+    """panels in the order to start them in
+
+    Panels sharing a fetch wait on whichever of them starts it, so only one of
+    them goes first per shared fetch, the most shared first. The panels with a
+    fetch of their own follow, unbounded queries before those returning a
+    handful of rows, so the workers aren't all held waiting on one fetch while
+    the independent queries queue. The rest of the sharing panels come last.
+    Panels not in the registry keep their place at the end.
+    """
+    known = [panel for panel in panels if panel in _panel_queries]
+    shared = {}
+    for panel in known:
+        name = root(query_for(panel)).name
+        shared[name] = shared.get(name, 0) + 1
+
+    leads, own, followers = [], [], []
+    for panel in known:
+        name = root(query_for(panel)).name
+        if shared[name] == 1:
+            own.append(panel)
+        elif any(root(query_for(lead)).name == name for lead in leads):
+            followers.append(panel)
+        else:
+            leads.append(panel)
+    leads.sort(key=lambda panel: -shared[root(query_for(panel)).name])
+    own.sort(key=lambda panel: root(query_for(panel)).limit is not None)
+    return leads + own + followers + [panel for panel in panels if panel not in _panel_queries]
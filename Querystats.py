@@ -0,0 +1,200 @@
+# Timings of the dashboard's own queries, for its hidden Performance page
+# (open the app with ?page=performance). Every query that actually runs, on
+# Snowflake or on the local store, is recorded with the panel that asked for
+# it, and every panel load with how long it took and whether the caches
+# answered it. Snowflake's own queue / compile / execution split is looked up
+# by query ID only when the page is opened.
+import collections
+import hashlib
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Records kept per process of each kind, the oldest are dropped first
+MAX_RECORDS = 2000
+# Frames longer than this have their string memory estimated from a sample
+MEMORY_SAMPLE_ROWS = 10_000
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+def normalize(sql):
+    """sql with literals as ? and whitespace collapsed: every date window of a panel's query looks the same"""
+    return re.sub(r"\s+", " ", _LITERALS.sub("?", sql)).strip().rstrip(";").lower()
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode("utf-8")).hexdigest()[:12]
+
+def frame_memory(df):
+    """Bytes df holds, strings included"""
+    if df is None:
+        return None
+    if len(df) <= MEMORY_SAMPLE_ROWS:
+        return int(df.memory_usage(deep=True).sum())
+    total = df.memory_usage(deep=False).sum()
+    objects = df.select_dtypes(include="object")
+    if len(objects.columns):
+        sample = objects.iloc[::len(objects) // MEMORY_SAMPLE_ROWS]
+        per_row = (sample.memory_usage(index=False, deep=True).sum() - sample.memory_usage(index=False).sum()) / len(sample)
+        total += per_row * len(objects)
+    return int(total)
+
+class Record(dict):
+    def result(self, df):
+        """Note df's size on the record and hand it back"""
+        self["rows"] = len(df) if df is not None else None
+        self["memory_bytes"] = frame_memory(df)
+        return df
+
+class QueryStats:
+    """Process-wide log of recent query and panel timings
+
+    query() wraps one query execution, panel() one panel load. Queries run
+    inside a panel on the same thread are attributed to it, a panel that ran
+    none was answered by the caches.
+    """
+
+    def __init__(self, max_records=MAX_RECORDS):
+        self._queries = collections.deque(maxlen=max_records)
+        self._panels = collections.deque(maxlen=max_records)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def current(self):
+        """Record of the query running on this thread, None outside one"""
+        return getattr(self._local, "query", None)
+
+    def log_query(self, sql, **fields):
+        record = Record(
+            started=time.time(),
+            panel=getattr(self._local, "panel", None),
+            fingerprint=fingerprint(sql),
+            sql=normalize(sql),
+            source="local",
+            query_id=None,
+            seconds=None,
+            execute_seconds=None,
+            fetch_seconds=None,
+            rows=None,
+            bytes=None,
+            memory_bytes=None,
+            error=None
+        )
+        record.update(fields)
+        with self._lock:
+            self._queries.append(record)
+        return record
+
+    def log_panel(self, name, **fields):
+        record = Record(started=time.time(), panel=name, seconds=None, queries=0, cache="hit", rows=None, memory_bytes=None, error=None)
+        record.update(fields)
+        with self._lock:
+            self._panels.append(record)
+        return record
+
+    @contextmanager
+    def query(self, sql):
+        """Time one query, the code running it fills in the rest of the record"""
+        record = Record()
+        previous = self.current()
+        self._local.query = record
+        self._local.queries = getattr(self._local, "queries", 0) + 1
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = str(e)
+            raise
+        finally:
+            self._local.query = previous
+            self.log_query(sql, seconds=time.perf_counter() - started, **record)
+
+    @contextmanager
+    def panel(self, name):
+        """Time one panel load and count the queries it ran"""
+        record = Record()
+        self._local.panel = name
+        self._local.queries = 0
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = str(e)
+            raise
+        finally:
+            queries = self._local.queries
+            self._local.panel = None
+            self.log_panel(name, seconds=time.perf_counter() - started, queries=queries,
+                           cache="miss" if queries else "hit", **record)
+
+    def timed(self, name, loader):
+        """loader run as panel name, for run_panels"""
+        def run():
+            with self.panel(name) as record:
+                return record.result(loader())
+        return run
+
+    def queries(self):
+        with self._lock:
+            return pd.DataFrame(list(self._queries))
+
+    def panels(self):
+        with self._lock:
+            return pd.DataFrame(list(self._panels))
+
+    def clear(self):
+        with self._lock:
+            self._queries.clear()
+            self._panels.clear()
+
+#############################################
+#     SUMMARIES
+#############################################
+def panel_summary(panels_df):
+    """One row per panel, slowest first"""
+    grouped = panels_df.groupby("panel", dropna=False)
+    out = grouped.agg(
+        LOADS=("seconds", "size"),
+        CACHE_HITS=("cache", lambda c: (c == "hit").sum()),
+        MEDIAN_SECONDS=("seconds", "median"),
+        P95_SECONDS=("seconds", lambda c: c.quantile(0.95)),
+        MAX_SECONDS=("seconds", "max"),
+        QUERIES=("queries", "sum"),
+        ERRORS=("error", "count"),
+        LAST_ROWS=("rows", "last"),
+        LAST_MEMORY_MB=("memory_bytes", lambda c: c.iloc[-1] / 1048576 if pd.notna(c.iloc[-1]) else None)
+    ).reset_index().rename(columns={"panel": "PANEL"})
+    out["CACHE_HIT_RATE"] = out["CACHE_HITS"] / out["LOADS"]
+    return out.sort_values("P95_SECONDS", ascending=False).reset_index(drop=True)
+
+def query_summary(queries_df):
+    """One row per query fingerprint, most total time first"""
+    queries_df = queries_df.assign(panel=queries_df["panel"].fillna("(background)"))
+    grouped = queries_df.groupby("fingerprint")
+    out = grouped.agg(
+        SQL=("sql", "first"),
+        PANELS=("panel", lambda c: ", ".join(sorted(set(c)))),
+        RUNS=("seconds", "size"),
+        SNOWFLAKE_RUNS=("source", lambda c: (c == "snowflake").sum()),
+        TOTAL_SECONDS=("seconds", "sum"),
+        MEDIAN_SECONDS=("seconds", "median"),
+        MEDIAN_FETCH_SECONDS=("fetch_seconds", "median"),
+        MEDIAN_ROWS=("rows", "median"),
+        MAX_BYTES=("bytes", "max"),
+        MAX_MEMORY_MB=("memory_bytes", lambda c: c.max() / 1048576),
+        ERRORS=("error", "count")
+    ).reset_index().rename(columns={"fingerprint": "FINGERPRINT"})
+    return out.sort_values("TOTAL_SECONDS", ascending=False).reset_index(drop=True)
+
+def breakdown_sql(query_ids):
+    """Snowflake's queue / compile / execution milliseconds for query_ids, from the
+    near real-time INFORMATION_SCHEMA history (ACCOUNT_USAGE lags by up to 45 minutes)"""
+    ids = ", ".join("'" + query_id.replace("'", "''") + "'" for query_id in query_ids)
+    return (
+        "select query_id, queued_provisioning_time + queued_repair_time + queued_overload_time as queued_time, "
+        "compilation_time, execution_time "
+        "from table(snowflake.information_schema.query_history_by_user(result_limit => 10000)) "
+        f"where query_id in ({ids})"
+    )
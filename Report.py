@@ -0,0 +1,211 @@
+import argparse
+import datetime
+import html
+import os
+import threading
+from functools import partial
+from pathlib import Path
+
+from Daycache import load_daily
+from Fetch import fetch_dataframe
+from Historyextract import iter_extract
+from Localsql import run_local_or
+from Panelexecutor import run_panels, MAX_WORKERS
+from Queryregistry import plan
+from Streamagg import stream_panels
+from Usagecube import load_cube
+from Usagesketch import load_sketches
+from Usagepanels import panel_sql, panel_daily, panel_history, panel_cube, panel_sketch, panel_metrics, panel_figures, panel_notes
+from Addonpanels import addon_history, addon_figures, addon_kpis, addon_recommendations, window_sql
+
+REPORT_DIR = Path(os.environ.get("USAGE_REPORT_DIR", "usage_reports"))
+
+def report_loaders(start, end, run, cache=None):
+    """A zero-argument loader for every Usage.py and Addon.py panel over start..end, in Queryregistry.plan order
+
+    cache is the PartitionCache to keep every day, cube and sketch partition
+    in, the process-wide ones when None. The QUERY_HISTORY panels are computed
+    together, in one pass over the window's extract.
+    """
+    history_panels = {**panel_history, **addon_history}
+    streamed = {}
+    streamed_lock = threading.Lock()
+
+    def history(name):
+        with streamed_lock:
+            if not streamed:
+                try:
+                    streamed["results"] = stream_panels(history_panels, iter_extract(start, end, run, cache))
+                except Exception as e:
+                    streamed["error"] = e
+        if "error" in streamed:
+            raise streamed["error"]
+        return streamed["results"][name]
+
+    def cube(derive):
+        return derive(load_cube(start, end, run, cache, cache))
+
+    def sketch(derive):
+        return derive(load_sketches(start, end, run, cache, cache))
+
+    loaders = {name: partial(run, sql) for name, sql in panel_sql.items()}
+    loaders.update({name: partial(load_daily, query, start, end, run, cache) for name, query in panel_daily.items()})
+    loaders.update({name: partial(history, name) for name in panel_history})
+    loaders.update({name: partial(cube, derive) for name, derive in panel_cube.items()})
+    loaders.update({name: partial(sketch, derive) for name, derive in panel_sketch.items()})
+    loaders.update({name: partial(run, sql) for name, sql in window_sql(start, end).items()})
+    loaders.update({name: partial(history, name) for name in addon_history})
+    return {name: loaders[name] for name in plan(loaders)}
+
+def write_frames(results, out_dir):
+    """One Parquet file per panel, returns {name: error} for frames that couldn't be written"""
+    errors = {}
+    for name, df in results.items():
+        try:
+            df.to_parquet(out_dir / f"{name}.parquet", index=False)
+        except Exception as e:
+            errors[name] = f"Error writing Parquet: {str(e)}"
+    return errors
+
+def _figure_html(fig, include_plotlyjs):
+    return fig.to_html(full_html=False, include_plotlyjs=include_plotlyjs)
+
+def render_html(results, errors, start, end):
+    """Self-contained HTML page with every panel, plotly.js is inlined once
+
+    A panel whose metric or figure can't be built from its frame is shown as
+    an error and added to errors, the rest of the page is still rendered.
+    """
+    parts = []
+    plotlyjs = [True]
+
+    def figure(fig):
+        parts.append(_figure_html(fig, plotlyjs[0]))
+        plotlyjs[0] = False
+
+    def error(name):
+        parts.append(f"<p class='error'>{html.escape(name)}: {html.escape(errors[name])}</p>")
+
+    parts.append("<div class='metrics'>")
+    for name, metric in panel_metrics.items():
+        if name in results:
+            try:
+                label, value = metric(results[name])
+            except Exception as e:
+                errors[name] = f"Error: {str(e)}"
+                continue
+            parts.append(f"<div class='metric'><div>{html.escape(label)}</div><b>{html.escape(str(value))}</b></div>")
+    parts.append("</div>")
+    for name in panel_metrics:
+        if name in errors:
+            error(name)
+
+    for name, build in list(panel_figures.items()) + list(addon_figures.items()):
+        if name in errors:
+            error(name)
+            continue
+        try:
+            figures = build(results[name])
+            for fig in figures if isinstance(figures, list) else [figures]:
+                figure(fig)
+        except Exception as e:
+            errors[name] = f"Error: {str(e)}"
+            error(name)
+            continue
+        if name in panel_notes:
+            parts.append(f"<p class='note'>{html.escape(panel_notes[name])}</p>")
+
+    if "warehouse_efficiency" in results and "storage_objects" in results:
+        parts.append("<h2>Key Performance Indicators</h2>")
+        try:
+            kpis = addon_kpis(results["warehouse_efficiency"], results["storage_objects"])
+        except Exception as e:
+            errors["kpis"] = f"Error: {str(e)}"
+            error("kpis")
+        else:
+            parts.append("<div class='metrics'>")
+            for label, value in kpis:
+                parts.append(f"<div class='metric'><div>{html.escape(label)}</div><b>{html.escape(value)}</b></div>")
+            parts.append("</div>")
+
+    if all(name in results for name in ("table_warehouse_cost", "expensive_queries", "optimization_opps")):
+        parts.append("<h2>Cost Optimization Recommendations</h2>")
+        try:
+            lines = addon_recommendations(results["table_warehouse_cost"], results["expensive_queries"], results["optimization_opps"])
+        except Exception as e:
+            errors["recommendations"] = f"Error: {str(e)}"
+            error("recommendations")
+        else:
+            parts.append(f"<pre>{html.escape(chr(10).join(line.strip() for line in lines))}</pre>")
+
+    generated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Snowflake Account Usage {start} to {end}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+.metrics {{ display: flex; gap: 3em; margin: 1em 0; }}
+.metric b {{ font-size: 2em; }}
+.error {{ color: #b00020; }}
+.note {{ color: #555; }}
+</style>
+</head>
+<body>
+<h1>Snowflake Account Usage</h1>
+<p>{start} to {end}, generated {generated}</p>
+{chr(10).join(parts)}
+</body>
+</html>
+"""
+
+def run_report(pool, start, end, out_dir, max_workers=MAX_WORKERS):
+    """Run every panel for start..end at once, write its frames and report.html, return {name: error}"""
+    def fetch(sql):
+        with pool.connection() as conn:
+            return fetch_dataframe(conn, sql)
+
+    def run(sql):
+        return run_local_or(sql, fetch)
+
+    results, errors = {}, {}
+    for name, df, error in run_panels(report_loaders(start, end, run), max_workers):
+        if error:
+            errors[name] = error
+        else:
+            results[name] = df
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    errors.update(write_frames(results, out_dir))
+    (out_dir / "report.html").write_text(render_html(results, errors, start, end), encoding="utf-8")
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every dashboard panel without a browser, writing Parquet frames and an HTML report")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, help="first day (default: 30 days ago)")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="last day, included (default: today)")
+    parser.add_argument("--connection", default="snowflake", help="secrets.toml section with the account's connection parameters")
+    parser.add_argument("--out", help=f"output directory (default: {REPORT_DIR}/<end>)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="panels queried at once")
+    args = parser.parse_args()
+
+    end = args.end or datetime.date.today()
+    start = args.start or end - datetime.timedelta(days=30)
+    out_dir = Path(args.out) if args.out else REPORT_DIR / end.isoformat()
+
+    import streamlit as st
+    from Pool import ConnectionPool
+
+    pool = ConnectionPool(st.secrets[args.connection], min_size=1, max_size=args.workers)
+    try:
+        errors = run_report(pool, start, end, out_dir, args.workers)
+    finally:
+        pool.close()
+    for name, error in errors.items():
+        print(f"{name}: {error}")
+    print(f"Report written to {out_dir / 'report.html'}")
+    raise SystemExit(1 if errors else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import hashlib
+import io
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import pandas as pd
+
+from Boundsql import params_of
+
+# Off by default. file:<directory> or sqlite:<path> share results between every
+# process pointed at the same place, e.g. USAGE_SHARED_CACHE=sqlite:/shared/usage.db
+SHARED_CACHE_URL = os.environ.get("USAGE_SHARED_CACHE", "")
+# Bump to orphan every stored result after a change to how frames are built
+KEY_VERSION = "1"
+# A refresh lease older than this is assumed dead (its process crashed) and taken over
+LOCK_TTL = 300
+# How long a process waits for another one's refresh before running the query itself
+LOCK_WAIT = 60
+WAIT_INTERVAL = 0.5
+
+def content_key(query, *params):
+    """Same SQL (ignoring layout whitespace) and params -> same key, on every replica"""
+    normalized = re.sub(r"\s+", " ", query).strip().rstrip(";")
+    payload = "\x1f".join([KEY_VERSION, normalized] + [str(p) for p in params])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _to_bytes(df):
+    buf = io.BytesIO()
+    df.to_parquet(buf, index=False)
+    return buf.getvalue()
+
+def _from_bytes(payload):
+    return pd.read_parquet(io.BytesIO(payload))
+
+class CacheBackend:
+    """Where shared results live. A networked store (Redis, S3, ...) implements these five methods
+
+    get returns (payload bytes, stored_at epoch seconds) or None. acquire takes a
+    lease on key for ttl seconds for owner and returns whether it got it, release
+    gives it back if owner still holds it.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def put(self, key, payload):
+        raise NotImplementedError
+
+    def acquire(self, key, owner, ttl):
+        raise NotImplementedError
+
+    def release(self, key, owner):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+class FileBackend(CacheBackend):
+    """One file per key in a directory every process can reach (local disk or NFS)"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key, suffix):
+        return self.directory / key[:2] / f"{key}{suffix}"
+
+    def get(self, key):
+        path = self._path(key, ".parquet")
+        try:
+            stored_at = path.stat().st_mtime
+            return path.read_bytes(), stored_at
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, payload):
+        path = self._path(key, ".parquet")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(payload)
+        os.replace(tmp, path)
+
+    @contextmanager
+    def _guard(self, key):
+        """Exclusive across processes while a lease is checked and changed
+
+        Taking over a stale lease is check-then-unlink, without the guard two
+        processes could both find it expired and one delete the lease the other
+        had just taken. The OS drops the lock if its process dies, and on
+        systems without fcntl leases are unguarded.
+        """
+        path = self._path(key, ".guard").with_name(".guard")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def acquire(self, key, owner, ttl):
+        with self._guard(key):
+            return self._acquire(key, owner, ttl)
+
+    def _acquire(self, key, owner, ttl):
+        path = self._path(key, ".lock")
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - path.stat().st_mtime < ttl:
+                        return False
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(owner)
+            return True
+        return False
+
+    def release(self, key, owner):
+        path = self._path(key, ".lock")
+        with self._guard(key):
+            try:
+                if path.read_text() == owner:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def delete(self, key):
+        self._path(key, ".parquet").unlink(missing_ok=True)
+
+class SqliteBackend(CacheBackend):
+    """Results and leases in one SQLite file, for replicas on a host or a shared volume"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("create table if not exists results (key text primary key, stored_at real, payload blob)")
+            conn.execute("create table if not exists locks (key text primary key, owner text, expires_at real)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("pragma journal_mode=wal")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute("select payload, stored_at from results where key = ?", (key,)).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def put(self, key, payload):
+        with self._conn() as conn:
+            conn.execute("insert or replace into results (key, stored_at, payload) values (?, ?, ?)", (key, time.time(), payload))
+
+    def acquire(self, key, owner, ttl):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("delete from locks where key = ? and expires_at < ?", (key, now))
+            cur = conn.execute("insert or ignore into locks (key, owner, expires_at) values (?, ?, ?)", (key, owner, now + ttl))
+            return cur.rowcount == 1
+
+    def release(self, key, owner):
+        with self._conn() as conn:
+            conn.execute("delete from locks where key = ? and owner = ?", (key, owner))
+
+    def delete(self, key):
+        with self._conn() as conn:
+            conn.execute("delete from results where key = ?", (key,))
+
+# Networked stores register here under their URL scheme
+BACKENDS = {"file": FileBackend, "sqlite": SqliteBackend}
+
+def open_backend(url):
+    """Backend for a scheme:location URL, None when url is empty"""
+    if not url:
+        return None
+    scheme, _, location = url.partition(":")
+    if scheme not in BACKENDS:
+        raise ValueError(f"Unknown shared cache backend {scheme!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[scheme](location)
+
+class SharedCache:
+    """Cross-process result cache with one refresh per key at a time
+
+    The process that takes a key's lease runs the query and stores the result,
+    the others wait for it and read it back instead of querying too.
+    """
+
+    def __init__(self, backend, lock_ttl=LOCK_TTL, lock_wait=LOCK_WAIT):
+        self.backend = backend
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def _fresh(self, key, ttl):
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        payload, stored_at = entry
+        if time.time() - stored_at > ttl:
+            return None
+        return _from_bytes(payload)
+
+    def get_or_load(self, query, load, ttl):
+        """Stored result for query if younger than ttl, otherwise load it, at most one process at a time"""
+        key = content_key(query, *params_of(query))
+        df = self._fresh(key, ttl)
+        if df is not None:
+            return df
+
+        deadline = time.monotonic() + self.lock_wait
+        while not self.backend.acquire(key, self.owner, self.lock_ttl):
+            # Someone else is refreshing, take their result as soon as it lands
+            time.sleep(WAIT_INTERVAL)
+            df = self._fresh(key, ttl)
+            if df is not None:
+                return df
+            if time.monotonic() > deadline:
+                return load(query)
+        try:
+            # It may have landed between our check and taking the lease
+            df = self._fresh(key, ttl)
+            if df is not None:
+                return df
+            df = load(query)
+            try:
+                self.backend.put(key, _to_bytes(df))
+            except Exception:
+                # Not shareable (e.g. a column Parquet can't hold), this process still has it
+                pass
+            return df
+        finally:
+            self.backend.release(key, self.owner)
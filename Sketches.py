@@ -0,0 +1,107 @@
+# Mergeable sketches of a column per group, kept as plain frames of
+# (group keys..., SLOT, VALUE) rows so they are cached per day like any other
+# partition and merged by a groupby. Merging the sketches of two sets of rows
+# gives exactly the sketch of their union, so a window's percentiles and
+# distinct counts come from its days' sketches without rescanning the rows.
+#
+# Quantile sketch: values are counted in logarithmic buckets (the DDSketch
+#   layout), SLOT is the bucket and VALUE how many values fell in it. Any
+#   quantile is within QUANTILE_ACCURACY of the true value, relative to it.
+# HyperLogLog: SLOT is one of 2^HLL_PRECISION registers and VALUE its rank,
+#   only non-empty registers are stored. Counts have a standard error of
+#   1.04 / sqrt(2^HLL_PRECISION), and are exact-ish while they are small.
+import math
+
+import numpy as np
+import pandas as pd
+
+QUANTILE_ACCURACY = 0.01
+# Values at or below this are counted in the zero bucket
+QUANTILE_MIN_VALUE = 1e-9
+ZERO_BUCKET = np.iinfo(np.int64).min
+# 4096 registers, about 1.6% standard error
+HLL_PRECISION = 12
+SLOT = "SLOT"
+VALUE = "VALUE"
+
+def _empty(keys):
+    return pd.DataFrame({col: pd.Series(dtype=object) for col in keys} | {SLOT: pd.Series(dtype="int64"), VALUE: pd.Series(dtype="int64")})
+
+def _gamma(accuracy):
+    return (1 + accuracy) / (1 - accuracy)
+
+def quantile_sketch(df, keys, column, accuracy=QUANTILE_ACCURACY):
+    """Quantile sketch of column per keys group, missing values are left out"""
+    values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return _empty(keys)
+    values = values[valid]
+    slots = np.full(len(values), ZERO_BUCKET, dtype=np.int64)
+    positive = values > QUANTILE_MIN_VALUE
+    slots[positive] = np.ceil(np.log(values[positive]) / math.log(_gamma(accuracy)))
+    rows = df.loc[valid, keys].assign(**{SLOT: slots})
+    return rows.groupby(keys + [SLOT], dropna=False, sort=False).size().rename(VALUE).reset_index()
+
+def merge_quantile_sketches(sketches, keys):
+    """One quantile sketch per keys group from several, e.g. one per day or per finer group"""
+    sketches = [sketch for sketch in sketches if not sketch.empty]
+    if not sketches:
+        return _empty(keys)
+    return pd.concat(sketches, ignore_index=True).groupby(keys + [SLOT], as_index=False, dropna=False, sort=False)[VALUE].sum()
+
+def sketch_quantiles(sketch, keys, quantiles, accuracy=QUANTILE_ACCURACY):
+    """keys plus a COUNT column and one column per {output column: q} in quantiles"""
+    if sketch.empty:
+        return pd.DataFrame(columns=keys + ["COUNT"] + list(quantiles))
+    sketch = merge_quantile_sketches([sketch], keys).sort_values(keys + [SLOT], kind="stable")
+    grouped = sketch.groupby(keys, dropna=False, sort=False)[VALUE]
+    cumulative = grouped.cumsum()
+    total = grouped.transform("sum")
+    out = sketch.drop_duplicates(keys)[keys].assign(COUNT=grouped.transform("sum"))
+    gamma = _gamma(accuracy)
+    for name, q in quantiles.items():
+        first = sketch[cumulative > q * (total - 1)].drop_duplicates(keys)
+        slots = first[SLOT].to_numpy()
+        # A bucket is reported as the value halfway (relatively) between its bounds
+        value = np.where(slots == ZERO_BUCKET, 0.0, 2 * np.power(gamma, slots.astype(float)) / (gamma + 1))
+        out = out.merge(first[keys].assign(**{name: value}), on=keys, how="left")
+    return out.reset_index(drop=True)
+
+def hll_sketch(df, keys, column, precision=HLL_PRECISION):
+    """HyperLogLog sketch of the distinct values of column per keys group, missing values are left out"""
+    rows = df.loc[df[column].notna(), keys + [column]]
+    if rows.empty:
+        return _empty(keys)
+    # hash_pandas_object is stable across processes and versions, so persisted sketches stay mergeable
+    hashes = pd.util.hash_pandas_object(rows[column].astype(str), index=False).to_numpy(dtype=np.uint64)
+    width = 64 - precision
+    registers = (hashes >> np.uint64(width)).astype(np.int64)
+    rest = (hashes & np.uint64((1 << width) - 1)).astype(float)
+    # Rank: position of the leftmost 1 bit in the remaining width bits
+    ranks = np.where(rest > 0, width - np.floor(np.log2(np.maximum(rest, 1))), width + 1).astype(np.int64)
+    sketch = rows[keys].assign(**{SLOT: registers, VALUE: ranks})
+    return sketch.groupby(keys + [SLOT], as_index=False, dropna=False, sort=False)[VALUE].max()
+
+def merge_hll_sketches(sketches, keys):
+    """One HyperLogLog sketch per keys group from several"""
+    sketches = [sketch for sketch in sketches if not sketch.empty]
+    if not sketches:
+        return _empty(keys)
+    return pd.concat(sketches, ignore_index=True).groupby(keys + [SLOT], as_index=False, dropna=False, sort=False)[VALUE].max()
+
+def hll_count(sketch, keys, name, precision=HLL_PRECISION):
+    """keys plus the estimated distinct count per group in column name"""
+    if sketch.empty:
+        return pd.DataFrame(columns=keys + [name])
+    m = 1 << precision
+    alpha = 0.7213 / (1 + 1.079 / m)
+    sketch = merge_hll_sketches([sketch], keys)
+    grouped = sketch.assign(_INVERSE=np.power(2.0, -sketch[VALUE].astype(float))).groupby(keys, as_index=False, dropna=False, sort=False)
+    out = grouped.agg(_FILLED=(SLOT, "size"), _INVERSE=("_INVERSE", "sum"))
+    empty = m - out["_FILLED"]
+    raw = alpha * m * m / (out["_INVERSE"] + empty)
+    # Small counts leave registers empty, linear counting is the better estimate there
+    linear = m * np.log(m / empty.where(empty > 0))
+    out[name] = np.round(raw.where((raw > 2.5 * m) | (empty == 0), linear)).astype("int64")
+    return out[keys + [name]]
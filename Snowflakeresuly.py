@@ -1,9 +1,9 @@
 import streamlit as st
 from datetime import datetime
 import time
-import pandas as pd
-import snowflake.connector
 from snowflake.connector.errors import ProgrammingError, OperationalError
+from Pool import ConnectionPool
+from Breaker import CircuitOpen, fetch_or_last_good
 
 def init_session_state():
     if "chat_history" not in st.session_state:
@@ -175,37 +175,34 @@ def load_custom_css():
         </style>
     """, unsafe_allow_html=True)
 
-def get_snowflake_connection():
-    """Get Snowflake connection"""
-    try:
-        conn = snowflake.connector.connect(
-            user=st.secrets["snowflake"]["user"],
-            password=st.secrets["snowflake"]["password"],
-            account=st.secrets["snowflake"]["account"],
-            warehouse=st.secrets["snowflake"]["warehouse"],
-            database=st.secrets["snowflake"]["database"],
-            schema=st.secrets["snowflake"]["schema"]
-        )
-        return conn
-    except Exception as e:
-        st.error(f"Failed to connect to Snowflake: {str(e)}")
-        return None
+@st.cache_resource
+def get_connection_pool():
+    """Shared Snowflake connection pool for every session in this process"""
+    return ConnectionPool(
+        {
+            "user": st.secrets["snowflake"]["user"],
+            "password": st.secrets["snowflake"]["password"],
+            "account": st.secrets["snowflake"]["account"],
+            "warehouse": st.secrets["snowflake"]["warehouse"],
+            "database": st.secrets["snowflake"]["database"],
+            "schema": st.secrets["snowflake"]["schema"]
+        },
+        **st.secrets.get("snowflake_pool", {})
+    )
 
 def execute_snowflake_query(query):
     """Execute query on Snowflake and return results as DataFrame"""
     try:
-        conn = get_snowflake_connection()
-        if conn:
-            df = pd.read_sql(query, conn)
-            conn.close()
-            return df, None
+        df, stale_notice = fetch_or_last_good(get_connection_pool(), query)
+        if stale_notice:
+            st.warning(stale_notice, icon="⚠️")
+        return df, None
+    except CircuitOpen as e:
+        return None, f"Snowflake Error: {str(e)}"
     except (ProgrammingError, OperationalError) as e:
         return None, f"Snowflake Error: {str(e)}"
     except Exception as e:
         return None, f"Error: {str(e)}"
-    finally:
-        if conn:
-            conn.close()
 
 def get_response(user_input):
     """Generate response for user input"""
@@ -0,0 +1,166 @@
+# Grouped aggregates over results too big to hold at once. Frames are fed in
+# one batch at a time (a few days of the QUERY_HISTORY extract, see
+# Historyextract.iter_extract) and only the running aggregates are kept, so
+# memory grows with the number of groups, not with the length of the window.
+# A whole frame is just a single batch, so the dashboard's in-memory panels
+# and the streamed ones share one definition.
+import pandas as pd
+
+from Sketches import QUANTILE_ACCURACY, merge_quantile_sketches, quantile_sketch, sketch_quantiles
+
+class Aggregates:
+    """Running grouped aggregates, fed with update() and read with result()
+
+    keys: columns to group by, missing values form their own group.
+    size: output column with the number of rows per group.
+    sums, counts, mins, maxs, distincts: {output column: input column}. counts
+      and distincts skip missing values. distincts keep every distinct
+      (group, value) pair, so they are for low-cardinality values like users.
+    quantiles: {output column: (input column, q)}, from a quantile sketch of
+      the input column (see Sketches), over non-negative values.
+    """
+
+    def __init__(self, keys, size=None, sums=None, counts=None, mins=None, maxs=None, distincts=None, quantiles=None,
+                 accuracy=QUANTILE_ACCURACY):
+        self.keys = list(keys)
+        self.size = size
+        self.sums = dict(sums or {})
+        self.counts = dict(counts or {})
+        self.mins = dict(mins or {})
+        self.maxs = dict(maxs or {})
+        self.distincts = dict(distincts or {})
+        self.quantiles = dict(quantiles or {})
+        self.accuracy = accuracy
+        self._state = None
+        self._distinct = {}
+        self._sketches = {}
+
+    def _spec(self):
+        spec = {}
+        spec.update({out: (col, "sum") for out, col in self.sums.items()})
+        spec.update({out: (col, "count") for out, col in self.counts.items()})
+        spec.update({out: (col, "min") for out, col in self.mins.items()})
+        spec.update({out: (col, "max") for out, col in self.maxs.items()})
+        return spec
+
+    def _combine_spec(self):
+        how = {out: "sum" for out in list(self.sums) + list(self.counts)}
+        how.update({out: "min" for out in self.mins})
+        how.update({out: "max" for out in self.maxs})
+        if self.size:
+            how[self.size] = "sum"
+        return how
+
+    def _add(self, state, part):
+        if state is None:
+            return part
+        return pd.concat([state, part]).groupby(level=list(range(len(self.keys))), dropna=False, sort=False).agg(self._combine_spec())
+
+    def update(self, df):
+        """Fold one batch of rows into the aggregates"""
+        if df is None or df.empty:
+            return self
+        grouped = df.groupby(self.keys, dropna=False, sort=False)
+        spec = self._spec()
+        part = grouped.agg(**spec) if spec else pd.DataFrame(index=grouped.size().index)
+        if self.size:
+            part[self.size] = grouped.size()
+        self._state = self._add(self._state, part)
+
+        for col in set(self.distincts.values()):
+            pairs = df[self.keys + [col]].dropna(subset=[col]).drop_duplicates()
+            previous = self._distinct.get(col)
+            self._distinct[col] = pairs if previous is None else pd.concat([previous, pairs]).drop_duplicates()
+
+        for col in {col for col, _ in self.quantiles.values()}:
+            sketch = quantile_sketch(df, self.keys, col, self.accuracy)
+            previous = self._sketches.get(col)
+            self._sketches[col] = sketch if previous is None else merge_quantile_sketches([previous, sketch], self.keys)
+        return self
+
+    def merge(self, other):
+        """Fold another Aggregates of the same definition (e.g. another account's or another day's) into this one"""
+        if other._state is not None:
+            self._state = self._add(self._state, other._state)
+        for col, pairs in other._distinct.items():
+            previous = self._distinct.get(col)
+            self._distinct[col] = pairs if previous is None else pd.concat([previous, pairs]).drop_duplicates()
+        for col, sketch in other._sketches.items():
+            previous = self._sketches.get(col)
+            self._sketches[col] = sketch if previous is None else merge_quantile_sketches([previous, sketch], self.keys)
+        return self
+
+    def result(self):
+        """One row per group with every output column"""
+        outputs = ([self.size] if self.size else []) + list(self._spec()) + list(self.distincts) + list(self.quantiles)
+        if self._state is None:
+            return pd.DataFrame(columns=self.keys + outputs)
+        out = self._state.reset_index()
+        for name, col in self.distincts.items():
+            distinct = self._distinct[col].groupby(self.keys, dropna=False, sort=False).size().rename(name).reset_index()
+            out = out.merge(distinct, on=self.keys, how="left")
+            out[name] = out[name].fillna(0).astype("int64")
+        for name, (col, q) in self.quantiles.items():
+            sketch = self._sketches.get(col)
+            if sketch is None:
+                out[name] = float("nan")
+                continue
+            quantile = sketch_quantiles(sketch, self.keys, {name: q}, self.accuracy)
+            out = out.merge(quantile[self.keys + [name]], on=self.keys, how="left")
+        return out[self.keys + outputs]
+
+class TopRows:
+    """The limit rows with the largest value seen across every batch"""
+
+    def __init__(self, value, limit):
+        self.value = value
+        self.limit = limit
+        self._rows = None
+
+    def _top(self, df):
+        return df.sort_values(self.value, ascending=False, kind="stable").head(self.limit)
+
+    def update(self, df):
+        if df is None or df.empty:
+            return self
+        self._rows = self._top(df) if self._rows is None else self._top(pd.concat([self._rows, self._top(df)]))
+        return self
+
+    def merge(self, other):
+        return self.update(other._rows)
+
+    def result(self):
+        if self._rows is None:
+            return pd.DataFrame(columns=[self.value])
+        return self._rows.reset_index(drop=True)
+
+class StreamedPanel:
+    """A panel computed from QUERY_HISTORY rows one batch at a time
+
+    prepare(batch) selects and derives the columns the accumulator needs,
+    accumulator() makes a fresh Aggregates or TopRows and finish(result) turns
+    what it accumulated into the panel's frame. Calling the panel with a whole
+    frame is the one-batch case.
+    """
+
+    def __init__(self, prepare, accumulator, finish=None):
+        self.prepare = prepare
+        self.accumulator = accumulator
+        self.finish = finish or (lambda df: df)
+
+    def over(self, batches):
+        acc = self.accumulator()
+        for batch in batches:
+            acc.update(self.prepare(batch))
+        return self.finish(acc.result())
+
+    def __call__(self, history_df):
+        return self.over([history_df])
+
+def stream_panels(panels, batches):
+    """{name: frame} for every StreamedPanel in panels, reading batches only once"""
+    accumulators = {name: panel.accumulator() for name, panel in panels.items()}
+    for batch in batches:
+        for name, panel in panels.items():
+            accumulators[name].update(panel.prepare(batch))
+    return {name: panel.finish(accumulators[name].result()) for name, panel in panels.items()}
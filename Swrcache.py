@@ -0,0 +1,70 @@
+import concurrent.futures
+import threading
+import time
+
+# Refreshes run on a small shared pool so a burst of expired keys can't flood Snowflake
+REFRESH_WORKERS = 4
+
+class SwrCache:
+    """Process-wide stale-while-revalidate cache of key -> value
+
+    A fresh entry is returned as is. Once it is older than ttl it is still
+    returned straight away, and a background refresh replaces it. Only a key
+    that has never been loaded makes the caller wait. Concurrent loads and
+    refreshes of one key share a single call to load.
+    """
+
+    def __init__(self, ttl, refresh_workers=REFRESH_WORKERS):
+        self.ttl = ttl
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=refresh_workers,
+            thread_name_prefix="swr-refresh"
+        )
+
+    def _run(self, key, load, future):
+        """Load key into the cache and resolve future with the value (or the error)"""
+        try:
+            value = load(key)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            with self._lock:
+                self._entries[key] = (value, time.time())
+            future.set_result(value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get(self, key, load):
+        """Return (value, age in seconds, stale), waiting only when nothing is cached for key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            future = self._inflight.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = time.time() - fetched_at
+                stale = age > self.ttl
+                if stale and future is None:
+                    future = concurrent.futures.Future()
+                    self._inflight[key] = future
+                    self._executor.submit(self._run, key, load, future)
+                return value, age, stale
+            owner = future is None
+            if owner:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+
+        # First load of key happens on the caller's thread, other callers wait for it
+        if owner:
+            self._run(key, load, future)
+        return future.result(), 0.0, False
+
+def describe_age(seconds):
+    if seconds < 120:
+        return f"{int(seconds)}s"
+    if seconds < 7200:
+        return f"{int(seconds // 60)} min"
+    return f"{seconds / 3600:.1f} h"
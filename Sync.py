@@ -0,0 +1,210 @@
+import argparse
+import datetime
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from Fetch import fetch_table
+
+STORE_DIR = Path(os.environ.get("USAGE_STORE_DIR", "usage_store"))
+WATERMARK_FILE = "_watermarks.json"
+
+# ACCOUNT_USAGE views land late (up to ~3h for metering), so every sync
+# re-reads this much before the high-water mark and de-duplicates on the key
+OVERLAP = datetime.timedelta(hours=3)
+# Daily views keep changing until the day is closed
+DATE_OVERLAP = datetime.timedelta(days=2)
+# First sync of a view goes back this far, in chunks so no single pull is huge
+INITIAL_DAYS = 365
+CHUNK_DAYS = 30
+
+# time_column None means the view is a snapshot and is replaced on every sync
+VIEWS = {
+    "QUERY_HISTORY": {"time_column": "START_TIME", "key": ["QUERY_ID"]},
+    "WAREHOUSE_METERING_HISTORY": {"time_column": "START_TIME", "key": ["WAREHOUSE_ID", "START_TIME"]},
+    "METERING_HISTORY": {"time_column": "START_TIME", "key": ["SERVICE_TYPE", "ENTITY_ID", "START_TIME"]},
+    "METERING_DAILY_HISTORY": {"time_column": "USAGE_DATE", "key": ["SERVICE_TYPE", "USAGE_DATE"]},
+    "STORAGE_USAGE": {"time_column": "USAGE_DATE", "key": ["USAGE_DATE"]},
+    "DATABASE_STORAGE_USAGE_HISTORY": {"time_column": "USAGE_DATE", "key": ["DATABASE_ID", "USAGE_DATE"]},
+    "LOGIN_HISTORY": {"time_column": "EVENT_TIMESTAMP", "key": ["EVENT_ID"]},
+    "LOAD_HISTORY": {"time_column": "LAST_LOAD_TIME", "key": ["TABLE_ID", "FILE_NAME", "LAST_LOAD_TIME"]},
+    "TABLE_STORAGE_METRICS": {"time_column": None, "key": None},
+}
+
+#############################################
+#     WATERMARKS
+#############################################
+def load_watermarks(store=STORE_DIR):
+    path = Path(store) / WATERMARK_FILE
+    if not path.exists():
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_watermarks(marks, store=STORE_DIR):
+    path = Path(store) / WATERMARK_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(marks, f, indent=2)
+    os.replace(tmp, path)
+
+def as_utc(value):
+    """Watermarks are compared as aware datetimes, NTZ columns are taken as UTC"""
+    if isinstance(value, datetime.datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+def parse_watermark(entry):
+    if entry is None or entry["type"] == "snapshot":
+        return None
+    if entry["type"] == "date":
+        return datetime.date.fromisoformat(entry["value"])
+    return as_utc(datetime.datetime.fromisoformat(entry["value"]))
+
+def sql_literal(value):
+    if isinstance(value, datetime.datetime):
+        return f"'{as_utc(value).isoformat()}'::timestamp_tz"
+    return f"'{value.isoformat()}'::date"
+
+#############################################
+#     LOCAL STORE
+#############################################
+def view_dir(view, store=STORE_DIR):
+    return Path(store) / view
+
+def view_files(view, store=STORE_DIR):
+    return sorted(view_dir(view, store).glob("*.parquet"))
+
+def _write_atomic(df, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".parquet.tmp")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp)
+    os.replace(tmp, path)
+
+def append_rows(view, df, store=STORE_DIR):
+    """Write rows into one Parquet file per day, replacing rows that share a key"""
+    spec = VIEWS[view]
+    days = pd.to_datetime(df[spec["time_column"]]).dt.date
+    for day, part in df.groupby(days, sort=True):
+        path = view_dir(view, store) / f"{day.isoformat()}.parquet"
+        if path.exists():
+            existing = pd.read_parquet(path)
+            part = pd.concat([existing, part], ignore_index=True)
+            part = part.drop_duplicates(subset=spec["key"], keep="last")
+        _write_atomic(part.reset_index(drop=True), path)
+
+def read_view(view, start=None, end=None, columns=None, store=STORE_DIR):
+    """Read a synced view back, only touching the day files in [start, end]"""
+    files = view_files(view, store)
+    if start is not None or end is not None:
+        def in_range(path):
+            try:
+                day = datetime.date.fromisoformat(path.stem)
+            except ValueError:
+                return True
+            return (start is None or day >= start) and (end is None or day <= end)
+        files = [f for f in files if in_range(f)]
+    if not files:
+        return pd.DataFrame(columns=columns or [])
+    frames = [pd.read_parquet(f, columns=columns) for f in files]
+    return pd.concat(frames, ignore_index=True)
+
+#############################################
+#     SYNC
+#############################################
+def _pull(pool, view, time_column, lower, upper):
+    sql = f"select * from snowflake.account_usage.{view.lower()} where {time_column} >= {sql_literal(lower)}"
+    if upper is not None:
+        sql += f" and {time_column} < {sql_literal(upper)}"
+    with pool.connection() as conn:
+        table = fetch_table(conn, sql)
+    return table.to_pandas() if table is not None else None
+
+def sync_view(pool, view, store=STORE_DIR, overlap=OVERLAP, now=None):
+    """Pull only the rows newer than the view's high-water mark (minus overlap) into the store"""
+    spec = VIEWS[view]
+    marks = load_watermarks(store)
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    synced_at = now.isoformat()
+
+    if spec["time_column"] is None:
+        with pool.connection() as conn:
+            table = fetch_table(conn, f"select * from snowflake.account_usage.{view.lower()}")
+        df = table.to_pandas() if table is not None else pd.DataFrame()
+        _write_atomic(df, view_dir(view, store) / "snapshot.parquet")
+        marks[view] = {"type": "snapshot", "value": synced_at, "synced_at": synced_at, "rows": len(df)}
+        save_watermarks(marks, store)
+        return len(df)
+
+    mark = parse_watermark(marks.get(view))
+    is_date = (isinstance(mark, datetime.date) and not isinstance(mark, datetime.datetime)) \
+        or (mark is None and spec["time_column"] == "USAGE_DATE")
+    if mark is None:
+        lower = now - datetime.timedelta(days=INITIAL_DAYS)
+    elif is_date:
+        lower = mark - max(DATE_OVERLAP, datetime.timedelta(days=overlap.days))
+    else:
+        lower = mark - overlap
+    if is_date and isinstance(lower, datetime.datetime):
+        lower = lower.date()
+
+    pulled = 0
+    end = now.date() if is_date else now
+    while True:
+        upper = lower + datetime.timedelta(days=CHUNK_DAYS)
+        last_chunk = upper >= end
+        df = _pull(pool, view, spec["time_column"], lower, None if last_chunk else upper)
+        if df is not None and not df.empty:
+            append_rows(view, df, store)
+            pulled += len(df)
+            newest = df[spec["time_column"]].max()
+            newest = as_utc(newest.to_pydatetime()) if hasattr(newest, "to_pydatetime") else newest
+            if mark is None or newest > mark:
+                mark = newest
+        if mark is not None:
+            marks[view] = {
+                "type": "date" if is_date else "timestamp",
+                "value": mark.isoformat(),
+                "synced_at": synced_at,
+                "rows": pulled
+            }
+            save_watermarks(marks, store)
+        if last_chunk:
+            break
+        lower = upper
+    return pulled
+
+def sync_all(pool, views=None, store=STORE_DIR, overlap=OVERLAP):
+    """Sync every configured view, one failure doesn't stop the others"""
+    results = {}
+    for view in views or VIEWS:
+        try:
+            results[view] = (sync_view(pool, view, store, overlap), None)
+        except Exception as e:
+            results[view] = (0, f"Error: {str(e)}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally copy ACCOUNT_USAGE views into a local Parquet store")
+    parser.add_argument("views", nargs="*", help="views to sync (default: all)")
+    parser.add_argument("--store", default=str(STORE_DIR))
+    parser.add_argument("--overlap-minutes", type=int, default=int(OVERLAP.total_seconds() // 60))
+    args = parser.parse_args()
+
+    import streamlit as st
+    from Pool import ConnectionPool
+
+    pool = ConnectionPool(st.secrets["snowflake"], min_size=1, max_size=1)
+    views = [v.upper() for v in args.views] or None
+    results = sync_all(pool, views, args.store, datetime.timedelta(minutes=args.overlap_minutes))
+    for view, (rows, error) in results.items():
+        print(f"{view}: {error}" if error else f"{view}: {rows:,} rows pulled")
+    pool.close()
+
+if __name__ == "__main__":
+    main()
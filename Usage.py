@@ -3,25 +3,135 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px 
 import datetime
-import snowflake.connector
+from functools import partial
 from snowflake.connector.pandas_tools import write_pandas
+from Panelexecutor import run_panels
+from Pool import ConnectionPool
+from Fetch import fetch_dataframe
+from Localsql import run_local_or
+from Swrcache import SwrCache, describe_age
+from Breaker import breaker_for
+from Sharedcache import SharedCache, open_backend, SHARED_CACHE_URL
+from Daycache import load_daily
+from Historyextract import iter_extract
+from Usagecube import load_cube, slice_cube
+from Usagesketch import load_sketches
+from Queryregistry import plan, query_for
+from Usagepanels import panel_sql, panel_daily, panel_history, panel_cube, panel_sketch, panel_metrics, panel_figures, panel_notes
+from Prewarm import Prewarmer, HISTORY_JOBS, PREWARM_IN_APP
+from Querystats import QueryStats, panel_summary, query_summary, breakdown_sql
 
 #############################################
 #     SNOWFLAKE CONNECTION
 #############################################
-# Initialize connection
+# Initialize connection pool, shared by every session in this process
 @st.cache_resource
-def init_connection():
-    return snowflake.connector.connect(
-        **st.secrets["snowflake"]
+def init_connection_pool():
+    return ConnectionPool(
+        st.secrets["snowflake"],
+        **st.secrets.get("snowflake_pool", {})
     )
 
-conn = init_connection()
+pool = init_connection_pool()
 
-# Perform query
-@st.cache_data(ttl=600)
-def run_query(query):
-    return pd.read_sql(query, conn)
+# Trips when the warehouse is failing or too slow, queries then fail at once
+# and panels fall back to their last cached results until a probe succeeds
+warehouse_breaker = breaker_for(pool)
+
+# Every query that runs is timed for the Performance page, with the panel that asked for it
+@st.cache_resource
+def init_query_stats():
+    return QueryStats()
+
+query_stats = init_query_stats()
+
+def _fetch_pooled(query):
+    record = query_stats.current()
+    if record is not None:
+        record["source"] = "snowflake"
+    with pool.connection() as conn:
+        return fetch_dataframe(conn, query, timings=record)
+
+# Perform query on a connection checked out for this thread
+def fetch_snowflake(query):
+    return warehouse_breaker.call(_fetch_pooled, query)
+
+# Answer from the synced local store when it can, Snowflake otherwise
+def fetch_query(query):
+    with query_stats.query(query) as record:
+        return record.result(run_local_or(query, fetch_snowflake))
+
+# Cached results are tiered by how fresh the panel needs them: "live" views
+# keep changing through the day, "daily" views (storage, billed credits) only
+# gain a row once a day. Date-filtered panels are tiered per day in Daycache.
+freshness_ttl = {"live": 600, "daily": 6 * 3600}
+
+# With USAGE_SHARED_CACHE set, every replica reads and writes one shared
+# store and only one of them runs a given query per TTL
+@st.cache_resource
+def init_shared_cache():
+    backend = open_backend(SHARED_CACHE_URL)
+    return SharedCache(backend) if backend is not None else None
+
+shared_cache = init_shared_cache()
+
+def fetch_shared(query, ttl=freshness_ttl["live"]):
+    if shared_cache is None:
+        return fetch_query(query)
+    return shared_cache.get_or_load(query, fetch_query, ttl)
+
+# An expired result is still served at once while a background refresh
+# replaces it, so only the very first visitor waits on Snowflake.
+@st.cache_resource
+def init_result_caches():
+    return {tier: SwrCache(ttl=ttl) for tier, ttl in freshness_ttl.items()}
+
+result_caches = init_result_caches()
+
+#############################################
+#     PERFORMANCE PAGE
+#############################################
+# Not linked from the dashboard, open the app with ?page=performance. Shows
+# which panels and queries this process spends its time on, since it started.
+def show_performance_page():
+    st.title("Dashboard Performance")
+    if st.button("Clear records"):
+        query_stats.clear()
+    panels_df, queries_df = query_stats.panels(), query_stats.queries()
+    if panels_df.empty:
+        st.info("Nothing recorded yet, load the dashboard first.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Panel loads", f"{len(panels_df):,}")
+    col2.metric("Answered by the caches", f"{(panels_df['cache'] == 'hit').mean():.0%}")
+    col3.metric("Queries run", f"{len(queries_df):,}")
+
+    st.subheader("Panels")
+    panels = panel_summary(panels_df)
+    fig_panels = px.bar(panels, x='P95_SECONDS', y='PANEL', orientation='h', title="Panel Load Time (95th percentile, seconds)")
+    st.plotly_chart(fig_panels, use_container_width=True)
+    st.dataframe(panels, use_container_width=True, hide_index=True)
+    if queries_df.empty:
+        return
+
+    st.subheader("Queries")
+    st.dataframe(query_summary(queries_df), use_container_width=True, hide_index=True)
+
+    st.subheader("Recent Queries")
+    recent = queries_df.sort_values("started", ascending=False).head(200)
+    recent.columns = [col.upper() for col in recent.columns]
+    recent["STARTED"] = pd.to_datetime(recent["STARTED"], unit="s")
+    query_ids = recent["QUERY_ID"].dropna().tolist()
+    if query_ids:
+        try:
+            breakdown = fetch_snowflake(breakdown_sql(query_ids))
+            for col in ["QUEUED_TIME", "COMPILATION_TIME", "EXECUTION_TIME"]:
+                breakdown[col.replace("_TIME", "_SECONDS")] = pd.to_numeric(breakdown.pop(col)) / 1000
+            recent = recent.merge(breakdown, on="QUERY_ID", how="left")
+        except Exception as e:
+            st.warning(f"Snowflake's queue, compile and execution times are unavailable: {str(e)}")
+    st.dataframe(recent, use_container_width=True, hide_index=True)
 
 #############################################
 #     FORMATTING
@@ -29,6 +139,10 @@ def run_query(query):
 #set to wide format
 st.set_page_config(layout="wide")
 
+if st.query_params.get("page") == "performance":
+    show_performance_page()
+    st.stop()
+
 # Write directly to the app
 st.title("Snowflake Account Usage App :snowflake:")
 st.divider()
@@ -44,14 +158,14 @@ st.divider()
 #############################################
 #     DATE FILTER
 #############################################
-max_date = datetime.datetime.now()
-min_date = datetime.datetime.now() - datetime.timedelta(days=365)
+max_date = datetime.date.today()
+min_date = datetime.date.today() - datetime.timedelta(days=365)
 this_year = max_date.year
 jan_1 = datetime.date(this_year, 1, 1)
 dec_31 = datetime.date(this_year, 12, 31)
 
 if 'starting' not in st.session_state:
-    st.session_state.starting = datetime.datetime.now() - datetime.timedelta(days=30)
+    st.session_state.starting = datetime.date.today() - datetime.timedelta(days=30)
 
 if 'ending' not in st.session_state:
     st.session_state.ending = max_date
@@ -63,24 +177,24 @@ col1, col2, col3, col4, col5 = st.columns([1,1,1,1,1])
 
 with col1:
     if st.button('30 Days'):
-            st.session_state.starting = datetime.datetime.now() - datetime.timedelta(days=30)
-            st.session_state.ending = datetime.datetime.now()
+            st.session_state.starting = datetime.date.today() - datetime.timedelta(days=30)
+            st.session_state.ending = datetime.date.today()
 with col2:
     if st.button('60 Days'):
-            st.session_state.starting = datetime.datetime.now() - datetime.timedelta(days=60)
-            st.session_state.ending = datetime.datetime.now()
+            st.session_state.starting = datetime.date.today() - datetime.timedelta(days=60)
+            st.session_state.ending = datetime.date.today()
 with col3:
     if st.button('90 Days'):
-            st.session_state.starting = datetime.datetime.now() - datetime.timedelta(days=90)
-            st.session_state.ending = datetime.datetime.now()
+            st.session_state.starting = datetime.date.today() - datetime.timedelta(days=90)
+            st.session_state.ending = datetime.date.today()
 with col4:
     if st.button('180 Days'):
-            st.session_state.starting = datetime.datetime.now() - datetime.timedelta(days=180)
-            st.session_state.ending = datetime.datetime.now()
+            st.session_state.starting = datetime.date.today() - datetime.timedelta(days=180)
+            st.session_state.ending = datetime.date.today()
 with col5:
     if st.button('365 Days'):
-            st.session_state.starting = datetime.datetime.now() - datetime.timedelta(days=365)
-            st.session_state.ending = datetime.datetime.now()
+            st.session_state.starting = datetime.date.today() - datetime.timedelta(days=365)
+            st.session_state.ending = datetime.date.today()
 
 #Date Input
 date_input_filter = st.date_input(
@@ -96,227 +210,134 @@ s,e = date_input_filter
 st.divider()
 
 #############################################
-#     Cards at Top
-#############################################
-#Credits Used Tile
-credits_used_sql = f"select round(sum(credits_used),0) as total_credits from snowflake.account_usage.metering_history where start_time between '{s}' and '{e}'"
-credits_used_df = run_query(credits_used_sql)
-credits_used_tile = credits_used_df.iloc[0].values[0]
-
-# Total # of Jobs Executed
-num_jobs_sql = f"select count(*) as number_of_jobs from snowflake.account_usage.query_history where start_time between '{s}' and '{e}'"
-num_jobs_df = run_query(num_jobs_sql)
-num_jobs_tile = num_jobs_df.iloc[0].values[0]
-
-# Current Storage
-current_storage_sql = f"select round(avg(storage_bytes + stage_bytes + failsafe_bytes) / power(1024, 4),2) as billable_tb from snowflake.account_usage.storage_usage where USAGE_DATE = current_date() -1;"
-current_storage_df = run_query(current_storage_sql)
-current_storage_tile = current_storage_df.iloc[0].values[0]
-
-#Column formatting and metrics of header 3 metrics
-col1, col2, col3 = st.columns(3)
-col1.metric("Credits Used","{:,}".format(int(credits_used_tile))) 
-col2.metric("Total # of Jobs Executed","{:,}".format(int(num_jobs_tile))) 
-col3.metric("Current Storage (TB)",current_storage_tile)
-
-#############################################
-#     Credit Usage Total (Bar Chart)
+#     CROSS FILTER
 #############################################
-total_credits_used_sql = f"select warehouse_name,sum(credits_used) as total_credits_used from snowflake.account_usage.warehouse_metering_history where start_time between '{s}' and '{e}' group by 1 order by 2 desc limit 10 "
-pandas_credits_used_df = run_query(total_credits_used_sql)
+# Selecting bars in either warehouse chart narrows every other panel to
+# those warehouses. The usage cube, the sketches and the QUERY_HISTORY extract are already
+# in memory, so the filtered panels are recomputed locally with no new queries.
+warehouse_selection_keys = {
+    "credits_by_warehouse": "select_credits_by_warehouse",
+    "jobs_by_warehouse": "select_jobs_by_warehouse"
+}
 
-#Chart
-fig_credits_used=px.bar(pandas_credits_used_df,x='TOTAL_CREDITS_USED',y='WAREHOUSE_NAME',orientation='h',title="Credits Used by Warehouse")
-fig_credits_used.update_traces(marker_color='green')
+def selected_warehouses():
+    for key in warehouse_selection_keys.values():
+        selection = st.session_state.get(key)
+        if selection and selection.selection.points:
+            return sorted({point["y"] for point in selection.selection.points})
+    return []
 
-#############################################
-#     Jobs by Warehouse
-#############################################
-jobs_by_warehouse_sql = f"select warehouse_name,count(*) as number_of_jobs from snowflake.account_usage.query_history where start_time between '{s}' and '{e}' group by 1 order by 2 desc limit 10"
-pandas_jobs_by_warehouse_df = run_query(jobs_by_warehouse_sql)
-
-#chart
-fig_jobs_by_warehouse=px.bar(pandas_jobs_by_warehouse_df,x='NUMBER_OF_JOBS',y='WAREHOUSE_NAME',orientation='h',title="# of Jobs by Warehouse")
-fig_jobs_by_warehouse.update_traces(marker_color='purple')
-
-#############################################
-#    Execution by Query Type
-#############################################
-execution_by_qtype = f"select query_type, warehouse_size, avg(execution_time) / 1000 as average_execution_time from snowflake.account_usage.query_history where start_time between '{s}' and '{e}' group by 1, 2 order by 3 desc;"
-pandas_execution_by_qtype_df = run_query(execution_by_qtype)
-
-#chart
-fig_execution_by_qtype=px.bar(pandas_execution_by_qtype_df,x='AVERAGE_EXECUTION_TIME',y='QUERY_TYPE',orientation='h',title="Average Execution by Query Type")
-
-#############################################
-#     Container 1: Credits & Jobs
-#############################################
-container1 = st.container()
+warehouse_filter = selected_warehouses()
+if warehouse_filter:
+    st.info(f"Filtered to warehouse: {', '.join(warehouse_filter)}. Double-click the selected chart to clear.", icon="🔎")
 
-with container1:
-    plot1, plot2,plot3 = st.columns(3)
-    with plot1:
-        st.plotly_chart(fig_credits_used, use_container_width=True)
-    with plot2:
-        st.plotly_chart(fig_jobs_by_warehouse, use_container_width=True)
-    with plot3:
-        st.plotly_chart(fig_execution_by_qtype, use_container_width=True)
-
-#############################################
-#     Credits Used Overtime
-#############################################
-credits_used_overtime_sql = f"select start_time::date as usage_date, warehouse_name, sum(credits_used) as total_credits_used from snowflake.account_usage.warehouse_metering_history where start_time between '{s}' and '{e}' group by 1,2 order by 2,1"
-pandas_credits_used_overtime_df = run_query(credits_used_overtime_sql)
+# Shown while the warehouse's breaker is open, panels are then served from cache
+breaker_banner = st.empty()
 
-#chart
-fig_credits_used_overtime_df=px.bar(pandas_credits_used_overtime_df,x='USAGE_DATE',y='TOTAL_CREDITS_USED',color='WAREHOUSE_NAME',orientation='v',title="Credits Used Overtime")
-st.plotly_chart(fig_credits_used_overtime_df, use_container_width=True)
+def show_breaker_banner():
+    if warehouse_breaker.is_open:
+        breaker_banner.warning(f"{warehouse_breaker.message()}. Showing the last cached results, reconnecting in the background.", icon="⚠️")
 
-#############################################
-#     Top 25 Longest Queries (Success)
-#############################################
-longest_queries_sql = f"select query_id,query_text,(execution_time / 60000) as exec_time from snowflake.account_usage.query_history where execution_status = 'SUCCESS' and start_time between '{s}' and '{e}' order by execution_time desc limit 25"
-pandas_longest_queries_df = run_query(longest_queries_sql)
+show_breaker_banner()
 
-#chart
-fig_longest_queries=px.bar(pandas_longest_queries_df,x='EXEC_TIME',y='QUERY_TEXT',orientation='h',title="Longest Successful Queries (Top 25) ")
+def cross_filter(name, df):
+    """Rows of df for the selected warehouses, the charts the selection is made on stay whole"""
+    if not warehouse_filter or name in warehouse_selection_keys or "WAREHOUSE_NAME" not in df.columns:
+        return df
+    return df[df["WAREHOUSE_NAME"].isin(warehouse_filter)].reset_index(drop=True)
 
 #############################################
-#     Top 25 Longest Queries (Failed)
+#     PRE-WARM
 #############################################
-f_longest_queries_sql = f"select query_id,query_text,(execution_time / 60000) as exec_time from snowflake.account_usage.query_history where execution_status = 'FAIL' and start_time between '{s}' and '{e}' order by execution_time desc limit 25"
-f_pandas_longest_queries_df = run_query(f_longest_queries_sql)
-
-#chart
-fig_f_longest_queries=px.bar(f_pandas_longest_queries_df,x='EXEC_TIME',y='QUERY_TEXT',orientation='h',title="Longest Failed Queries (Top 25)")
-fig_f_longest_queries.update_traces(marker_color='red')
+# One scheduler per process re-runs every panel's load for the standard date
+# windows in quiet hours, so the first visitor of the day finds the day cache
+# and result caches warm. Each pass is logged with what it cost.
+def warm_sql_panel(tier, sql, start, end, run):
+    result_caches[tier].get(sql, run)
 
-#############################################
-#     Container 2: Query Success/Failure
-#############################################
-container2 = st.container()
+@st.cache_resource
+def init_prewarmer():
+    jobs = dict(HISTORY_JOBS)
+    jobs.update({name: partial(load_daily, query) for name, query in panel_daily.items()})
+    jobs.update({name: partial(warm_sql_panel, query_for(name).freshness, sql) for name, sql in panel_sql.items()})
+    return Prewarmer(jobs, fetch_shared).start()
 
-with container2:
-    plot1, plot2 = st.columns(2)
-    with plot1:
-        st.plotly_chart(fig_longest_queries, use_container_width=True)
-    with plot2:
-        st.plotly_chart(fig_f_longest_queries, use_container_width=True)
+if PREWARM_IN_APP:
+    init_prewarmer()
 
 #############################################
-#     Warehouse Variance overtime
+#     LAYOUT
 #############################################
-warehouse_variance_sql=f"SELECT WAREHOUSE_NAME, DATE(START_TIME) AS DATE, SUM(CREDITS_USED) AS CREDITS_USED, AVG(SUM(CREDITS_USED)) OVER (PARTITION BY WAREHOUSE_NAME ORDER BY DATE ROWS 7 PRECEDING) AS CREDITS_USED_7_DAY_AVG, (TO_NUMERIC(SUM(CREDITS_USED)/CREDITS_USED_7_DAY_AVG*100,10,2)-100)::STRING || '%' AS VARIANCE_TO_7_DAY_AVERAGE FROM SNOWFLAKE.ACCOUNT_USAGE.WAREHOUSE_METERING_HISTORY where start_time between '{s}' and '{e}' GROUP BY DATE, WAREHOUSE_NAME ORDER BY DATE DESC"
-pandas_warehouse_variance_df = run_query(warehouse_variance_sql)
+# One placeholder per panel, in display order. Only the header metrics are
+# always drawn, every other section is a collapsible group whose panels are
+# only created, and so only queried, while it is open. Opening a group reruns
+# the page, panels fetched before come straight back from the caches above.
+placeholders = {}
+header_panels = ["credits_used", "num_jobs", "current_storage"]
 
-#chart
-fig_warehouse_variance_df=px.bar(pandas_warehouse_variance_df,x="DATE",y="VARIANCE_TO_7_DAY_AVERAGE",color ='WAREHOUSE_NAME',orientation='v',title="Warehouse Variance Greater than 7 day Average")
-st.plotly_chart(fig_warehouse_variance_df, use_container_width=True)
+def panel_group(label, key, expanded=False):
+    """Expander for a section of panels, None while it is collapsed"""
+    group = st.expander(label, expanded=expanded, key=key, on_change="rerun")
+    return group if group.open else None
 
-#############################################
-#     Total Execution Time by Repeated Queries
-#############################################
-total_execution_time_sql = f"select query_text, (sum(execution_time) / 60000) as exec_time from snowflake.account_usage.query_history where execution_status = 'SUCCESS' and start_time between '{s}' and '{e}' group by query_text order by exec_time desc limit 10"
-total_execution_time_df = run_query(total_execution_time_sql)
-fig_execution_time=px.bar(total_execution_time_df,x='EXEC_TIME',y='QUERY_TEXT', orientation='h',title="Total Execution Time by Repeated Queries")
-fig_execution_time.update_traces(marker_color='LightSkyBlue')
-st.plotly_chart(fig_execution_time, use_container_width=True)
+#Column formatting and metrics of header 3 metrics
+col1, col2, col3 = st.columns(3)
+placeholders["credits_used"] = col1.empty()
+placeholders["num_jobs"] = col2.empty()
+placeholders["current_storage"] = col3.empty()
 
-#############################################
-#     Credits Billed by Month
-#############################################
-credits_billed = f"select date_trunc('MONTH', usage_date) as Usage_Month, sum(CREDITS_BILLED) from snowflake.account_usage.metering_daily_history group by Usage_Month"
-credits_billed_df = run_query(credits_billed)
-fig_credits_billed=px.bar(credits_billed_df,x='USAGE_MONTH',y='SUM(CREDITS_BILLED)', orientation='v',title="Credits Billed by Month")
-st.plotly_chart(fig_credits_billed, use_container_width=True)
+# Container 1: Credits & Jobs
+container1 = panel_group("Credits & Jobs", "group_credits_jobs", expanded=True)
 
-st.info('The above chart is static and not modified by the date range filter', icon="ℹ️")
+if container1 is not None:
+    with container1:
+        plot1, plot2,plot3 = st.columns(3)
+        placeholders["credits_by_warehouse"] = plot1.empty()
+        placeholders["jobs_by_warehouse"] = plot2.empty()
+        placeholders["execution_by_qtype"] = plot3.empty()
 
-#############################################
-#  Top 10 Average Query Execution Time (By User)
-#############################################
-query_execution = "select user_name, (avg(execution_time)) / 1000 as average_execution_time from snowflake.account_usage.query_history group by 1 order by 2 desc limit 10"
-query_execution_df = run_query(query_execution)
-fig_cquery_execution=px.bar(query_execution_df,x='USER_NAME',y='AVERAGE_EXECUTION_TIME', orientation='v',title="Average Execution Time per User")
-fig_cquery_execution.update_traces(marker_color='MediumPurple')
-st.plotly_chart(fig_cquery_execution,use_container_width=True)
+        placeholders["credits_used_overtime"] = st.empty()
+        placeholders["load_by_hour"] = st.empty()
 
-#############################################
-#     GS Utilization by Query Type (Top 10)
-#############################################
-gs_utilization = "select query_type, sum(credits_used_cloud_services) cs_credits, count(1) num_queries from snowflake.account_usage.query_history where true group by 1 order by 2 desc limit 10"
-gs_utilization_df = run_query(gs_utilization)
-fig_gs_utilization=px.bar(gs_utilization_df,x='QUERY_TYPE',y='CS_CREDITS', orientation='v',title="GS Utilization by Query Type (Top 10)")
-fig_gs_utilization.update_traces(marker_color='green')
+# Container 2: Query Success/Failure
+container2 = panel_group("Query Performance", "group_query_performance")
 
-#############################################
-#     Top 10 Cloud Services by Warehouse                 
-#############################################
-compute_gs_by_warehouse = "select warehouse_name, sum(credits_used_cloud_services) CREDITS_USED_CLOUD_SERVICES from snowflake.account_usage.warehouse_metering_history where true group by 1 order by 2 desc limit 10"
-CREDITS_USED_CLOUD_SERVICES', orientation='v',title="Compute and Cloud Services by Warehouse", barmode="group")
-fig_compute_gs_by_warehouse.update_traces(marker_color='purple')
+if container2 is not None:
+    with container2:
+        plot1, plot2 = st.columns(2)
+        placeholders["longest_queries"] = plot1.empty()
+        placeholders["failed_longest_queries"] = plot2.empty()
 
-#############################################
-#     Container 3: Cloud services
-#############################################
-container2 = st.container()
-
-with container2:
-    plot1, plot2 = st.columns(2)
-    with plot1:
-        st.plotly_chart(fig_gs_utilization, use_container_width=True)
-    with plot2:
-        st.plotly_chart(fig_compute_gs_by_warehouse, use_container_width=True)
-    
-#############################################
-#     Data Storage used Overtime                
-#############################################
-storage_overtime = "select date_trunc(month, usage_date) as usage_month, avg(storage_bytes + stage_bytes + failsafe_bytes) / power(1024, 4) as billable_tb, avg(storage_bytes) / power(1024, 4) as Storage_TB, avg(stage_bytes) / power(1024, 4) as Stage_TB, avg(failsafe_bytes) / power(1024, 4) as Failsafe_TB from snowflake.account_usage.storage_usage group by 1 order by 1"
-storage_overtime_df = run_query(storage_overtime)
+        placeholders["warehouse_variance"] = st.empty()
+        placeholders["repeated_queries"] = st.empty()
 
-fig_storage_overtime=px.bar(storage_overtime_df,x='USAGE_MONTH',y='BILLABLE_TB', orientation='v',title="Data Storage used Overtime", barmode="group")
-st.plotly_chart(fig_storage_overtime, use_container_width=True)
+        plot1, plot2 = st.columns(2)
+        placeholders["runtime_percentiles"] = plot1.empty()
+        placeholders["schema_runtime_percentiles"] = plot2.empty()
 
-st.info('The above chart is static and non modified by the date range filter', icon="ℹ️")
+        placeholders["credits_billed"] = st.empty()
+        placeholders["execution_by_user"] = st.empty()
 
-#############################################
-#     Rows Loaded Overtime (COPY INTO)                   
-#############################################
-rows_loaded = f"select to_timestamp(date_trunc(day,last_load_time)) as usage_date, sum(row_count) as total_rows from snowflake.account_usage.load_history where usage_date between '{s}' and '{e}' group by 1 order by usage_date desc"
-rows_loaded_df = run_query(rows_loaded)
+# Container 3: Cloud services
+container3 = panel_group("Cloud Services & Storage", "group_cloud_storage")
 
-fig_rows_loaded=px.line(rows_loaded_df,x='USAGE_DATE',y='TOTAL_ROWS', orientation='v',title="Rows Loaded Overtime (Copy Into)")
-st.plotly_chart(fig_rows_loaded, use_container_width=True)
+if container3 is not None:
+    with container3:
+        plot1, plot2 = st.columns(2)
+        placeholders["gs_utilization"] = plot1.empty()
+        placeholders["compute_gs_by_warehouse"] = plot2.empty()
 
-#############################################
-#     Logins by User               
-#############################################
-logins = "select user_name, sum(iff(is_success = 'NO', 1, 0)) as Failed, count(*) as Success, sum(iff(is_success = 'NO', 1, 0)) / nullif(count(*), 0) as login_failure_rate from snowflake.account_usage.login_history group by 1 order by 4 desc"
-logins_df = run_query(logins)
+        placeholders["storage_overtime"] = st.empty()
+        placeholders["rows_loaded"] = st.empty()
 
-fig_logins=px.bar(logins_df,x='USER_NAME',y='SUCCESS', orientation='v',title="Logins by User", barmode="group")
-fig_logins.update_traces(marker_color='green')
+# Container Users
+container_users = panel_group("Logins", "group_logins")
 
-#############################################
-#     Logins by Client               
-#############################################
-logins_client = "select reported_client_type as Client, user_name, sum(iff(is_success = 'NO', 1, 0)) as Failed, count(*) as Success, sum(iff(is_success = 'NO', 1, 0)) / nullif(count(*), 0) as login_failure_rate from snowflake.account_usage.login_history group by 1, 2 order by 5 desc"
-logins_client_df = run_query(logins_client)
-
-fig_logins_client=px.bar(logins_client_df,x='CLIENT',y='SUCCESS', orientation='v',title="Logins by Client")
-fig_logins_client.update_traces(marker_color='purple')
-
-#############################################
-#     Container Users
-#############################################
-container_users = st.container()
-
-with container_users:
-    plot1, plot2 = st.columns(2)
-    with plot1:
-        st.plotly_chart(fig_logins, use_container_width=True)
-    with plot2:
-        st.plotly_chart(fig_compute_gs_by_warehouse, use_container_width=True)
+if container_users is not None:
+    with container_users:
+        plot1, plot2 = st.columns(2)
+        placeholders["logins"] = plot1.empty()
+        placeholders["logins_client"] = plot2.empty()
 
 #############################################
 #     FOOTER
@@ -333,5 +354,74 @@ with foot2:
 with foot3:
     st.markdown("October 2023")
 
-# Close Snowflake connection when app is done
-conn.close()
+#############################################
+#     RUN PANELS
+#############################################
+# Submit the panel queries of the header, then of every open section, and
+# draw each chart as soon as its result is back. A failed panel shows its own
+# error and the rest still render.
+for name in placeholders:
+    placeholders[name].caption("Loading...")
+
+def load_daily_panel(name, query):
+    return cross_filter(name, load_daily(query, s, e, fetch_shared))
+
+# Every QUERY_HISTORY tile derives from one extract of the window, fetched by
+# whichever loader gets there first and served from the day cache to the rest.
+# Long windows are aggregated a batch of days at a time, never loaded whole.
+def load_history_panel(derive):
+    return derive.over(cross_filter(None, batch) for batch in iter_extract(s, e, fetch_shared))
+
+def load_cube_panel(name, derive):
+    cube = load_cube(s, e, fetch_shared)
+    if name not in warehouse_selection_keys:
+        cube = slice_cube(cube, {"WAREHOUSE_NAME": warehouse_filter})
+    return derive(cube)
+
+def load_sketch_panel(derive):
+    return derive(slice_cube(load_sketches(s, e, fetch_shared), {"WAREHOUSE_NAME": warehouse_filter}))
+
+def load_sql_panel(name, sql):
+    tier = query_for(name).freshness
+    df, age, stale = result_caches[tier].get(sql, partial(fetch_shared, ttl=freshness_ttl[tier]))
+    panel_ages[name] = age if stale else None
+    return df
+
+panel_ages = {}
+panel_loaders = {name: partial(load_sql_panel, name, sql) for name, sql in panel_sql.items()}
+panel_loaders.update({name: partial(load_daily_panel, name, query) for name, query in panel_daily.items()})
+panel_loaders.update({name: partial(load_history_panel, derive) for name, derive in panel_history.items()})
+panel_loaders.update({name: partial(load_cube_panel, name, derive) for name, derive in panel_cube.items()})
+panel_loaders.update({name: partial(load_sketch_panel, derive) for name, derive in panel_sketch.items()})
+
+def show_panel(name, df):
+    if name in panel_metrics:
+        st.metric(*panel_metrics[name](df))
+        return
+    selection = {}
+    if name in warehouse_selection_keys:
+        selection = dict(on_select="rerun", selection_mode="points", key=warehouse_selection_keys[name])
+    st.plotly_chart(panel_figures[name](df), use_container_width=True, **selection)
+    if name in panel_notes:
+        st.info(panel_notes[name], icon="ℹ️")
+
+def render_panels(names):
+    for name, df, error in run_panels({name: query_stats.timed(name, panel_loaders[name]) for name in plan(names)}):
+        with placeholders[name].container():
+            if error:
+                st.error(error)
+                continue
+            # A figure that can't be drawn from its data only fails its own panel
+            try:
+                show_panel(name, df)
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+                continue
+            if panel_ages.get(name) is not None:
+                st.caption(f"Cached {describe_age(panel_ages[name])} ago, refreshing in the background")
+
+# The header gets the workers to itself, open sections only start once it is drawn
+render_panels(header_panels)
+render_panels([name for name in placeholders if name not in header_panels])
+
+show_breaker_banner()
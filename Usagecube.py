@@ -0,0 +1,95 @@
+import threading
+
+import pandas as pd
+
+from Daycache import PartitionCache, contiguous_runs, days_between, partition_cache, split_by_day
+from Historyextract import batch_days, extract_query, load_extract, query_credits
+from Queryregistry import Query, register
+
+TIME_DIMENSIONS = ["USAGE_DAY", "USAGE_HOUR"]
+DIMENSIONS = ["WAREHOUSE_NAME", "USER_NAME", "ROLE_NAME", "DATABASE_NAME", "QUERY_TYPE", "WAREHOUSE_SIZE"]
+# Every measure is additive, averages are rebuilt from a sum and a count after rolling up
+MEASURES = ["QUERY_COUNT", "CREDITS", "TOTAL_ELAPSED_TIME", "EXECUTION_TIME", "EXECUTIONS", "BYTES_SCANNED", "BYTES_SPILLED"]
+# Persisted cube partitions are keyed by the cube layout, changing it starts a fresh cache
+CUBE_KEY = "query_history_cube:" + ",".join(TIME_DIMENSIONS + DIMENSIONS + MEASURES)
+
+# Cube partitions follow the same open/closed day tiers as the extract partitions they are built from
+cube_cache = PartitionCache()
+# One build at a time per cache and partition key
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+
+# The cube's panels are registered by Usagepanels as derived from it
+query_history_cube = register(Query(
+    "query_history_cube",
+    views=["QUERY_HISTORY"],
+    columns=DIMENSIONS + [
+        "QUERY_ID", "CREDITS_USED_COMPUTE", "CREDITS_USED_CLOUD_SERVICES", "TOTAL_ELAPSED_TIME", "EXECUTION_TIME",
+        "BYTES_SCANNED", "BYTES_SPILLED_TO_LOCAL_STORAGE", "BYTES_SPILLED_TO_REMOTE_STORAGE"
+    ],
+    grain="day",
+    source="query_history"
+))
+
+def build_cube(extract):
+    """Roll QUERY_HISTORY rows up to one row per day x hour x dimension combination"""
+    df = extract.assign(
+        CREDITS=query_credits(extract),
+        BYTES_SPILLED=extract["BYTES_SPILLED_TO_LOCAL_STORAGE"] + extract["BYTES_SPILLED_TO_REMOTE_STORAGE"]
+    )
+    return df.groupby(TIME_DIMENSIONS + DIMENSIONS, as_index=False, dropna=False).agg(
+        QUERY_COUNT=("QUERY_ID", "size"),
+        CREDITS=("CREDITS", "sum"),
+        TOTAL_ELAPSED_TIME=("TOTAL_ELAPSED_TIME", "sum"),
+        EXECUTION_TIME=("EXECUTION_TIME", "sum"),
+        EXECUTIONS=("EXECUTION_TIME", "count"),
+        BYTES_SCANNED=("BYTES_SCANNED", "sum"),
+        BYTES_SPILLED=("BYTES_SPILLED", "sum")
+    )
+
+def load_rollups(key, build, start, end, run, cache=None, extract_cache=None):
+    """build(extract rows of one day) for every day of start..end, concatenated
+
+    Each day's result is a partition of cache under key, only days without one
+    are built. extract_cache holds the QUERY_HISTORY extract partitions they
+    are built from, the default partition cache when None.
+    """
+    cache = cube_cache if cache is None else cache
+    days = days_between(start, end)
+    with _build_locks_lock:
+        build_lock = _build_locks.setdefault((cache, key), threading.Lock())
+    with build_lock:
+        partitions = {day: cache.get(key, day) for day in days}
+        missing = [day for day, partition in partitions.items() if partition is None]
+        # Only the missing days' extract is loaded, and a long window's never whole:
+        # each run of missing days is built a batch at a time
+        step = batch_days(len(days))
+        for first, last in contiguous_runs(missing):
+            run_days = days_between(first, last)
+            for i in range(0, len(run_days), step):
+                batch = run_days[i:i + step]
+                extract = load_extract(batch[0], batch[-1], run, extract_cache)
+                for day, rows in split_by_day(extract, batch).items():
+                    # Built from an extract partition that can still change, it can too
+                    final = (partition_cache if extract_cache is None else extract_cache).is_final(extract_query().sql, day)
+                    partitions[day] = cache.put(key, day, build(rows), final)
+
+    frames = [partitions[day] for day in days]
+    non_empty = [df for df in frames if not df.empty]
+    return pd.concat(non_empty, ignore_index=True) if non_empty else frames[0]
+
+def load_cube(start, end, run, cache=None, extract_cache=None):
+    """Cube for start..end, only days without a cached cube partition are rolled up"""
+    return load_rollups(CUBE_KEY, build_cube, start, end, run, cache, extract_cache)
+
+def slice_cube(cube, filters):
+    """Keep the cube cells whose dimension values are in filters ({dimension: [values]})"""
+    for dimension, values in (filters or {}).items():
+        if values:
+            cube = cube[cube[dimension].isin(values)]
+    return cube
+
+def rollup(cube, by, measures=None):
+    """Sum the cube's measures over every dimension not in by"""
+    measures = measures or MEASURES
+    return cube.groupby(by, as_index=False, dropna=False)[measures].sum()
@@ -0,0 +1,429 @@
+# Every Usage.py tile: where its data comes from and how it is drawn. Nothing
+# here needs a running page, so Report.py and Prewarm.py load the same panels.
+import pandas as pd
+import plotly.express as px
+from functools import partial
+from Daycache import DailyQuery, merge_total, merge_group_sum
+from Historyextract import top
+from Queryregistry import Query, register
+from Streamagg import Aggregates, StreamedPanel, TopRows
+from Usagecube import rollup
+from Usagesketch import RUNTIME_QUANTILES, summarize
+
+#############################################
+#     PANELS
+#############################################
+# Every tile's query is declared once in Queryregistry, with the views and
+# columns it reads and the panels it feeds. The tile registers its SQL and how
+# to draw its result here: a metric function returning (label, value), or a
+# figure function returning a plotly figure, with an optional note shown under
+# it. Date-filtered tiles register a DailyQuery instead: their results are
+# cached per day, so changing the date range only fetches the days not seen
+# yet, and days that are over are kept on disk for good. Undated tiles whose
+# views only change once a day declare freshness "daily". Tiles over
+# QUERY_HISTORY register a function of the shared per-window extract instead,
+# so the whole page scans that view once. Tiles that only need totals register
+# a function of the usage cube rolled up from it, tiles of percentiles or
+# distinct counts one of the window's merged sketches.
+panel_sql = {}
+panel_daily = {}
+panel_history = {}
+panel_cube = {}
+panel_sketch = {}
+panel_metrics = {}
+panel_figures = {}
+panel_notes = {}
+
+#############################################
+#     Cards at Top
+#############################################
+#Credits Used Tile
+credits_used = register(Query(
+    "credits_used",
+    "select start_time::date as usage_day, sum(credits_used) as total_credits from snowflake.account_usage.metering_history where start_time >= '{start}' and start_time < '{end}' group by 1",
+    views=["METERING_HISTORY"],
+    columns=["START_TIME", "CREDITS_USED"],
+    grain="day",
+    panels=["credits_used"]
+))
+panel_daily["credits_used"] = DailyQuery("credits_used", credits_used.sql, merge_total("TOTAL_CREDITS", 0))
+
+def metric_credits_used(credits_used_df):
+    credits_used_tile = credits_used_df.iloc[0].values[0]
+    return "Credits Used", "{:,}".format(int(credits_used_tile))
+panel_metrics["credits_used"] = metric_credits_used
+
+# Total # of Jobs Executed
+register(Query("num_jobs", grain="day", limit=1, panels=["num_jobs"], source="query_history_cube"))
+
+def cube_num_jobs(cube_df):
+    return pd.DataFrame({"NUMBER_OF_JOBS": [cube_df["QUERY_COUNT"].sum()]})
+panel_cube["num_jobs"] = cube_num_jobs
+
+def metric_num_jobs(num_jobs_df):
+    num_jobs_tile = num_jobs_df.iloc[0].values[0]
+    return "Total # of Jobs Executed", "{:,}".format(int(num_jobs_tile))
+panel_metrics["num_jobs"] = metric_num_jobs
+
+# Current Storage
+current_storage = register(Query(
+    "current_storage",
+    "select round(avg(storage_bytes + stage_bytes + failsafe_bytes) / power(1024, 4),2) as billable_tb from snowflake.account_usage.storage_usage where USAGE_DATE = current_date() -1;",
+    views=["STORAGE_USAGE"],
+    columns=["USAGE_DATE", "STORAGE_BYTES", "STAGE_BYTES", "FAILSAFE_BYTES"],
+    freshness="daily",
+    limit=1,
+    panels=["current_storage"]
+))
+panel_sql["current_storage"] = current_storage.sql
+
+def metric_current_storage(current_storage_df):
+    current_storage_tile = current_storage_df.iloc[0].values[0]
+    return "Current Storage (TB)", current_storage_tile
+panel_metrics["current_storage"] = metric_current_storage
+
+#############################################
+#     Credit Usage Total (Bar Chart)
+#############################################
+# Daily credits per warehouse, shared with Credits Used Overtime and Warehouse
+# Variance: the three panels fetch and cache it once
+warehouse_credits = register(Query(
+    "warehouse_credits",
+    "select start_time::date as usage_day, warehouse_name, sum(credits_used) as total_credits_used from snowflake.account_usage.warehouse_metering_history where start_time >= '{start}' and start_time < '{end}' group by 1, 2",
+    views=["WAREHOUSE_METERING_HISTORY"],
+    columns=["START_TIME", "WAREHOUSE_NAME", "CREDITS_USED"],
+    grain="day",
+    panels=["credits_by_warehouse", "credits_used_overtime", "warehouse_variance"]
+))
+panel_daily["credits_by_warehouse"] = DailyQuery("credits_by_warehouse", warehouse_credits.sql, merge_group_sum("WAREHOUSE_NAME", "TOTAL_CREDITS_USED", 10))
+
+def figure_credits_by_warehouse(pandas_credits_used_df):
+    fig_credits_used=px.bar(pandas_credits_used_df,x='TOTAL_CREDITS_USED',y='WAREHOUSE_NAME',orientation='h',title="Credits Used by Warehouse")
+    fig_credits_used.update_traces(marker_color='green')
+    return fig_credits_used
+panel_figures["credits_by_warehouse"] = figure_credits_by_warehouse
+
+#############################################
+#     Jobs by Warehouse
+#############################################
+register(Query("jobs_by_warehouse", grain="day", limit=10, panels=["jobs_by_warehouse"], source="query_history_cube"))
+
+def cube_jobs_by_warehouse(cube_df):
+    out = rollup(cube_df, "WAREHOUSE_NAME", ["QUERY_COUNT"]).rename(columns={"QUERY_COUNT": "NUMBER_OF_JOBS"})
+    return top(out, "NUMBER_OF_JOBS", 10)
+panel_cube["jobs_by_warehouse"] = cube_jobs_by_warehouse
+
+def figure_jobs_by_warehouse(pandas_jobs_by_warehouse_df):
+    fig_jobs_by_warehouse=px.bar(pandas_jobs_by_warehouse_df,x='NUMBER_OF_JOBS',y='WAREHOUSE_NAME',orientation='h',title="# of Jobs by Warehouse")
+    fig_jobs_by_warehouse.update_traces(marker_color='purple')
+    return fig_jobs_by_warehouse
+panel_figures["jobs_by_warehouse"] = figure_jobs_by_warehouse
+
+#############################################
+#    Execution by Query Type
+#############################################
+register(Query("execution_by_qtype", grain="day", panels=["execution_by_qtype"], source="query_history_cube"))
+
+def cube_execution_by_qtype(cube_df):
+    out = rollup(cube_df, ["QUERY_TYPE", "WAREHOUSE_SIZE"], ["EXECUTION_TIME", "EXECUTIONS"])
+    out["AVERAGE_EXECUTION_TIME"] = out.pop("EXECUTION_TIME") / out.pop("EXECUTIONS").where(lambda c: c != 0) / 1000
+    return out.sort_values("AVERAGE_EXECUTION_TIME", ascending=False).reset_index(drop=True)
+panel_cube["execution_by_qtype"] = cube_execution_by_qtype
+
+def figure_execution_by_qtype(pandas_execution_by_qtype_df):
+    fig_execution_by_qtype=px.bar(pandas_execution_by_qtype_df,x='AVERAGE_EXECUTION_TIME',y='QUERY_TYPE',orientation='h',title="Average Execution by Query Type")
+    return fig_execution_by_qtype
+panel_figures["execution_by_qtype"] = figure_execution_by_qtype
+
+#############################################
+#     Credits Used Overtime
+#############################################
+def merge_credits_used_overtime(df):
+    out = df.rename(columns={"USAGE_DAY": "USAGE_DATE"})
+    return out.sort_values(["WAREHOUSE_NAME", "USAGE_DATE"]).reset_index(drop=True)
+panel_daily["credits_used_overtime"] = DailyQuery("credits_used_overtime", warehouse_credits.sql, merge_credits_used_overtime)
+
+def figure_credits_used_overtime(pandas_credits_used_overtime_df):
+    fig_credits_used_overtime_df=px.bar(pandas_credits_used_overtime_df,x='USAGE_DATE',y='TOTAL_CREDITS_USED',color='WAREHOUSE_NAME',orientation='v',title="Credits Used Overtime")
+    return fig_credits_used_overtime_df
+panel_figures["credits_used_overtime"] = figure_credits_used_overtime
+
+#############################################
+#     Query Load by Hour
+#############################################
+register(Query("load_by_hour", grain="day", panels=["load_by_hour"], source="query_history_cube"))
+
+def cube_load_by_hour(cube_df):
+    return rollup(cube_df, ["USAGE_DAY", "USAGE_HOUR"], ["QUERY_COUNT", "CREDITS"])
+panel_cube["load_by_hour"] = cube_load_by_hour
+
+def figure_load_by_hour(load_by_hour_df):
+    fig_load_by_hour=px.density_heatmap(load_by_hour_df,x='USAGE_HOUR',y='USAGE_DAY',z='CREDITS',histfunc='sum',nbinsx=24,title="Query Credits by Hour of Day")
+    return fig_load_by_hour
+panel_figures["load_by_hour"] = figure_load_by_hour
+
+#############################################
+#     Top 25 Longest Queries (Success)
+#############################################
+register(Query(
+    "longest_queries",
+    columns=["QUERY_ID", "QUERY_TEXT", "EXECUTION_STATUS", "EXECUTION_TIME"],
+    grain="day",
+    limit=25,
+    panels=["longest_queries", "failed_longest_queries"],
+    source="query_history"
+))
+
+def longest_by_status(history_df, status):
+    out = history_df[history_df["EXECUTION_STATUS"] == status]
+    return out.assign(EXEC_TIME=out["EXECUTION_TIME"] / 60000)[["QUERY_ID", "QUERY_TEXT", "EXEC_TIME"]]
+
+def longest_queries(status):
+    return StreamedPanel(partial(longest_by_status, status=status), lambda: TopRows("EXEC_TIME", 25))
+panel_history["longest_queries"] = longest_queries("SUCCESS")
+
+def figure_longest_queries(pandas_longest_queries_df):
+    fig_longest_queries=px.bar(pandas_longest_queries_df,x='EXEC_TIME',y='QUERY_TEXT',orientation='h',title="Longest Successful Queries (Top 25) ")
+    return fig_longest_queries
+panel_figures["longest_queries"] = figure_longest_queries
+
+#############################################
+#     Top 25 Longest Queries (Failed)
+#############################################
+panel_history["failed_longest_queries"] = longest_queries("FAIL")
+
+def figure_failed_longest_queries(f_pandas_longest_queries_df):
+    fig_f_longest_queries=px.bar(f_pandas_longest_queries_df,x='EXEC_TIME',y='QUERY_TEXT',orientation='h',title="Longest Failed Queries (Top 25)")
+    fig_f_longest_queries.update_traces(marker_color='red')
+    return fig_f_longest_queries
+panel_figures["failed_longest_queries"] = figure_failed_longest_queries
+
+#############################################
+#     Warehouse Variance overtime
+#############################################
+# Daily credits are cached per day, the 7 day average is computed after merging
+def merge_warehouse_variance(df):
+    out = df.rename(columns={"USAGE_DAY": "DATE", "TOTAL_CREDITS_USED": "CREDITS_USED"}).sort_values(["WAREHOUSE_NAME", "DATE"])
+    out["CREDITS_USED_7_DAY_AVG"] = out.groupby("WAREHOUSE_NAME")["CREDITS_USED"].transform(lambda c: c.rolling(8, min_periods=1).mean())
+    variance = (out["CREDITS_USED"] / out["CREDITS_USED_7_DAY_AVG"].where(out["CREDITS_USED_7_DAY_AVG"] != 0) * 100).round(2) - 100
+    out["VARIANCE_TO_7_DAY_AVERAGE"] = variance.map(lambda v: f"{v:.2f}%" if pd.notna(v) else None)
+    return out.sort_values("DATE", ascending=False).reset_index(drop=True)
+panel_daily["warehouse_variance"] = DailyQuery("warehouse_variance", warehouse_credits.sql, merge_warehouse_variance)
+
+def figure_warehouse_variance(pandas_warehouse_variance_df):
+    fig_warehouse_variance_df=px.bar(pandas_warehouse_variance_df,x="DATE",y="VARIANCE_TO_7_DAY_AVERAGE",color ='WAREHOUSE_NAME',orientation='v',title="Warehouse Variance Greater than 7 day Average")
+    return fig_warehouse_variance_df
+panel_figures["warehouse_variance"] = figure_warehouse_variance
+
+#############################################
+#     Total Execution Time by Repeated Queries
+#############################################
+register(Query(
+    "repeated_queries",
+    columns=["QUERY_TEXT", "EXECUTION_STATUS", "EXECUTION_TIME"],
+    grain="day",
+    limit=10,
+    panels=["repeated_queries"],
+    source="query_history"
+))
+
+def successful_queries(history_df):
+    return history_df[history_df["EXECUTION_STATUS"] == "SUCCESS"]
+
+def finish_repeated_queries(out):
+    out["EXEC_TIME"] = out.pop("EXECUTION_TIME") / 60000
+    return top(out, "EXEC_TIME", 10)
+panel_history["repeated_queries"] = StreamedPanel(
+    successful_queries,
+    lambda: Aggregates(["QUERY_TEXT"], sums={"EXECUTION_TIME": "EXECUTION_TIME"}),
+    finish_repeated_queries
+)
+
+def figure_repeated_queries(total_execution_time_df):
+    fig_execution_time=px.bar(total_execution_time_df,x='EXEC_TIME',y='QUERY_TEXT', orientation='h',title="Total Execution Time by Repeated Queries")
+    fig_execution_time.update_traces(marker_color='LightSkyBlue')
+    return fig_execution_time
+panel_figures["repeated_queries"] = figure_repeated_queries
+
+#############################################
+#     Execution Time Percentiles by Warehouse
+#############################################
+register(Query("runtime_percentiles", grain="day", panels=["runtime_percentiles"], source="query_history_sketch"))
+
+def sketch_runtime_percentiles(sketch_df):
+    return top(summarize(sketch_df, ["WAREHOUSE_NAME"]), "P95_EXECUTION_SEC", 25)
+panel_sketch["runtime_percentiles"] = sketch_runtime_percentiles
+
+def figure_runtime_percentiles(runtime_percentiles_df):
+    fig_runtime_percentiles=px.bar(runtime_percentiles_df,x='WAREHOUSE_NAME',y=list(RUNTIME_QUANTILES),barmode='group',log_y=True,hover_data=['QUERY_COUNT','DISTINCT_USERS'],title="Execution Time Percentiles by Warehouse (seconds)")
+    return fig_runtime_percentiles
+panel_figures["runtime_percentiles"] = figure_runtime_percentiles
+
+#############################################
+#     Execution Time Percentiles by Schema
+#############################################
+register(Query("schema_runtime_percentiles", grain="day", limit=15, panels=["schema_runtime_percentiles"], source="query_history_sketch"))
+
+def sketch_schema_runtime_percentiles(sketch_df):
+    out = summarize(sketch_df, ["DATABASE_NAME", "SCHEMA_NAME"])
+    out.insert(0, "SCHEMA", out.pop("DATABASE_NAME") + "." + out.pop("SCHEMA_NAME"))
+    return top(out, "P95_EXECUTION_SEC", 15)
+panel_sketch["schema_runtime_percentiles"] = sketch_schema_runtime_percentiles
+
+def figure_schema_runtime_percentiles(schema_runtime_percentiles_df):
+    fig_schema_percentiles=px.bar(schema_runtime_percentiles_df,x=list(RUNTIME_QUANTILES),y='SCHEMA',barmode='group',orientation='h',log_x=True,hover_data=['QUERY_COUNT','DISTINCT_USERS'],title="Slowest Schemas by p95 Execution Time (seconds)")
+    return fig_schema_percentiles
+panel_figures["schema_runtime_percentiles"] = figure_schema_runtime_percentiles
+
+#############################################
+#     Credits Billed by Month
+#############################################
+credits_billed = register(Query(
+    "credits_billed",
+    "select date_trunc('MONTH', usage_date) as Usage_Month, sum(CREDITS_BILLED) from snowflake.account_usage.metering_daily_history group by Usage_Month",
+    views=["METERING_DAILY_HISTORY"],
+    columns=["USAGE_DATE", "CREDITS_BILLED"],
+    freshness="daily",
+    panels=["credits_billed"]
+))
+panel_sql["credits_billed"] = credits_billed.sql
+
+def figure_credits_billed(credits_billed_df):
+    fig_credits_billed=px.bar(credits_billed_df,x='USAGE_MONTH',y='SUM(CREDITS_BILLED)', orientation='v',title="Credits Billed by Month")
+    return fig_credits_billed
+panel_figures["credits_billed"] = figure_credits_billed
+panel_notes["credits_billed"] = 'The above chart is static and not modified by the date range filter'
+
+#############################################
+#  Top 10 Average Query Execution Time (By User)
+#############################################
+query_execution = register(Query(
+    "execution_by_user",
+    "select user_name, (avg(execution_time)) / 1000 as average_execution_time from snowflake.account_usage.query_history group by 1 order by 2 desc limit 10",
+    views=["QUERY_HISTORY"],
+    columns=["USER_NAME", "EXECUTION_TIME"],
+    limit=10,
+    panels=["execution_by_user"]
+))
+panel_sql["execution_by_user"] = query_execution.sql
+
+def figure_execution_by_user(query_execution_df):
+    fig_cquery_execution=px.bar(query_execution_df,x='USER_NAME',y='AVERAGE_EXECUTION_TIME', orientation='v',title="Average Execution Time per User")
+    fig_cquery_execution.update_traces(marker_color='MediumPurple')
+    return fig_cquery_execution
+panel_figures["execution_by_user"] = figure_execution_by_user
+
+#############################################
+#     GS Utilization by Query Type (Top 10)
+#############################################
+gs_utilization = register(Query(
+    "gs_utilization",
+    "select query_type, sum(credits_used_cloud_services) cs_credits, count(1) num_queries from snowflake.account_usage.query_history where true group by 1 order by 2 desc limit 10",
+    views=["QUERY_HISTORY"],
+    columns=["QUERY_TYPE", "CREDITS_USED_CLOUD_SERVICES"],
+    limit=10,
+    panels=["gs_utilization"]
+))
+panel_sql["gs_utilization"] = gs_utilization.sql
+
+def figure_gs_utilization(gs_utilization_df):
+    fig_gs_utilization=px.bar(gs_utilization_df,x='QUERY_TYPE',y='CS_CREDITS', orientation='v',title="GS Utilization by Query Type (Top 10)")
+    fig_gs_utilization.update_traces(marker_color='green')
+    return fig_gs_utilization
+panel_figures["gs_utilization"] = figure_gs_utilization
+
+#############################################
+#     Top 10 Cloud Services by Warehouse                 
+#############################################
+compute_gs_by_warehouse = register(Query(
+    "compute_gs_by_warehouse",
+    "select warehouse_name, sum(credits_used_cloud_services) CREDITS_USED_CLOUD_SERVICES from snowflake.account_usage.warehouse_metering_history where true group by 1 order by 2 desc limit 10",
+    views=["WAREHOUSE_METERING_HISTORY"],
+    columns=["WAREHOUSE_NAME", "CREDITS_USED_CLOUD_SERVICES"],
+    limit=10,
+    panels=["compute_gs_by_warehouse"]
+))
+panel_sql["compute_gs_by_warehouse"] = compute_gs_by_warehouse.sql
+
+def figure_compute_gs_by_warehouse(compute_gs_by_warehouse_df):
+    fig_compute_gs_by_warehouse=px.bar(compute_gs_by_warehouse_df,x='WAREHOUSE_NAME',y='CREDITS_USED_CLOUD_SERVICES', orientation='v',title="Compute and Cloud Services by Warehouse", barmode="group")
+    fig_compute_gs_by_warehouse.update_traces(marker_color='purple')
+    return fig_compute_gs_by_warehouse
+panel_figures["compute_gs_by_warehouse"] = figure_compute_gs_by_warehouse
+
+#############################################
+#     Data Storage used Overtime                
+#############################################
+storage_overtime = register(Query(
+    "storage_overtime",
+    "select date_trunc(month, usage_date) as usage_month, avg(storage_bytes + stage_bytes + failsafe_bytes) / power(1024, 4) as billable_tb, avg(storage_bytes) / power(1024, 4) as Storage_TB, avg(stage_bytes) / power(1024, 4) as Stage_TB, avg(failsafe_bytes) / power(1024, 4) as Failsafe_TB from snowflake.account_usage.storage_usage group by 1 order by 1",
+    views=["STORAGE_USAGE"],
+    columns=["USAGE_DATE", "STORAGE_BYTES", "STAGE_BYTES", "FAILSAFE_BYTES"],
+    freshness="daily",
+    panels=["storage_overtime"]
+))
+panel_sql["storage_overtime"] = storage_overtime.sql
+
+def figure_storage_overtime(storage_overtime_df):
+    fig_storage_overtime=px.bar(storage_overtime_df,x='USAGE_MONTH',y='BILLABLE_TB', orientation='v',title="Data Storage used Overtime", barmode="group")
+    return fig_storage_overtime
+panel_figures["storage_overtime"] = figure_storage_overtime
+panel_notes["storage_overtime"] = 'The above chart is static and non modified by the date range filter'
+
+#############################################
+#     Rows Loaded Overtime (COPY INTO)                   
+#############################################
+rows_loaded = register(Query(
+    "rows_loaded",
+    "select last_load_time::date as usage_day, sum(row_count) as total_rows from snowflake.account_usage.load_history where last_load_time >= '{start}' and last_load_time < '{end}' group by 1",
+    views=["LOAD_HISTORY"],
+    columns=["LAST_LOAD_TIME", "ROW_COUNT"],
+    grain="day",
+    panels=["rows_loaded"]
+))
+
+def merge_rows_loaded(df):
+    out = pd.DataFrame({"USAGE_DATE": pd.to_datetime(df["USAGE_DAY"]), "TOTAL_ROWS": df["TOTAL_ROWS"]})
+    return out.sort_values("USAGE_DATE", ascending=False).reset_index(drop=True)
+panel_daily["rows_loaded"] = DailyQuery("rows_loaded", rows_loaded.sql, merge_rows_loaded)
+
+def figure_rows_loaded(rows_loaded_df):
+    fig_rows_loaded=px.line(rows_loaded_df,x='USAGE_DATE',y='TOTAL_ROWS', orientation='v',title="Rows Loaded Overtime (Copy Into)")
+    return fig_rows_loaded
+panel_figures["rows_loaded"] = figure_rows_loaded
+
+#############################################
+#     Logins by User               
+#############################################
+logins = register(Query(
+    "logins",
+    "select user_name, sum(iff(is_success = 'NO', 1, 0)) as Failed, count(*) as Success, sum(iff(is_success = 'NO', 1, 0)) / nullif(count(*), 0) as login_failure_rate from snowflake.account_usage.login_history group by 1 order by 4 desc",
+    views=["LOGIN_HISTORY"],
+    columns=["USER_NAME", "IS_SUCCESS"],
+    panels=["logins"]
+))
+panel_sql["logins"] = logins.sql
+
+def figure_logins(logins_df):
+    fig_logins=px.bar(logins_df,x='USER_NAME',y='SUCCESS', orientation='v',title="Logins by User", barmode="group")
+    fig_logins.update_traces(marker_color='green')
+    return fig_logins
+panel_figures["logins"] = figure_logins
+
+#############################################
+#     Logins by Client               
+#############################################
+logins_client = register(Query(
+    "logins_client",
+    "select reported_client_type as Client, user_name, sum(iff(is_success = 'NO', 1, 0)) as Failed, count(*) as Success, sum(iff(is_success = 'NO', 1, 0)) / nullif(count(*), 0) as login_failure_rate from snowflake.account_usage.login_history group by 1, 2 order by 5 desc",
+    views=["LOGIN_HISTORY"],
+    columns=["REPORTED_CLIENT_TYPE", "USER_NAME", "IS_SUCCESS"],
+    panels=["logins_client"]
+))
+panel_sql["logins_client"] = logins_client.sql
+
+def figure_logins_client(logins_client_df):
+    fig_logins_client=px.bar(logins_client_df,x='CLIENT',y='SUCCESS', orientation='v',title="Logins by Client")
+    fig_logins_client.update_traces(marker_color='purple')
+    return fig_logins_client
+panel_figures["logins_client"] = figure_logins_client
@@ -0,0 +1,48 @@
+# Per-day sketches of QUERY_HISTORY, kept beside the usage cube: execution
+# time quantiles and distinct users per warehouse and schema. Averages hide
+# the skew of a workload and exact distinct counts don't add up across days,
+# sketches do: a window's p50/p95/p99 and distinct users come from merging
+# its days' sketches (see Sketches), each day is only ever built once.
+import pandas as pd
+
+from Queryregistry import Query, register
+from Sketches import HLL_PRECISION, QUANTILE_ACCURACY, SLOT, VALUE, hll_count, hll_sketch, quantile_sketch, sketch_quantiles
+from Usagecube import load_rollups
+
+SKETCH_DIMENSIONS = ["WAREHOUSE_NAME", "DATABASE_NAME", "SCHEMA_NAME"]
+# Which column a row of a sketch partition sketches
+SKETCH = "SKETCH"
+RUNTIME_QUANTILES = {"P50_EXECUTION_SEC": 0.5, "P95_EXECUTION_SEC": 0.95, "P99_EXECUTION_SEC": 0.99}
+# Persisted sketch partitions are keyed by their layout, changing it starts a fresh cache
+SKETCH_KEY = f"query_history_sketch:{','.join(SKETCH_DIMENSIONS)}:{QUANTILE_ACCURACY}:{HLL_PRECISION}"
+
+# The sketches' panels are registered by Usagepanels as derived from them
+query_history_sketch = register(Query(
+    "query_history_sketch",
+    views=["QUERY_HISTORY"],
+    columns=SKETCH_DIMENSIONS + ["EXECUTION_TIME", "USER_NAME"],
+    grain="day",
+    source="query_history"
+))
+
+def build_sketches(extract):
+    """Execution time quantile sketch and distinct user sketch per warehouse and schema of QUERY_HISTORY rows"""
+    runtime = quantile_sketch(extract, SKETCH_DIMENSIONS, "EXECUTION_TIME").assign(**{SKETCH: "EXECUTION_TIME"})
+    users = hll_sketch(extract, SKETCH_DIMENSIONS, "USER_NAME").assign(**{SKETCH: "USER_NAME"})
+    return pd.concat([runtime, users], ignore_index=True)[SKETCH_DIMENSIONS + [SKETCH, SLOT, VALUE]]
+
+def load_sketches(start, end, run, cache=None, extract_cache=None):
+    """Sketches for start..end, only days without a cached sketch partition are built"""
+    return load_rollups(SKETCH_KEY, build_sketches, start, end, run, cache, extract_cache)
+
+def summarize(sketches, by):
+    """One row per by group: QUERY_COUNT, the RUNTIME_QUANTILES and DISTINCT_USERS, merged from sketches"""
+    runtime = sketch_quantiles(sketches[sketches[SKETCH] == "EXECUTION_TIME"], by, RUNTIME_QUANTILES)
+    runtime = runtime.rename(columns={"COUNT": "QUERY_COUNT"})
+    for name in RUNTIME_QUANTILES:
+        runtime[name] = (runtime[name] / 1000).round(2)
+    users = hll_count(sketches[sketches[SKETCH] == "USER_NAME"], by, "DISTINCT_USERS")
+    out = runtime.merge(users, on=by, how="outer")
+    out["QUERY_COUNT"] = out["QUERY_COUNT"].fillna(0).astype("int64")
+    out["DISTINCT_USERS"] = out["DISTINCT_USERS"].fillna(0).astype("int64")
+    return out
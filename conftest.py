@@ -0,0 +1,20 @@
+import os
+import tempfile
+
+# Read when the apps' modules are imported, so set before any test loads them
+os.environ["USAGE_LOCAL_SQL"] = "0"
+os.environ["USAGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="usage-test-")
+os.environ["USAGE_PREWARM"] = "0"
+os.environ["USAGE_SHARED_CACHE"] = ""
+
+import pytest
+
+@pytest.fixture(scope="session")
+def fake(tmp_path_factory):
+    """FakeSnowflake installed over a small Generate.py store"""
+    import Generate
+    from Fakeconnector import FakeSnowflake
+
+    store = tmp_path_factory.mktemp("store")
+    Generate.generate(store, queries=5_000, days=30)
+    return FakeSnowflake(store).install()
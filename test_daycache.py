@@ -0,0 +1,21 @@
+import datetime
+
+from Daycache import CLOSE_LATENCY, is_closed
+
+UTC = datetime.timezone.utc
+
+def test_day_closes_after_its_end_in_the_session_timezone():
+    # 2026-06-10 ends at 07:00 UTC on the 11th in Los Angeles (PDT, UTC-7)
+    day = datetime.date(2026, 6, 10)
+    closes = datetime.datetime(2026, 6, 11, 7, tzinfo=UTC) + CLOSE_LATENCY
+    # Midnight UTC plus CLOSE_LATENCY is still the afternoon of the 10th in Los Angeles
+    assert not is_closed(day, datetime.datetime(2026, 6, 11, 3, tzinfo=UTC))
+    assert not is_closed(day, closes - datetime.timedelta(seconds=1))
+    assert is_closed(day, closes)
+
+def test_day_closes_after_its_end_in_winter():
+    # PST is UTC-8
+    day = datetime.date(2026, 1, 10)
+    closes = datetime.datetime(2026, 1, 11, 8, tzinfo=UTC) + CLOSE_LATENCY
+    assert not is_closed(day, closes - datetime.timedelta(seconds=1))
+    assert is_closed(day, closes)
@@ -0,0 +1,24 @@
+import datetime
+
+import Addonpanels
+import Report
+from Benchmark import FAKE_SECRETS
+from Pool import ConnectionPool
+
+def test_failing_figure_still_writes_the_report(fake, monkeypatch, tmp_path):
+    def broken(df):
+        raise ValueError("None entries cannot have not-None children")
+    monkeypatch.setitem(Addonpanels.addon_figures, "query_perf", broken)
+
+    end = datetime.date.today()
+    pool = ConnectionPool(FAKE_SECRETS, min_size=1, max_size=4)
+    try:
+        errors = Report.run_report(pool, end - datetime.timedelta(days=30), end, tmp_path, 4)
+    finally:
+        pool.close()
+
+    assert errors == {"query_perf": "Error: None entries cannot have not-None children"}
+    page = (tmp_path / "report.html").read_text(encoding="utf-8")
+    assert "query_perf: Error: None entries cannot have not-None children" in page
+    assert "Cost Optimization Recommendations" in page
+    assert (tmp_path / "query_perf.parquet").exists()
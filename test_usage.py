@@ -0,0 +1,47 @@
+from streamlit.testing.v1 import AppTest
+
+import Usagepanels
+from Benchmark import FAKE_SECRETS, HERE, SECTION_KEYS
+
+SCRIPT = f"exec(compile(open({str(HERE / 'Usage.py')!r}).read(), 'Usage.py', 'exec'))"
+# Addon.py is appended to Usage.py and runs in its namespace
+ADDON_SCRIPT = (
+    f"exec(compile(open({str(HERE / 'Usage.py')!r}).read() + '\\n' + open({str(HERE / 'Addon.py')!r}).read(), 'Usage.py', 'exec'))"
+)
+
+def test_failing_figure_only_fails_its_panel(fake, monkeypatch):
+    def broken(df):
+        raise ValueError("None entries cannot have not-None children")
+    monkeypatch.setitem(Usagepanels.panel_figures, "credits_by_warehouse", broken)
+
+    at = AppTest.from_string(SCRIPT, default_timeout=300)
+    at.secrets["snowflake"] = FAKE_SECRETS
+    for key in SECTION_KEYS:
+        at.session_state[key] = True
+    at.run()
+
+    assert not at.exception
+    assert [e.value for e in at.error] == ["Error: None entries cannot have not-None children"]
+    # Every other panel is drawn: the three metrics and the charts after the broken one
+    assert len(at.metric) == 3
+    assert len(at.get("plotly_chart")) == len(Usagepanels.panel_figures) - 1
+    assert not [c.value for c in at.caption if c.value == "Loading..."]
+
+def test_failing_addon_figure_only_fails_its_panel(fake, monkeypatch):
+    import Addonpanels
+
+    def broken(df):
+        raise ValueError("None entries cannot have not-None children")
+    monkeypatch.setitem(Addonpanels.addon_figures, "query_perf", broken)
+
+    at = AppTest.from_string(ADDON_SCRIPT, default_timeout=300)
+    at.secrets["snowflake"] = FAKE_SECRETS
+    for key in SECTION_KEYS:
+        at.session_state[key] = True
+    at.run()
+
+    assert not at.exception
+    assert [e.value for e in at.error] == ["Error: None entries cannot have not-None children"]
+    # The KPIs and recommendations after the panels are still drawn
+    assert "Total Spilling Queries" in [m.label for m in at.metric]
+    assert not [c.value for c in at.caption if c.value in ("Loading...", "Running in Snowflake...")]